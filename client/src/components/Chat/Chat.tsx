@@ -8,6 +8,7 @@ import Sidebar from "../Sidebar/Sidebar";
 import MobileSidebar from "../MobileSidebar/MobileSidebar";
 import Typewriter from 'typewriter-effect';
 import ReactMarkdown from 'react-markdown';
+import { redirectIfUnauthorized } from "@/lib/utils";
 
 interface ChatMessage {
     role: 'user' | 'model';
@@ -34,9 +35,15 @@ export default function Chat() {
         }
 
         const fetchChatHistory = async () => {
-            if (!storedUsername) return;
+            // Тарих тек токен бойынша беріледі
+            const token = localStorage.getItem('token');
+            if (!token) return;
             try {
-                const response = await fetch(`${BACKEND_URL}/chat_history?username=${storedUsername}`);
+                // Соңғы хабарламалар беті; ескілері next_before курсоры арқылы жүктеледі
+                const response = await fetch(`${BACKEND_URL}/chat_history?limit=50`, {
+                    headers: { 'Authorization': `Bearer ${token}` },
+                });
+                redirectIfUnauthorized(response);
                 if (response.ok) {
                     const data = await response.json();
                     setChatHistory(data.chat_history);
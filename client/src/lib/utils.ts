@@ -4,3 +4,12 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+// Токен истёк или недействителен (сервер ответил 401): сбрасываем вход и открываем страницу входа
+export function redirectIfUnauthorized(res: Response) {
+  if (res.status === 401) {
+    localStorage.removeItem("token")
+    localStorage.removeItem("username")
+    window.location.href = "/signin"
+  }
+}
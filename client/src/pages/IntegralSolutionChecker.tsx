@@ -10,6 +10,7 @@ import MobileSidebar from "../components/MobileSidebar/MobileSidebar";
 import Sidebar from "../components/Sidebar/Sidebar";
 import { AlertCircle, Clock, CheckCircle, Plus, X } from "lucide-react";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
+import { redirectIfUnauthorized } from "@/lib/utils";
 //import { set } from "react-hook-form";
 
 addStyles();
@@ -45,17 +46,20 @@ const api = {
 
 
   async checkIntegralSolution(taskId: string, phiSteps: PhiStep[], finalSolution: string) {
-    const user = localStorage.getItem("username");
+    const token = localStorage.getItem("token");
     try {
       const res = await fetch(`${API_URL}/api/solutions/check-integral`, {
         method: "POST",
         headers: { 
           "Content-Type": "application/json",
-          "Accept": "application/json"
+          "Accept": "application/json",
+          // Пользователь определяется сервером по токену
+          ...(token ? { "Authorization": `Bearer ${token}` } : {})
         },
         credentials: 'include',
-        body: JSON.stringify({ taskId, phiSteps, finalSolution, user }),
+        body: JSON.stringify({ taskId, phiSteps, finalSolution }),
       });
+      redirectIfUnauthorized(res);
       if (!res.ok) throw new Error(`Error ${res.status}: ${await res.text()}`);
       return await res.json();
     } catch (error) {
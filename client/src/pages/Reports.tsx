@@ -46,9 +46,25 @@ const Reports = () => {
         toast.error("Тапсырмаларды жүктеу мүмкін болмады");
       });
 
-    // Пайдаланушыларды жүктеу (егер /api/users эндпоинті іске қосылған болса)
-    fetch(`${BACKEND_URL}/api/users`)
-      .then((res) => res.json())
+    // Студенттерді жүктеу: /api/users беттеп қайтарады, келесі бет курсоры X-Next-Cursor тақырыбында
+    // Тізім тек әкімшіге қолжетімді: сервер рөлді токен бойынша тексереді
+    const loadStudents = async () => {
+      const token = localStorage.getItem("token");
+      const loaded: User[] = [];
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({ role: "student", sort: "lastname", limit: "500" });
+        if (cursor) params.set("cursor", cursor);
+        const res = await fetch(`${BACKEND_URL}/api/users?${params}`, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
+        });
+        if (!res.ok) throw new Error(`Error ${res.status}: ${await res.text()}`);
+        loaded.push(...((await res.json()) as User[]));
+        cursor = res.headers.get("X-Next-Cursor");
+      } while (cursor);
+      return loaded;
+    };
+    loadStudents()
       .then((data) => {
         setUsers(data);
       })
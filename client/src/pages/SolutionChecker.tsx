@@ -11,6 +11,7 @@ import Sidebar from "../components/Sidebar/Sidebar";
 import { AlertCircle, Clock, CheckCircle } from "lucide-react";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import useProctoring from "@/hooks/useProctoring";
+import { redirectIfUnauthorized } from "@/lib/utils";
 
 addStyles();
 // API configuration
@@ -52,16 +53,18 @@ const api = {
 
   async checkSolution(taskId: string, steps: string[], category:string) {
     console.log("Checking solution for task ID:", taskId, "with steps:", steps, "and category:", category);
-    const user = localStorage.getItem("username");
+    const token = localStorage.getItem("token");
     try {
       const requestOptions = {
         method: "POST",
         headers: { 
           "Content-Type": "application/json",
-          "Accept": "application/json"
+          "Accept": "application/json",
+          // Пользователь определяется сервером по токену
+          ...(token ? { "Authorization": `Bearer ${token}` } : {})
         },
         credentials: 'include' as RequestCredentials,
-        body: JSON.stringify({ taskId, steps, user })
+        body: JSON.stringify({ taskId, steps })
       };
 
       let response;
@@ -75,6 +78,7 @@ const api = {
         throw new Error("Unknown category");
       }
 
+      redirectIfUnauthorized(response);
       if (!response.ok) {
         const errorText = await response.text();
         throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
@@ -0,0 +1,167 @@
+"""
+Допуск и планирование тяжёлых запросов в ASGI-шлюзе (asgi.py).
+
+Одновременно выполняется не больше capacity проверок (по числу процессов
+пула). Запросы делятся на классы приоритета (PRIORITY_CLASSES): экзамен,
+домашнее задание, практика, генерация задач. У каждого класса своя очередь
+не длиннее queue_limit; освободившийся слот достаётся классу по взвешенной
+справедливой очереди (stride scheduling): класс с весом w получает примерно
+w / Σw слотов, пока в его очереди есть запросы, и не копит «кредит», пока
+простаивает. Ещё reserved слотов доступны только экзамену — экзаменационная
+проверка не ждёт, пока закончатся длинные проверки фоновых классов.
+
+У одного пользователя не больше per_user запросов в работе и в очереди
+вместе. Запрос сверх пределов сразу получает отказ (Saturated -> 429).
+Все счётчики меняются только из цикла событий, поэтому блокировки не нужны.
+"""
+import asyncio
+import contextlib
+import time
+from collections import Counter, deque
+
+PRIORITY_CLASSES = ("exam", "homework", "practice", "generation")
+DEFAULT_WEIGHTS = {"exam": 8, "homework": 4, "practice": 2, "generation": 1}
+# Окно для перцентилей времени ожидания по классу
+_WAIT_SAMPLES = 256
+
+
+class Saturated(Exception):
+    """Запрос не принят: reason — "queue" (очередь класса полна) или "user" (лимит пользователя)."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _ClassState:
+    def __init__(self, weight):
+        self.weight = weight
+        self.queue = deque()
+        self.passed = 0.0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.waits_ms = deque(maxlen=_WAIT_SAMPLES)
+
+
+class AdmissionControl:
+    def __init__(self, capacity, queue_limit, per_user, weights=None, reserved=0, retry_after=1):
+        self.capacity = capacity
+        self.queue_limit = queue_limit
+        self.per_user = per_user
+        self.retry_after = retry_after
+        # Нельзя зарезервировать все слоты: фоновым классам нужен хотя бы один
+        self.reserved = min(reserved, capacity - 1)
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        if any(weight <= 0 for weight in weights.values()):
+            raise ValueError(f"Веса классов приоритета должны быть положительными: {weights}")
+        self._classes = {name: _ClassState(weights[name]) for name in PRIORITY_CLASSES}
+        self._users = Counter()
+        self._virtual_time = 0.0
+        self.running = 0
+        self.rejected = Counter()
+
+    @property
+    def waiting(self):
+        return sum(len(state.queue) for state in self._classes.values())
+
+    def _can_start(self, name):
+        if self.running >= self.capacity:
+            return False
+        return name == "exam" or self.running - self._classes["exam"].running < self.capacity - self.reserved
+
+    def _dispatch(self):
+        """Отдаёт свободные слоты ожидающим запросам по весам классов."""
+        while self.running < self.capacity:
+            candidates = [
+                (state.passed, -state.weight, name) for name, state in self._classes.items()
+                if state.queue and self._can_start(name)
+            ]
+            if not candidates:
+                return
+            name = min(candidates)[2]
+            state = self._classes[name]
+            future, enqueued_at = state.queue.popleft()
+            if future.done():
+                continue
+            self._virtual_time = state.passed
+            state.passed += 1.0 / state.weight
+            state.running += 1
+            self.running += 1
+            state.waits_ms.append((time.monotonic() - enqueued_at) * 1000)
+            future.set_result(None)
+
+    def _release(self, name):
+        self._classes[name].running -= 1
+        self.running -= 1
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def admit(self, user, priority="practice"):
+        """
+        Контекст выполнения запроса пользователя user класса priority;
+        ждёт своей очереди или бросает Saturated.
+        """
+        name = priority if priority in self._classes else "practice"
+        state = self._classes[name]
+        if self._users[user] >= self.per_user:
+            state.rejected += 1
+            self.rejected["user"] += 1
+            raise Saturated("user", self.retry_after)
+        if len(state.queue) >= self.queue_limit:
+            state.rejected += 1
+            self.rejected["queue"] += 1
+            raise Saturated("queue", self.retry_after)
+
+        self._users[user] += 1
+        state.admitted += 1
+        try:
+            if not state.queue:
+                # Простаивавший класс начинает с текущего виртуального времени, без накопленного кредита
+                state.passed = max(state.passed, self._virtual_time)
+            future = asyncio.get_running_loop().create_future()
+            entry = (future, time.monotonic())
+            state.queue.append(entry)
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Клиент ушёл: убираем запрос из очереди или возвращаем уже выданный слот
+                if future.cancelled():
+                    if entry in state.queue:
+                        state.queue.remove(entry)
+                else:
+                    self._release(name)
+                raise
+            try:
+                yield
+            finally:
+                self._release(name)
+        finally:
+            self._users[user] -= 1
+            if self._users[user] <= 0:
+                del self._users[user]
+
+    def stats(self):
+        classes = {}
+        for name, state in self._classes.items():
+            waits = sorted(state.waits_ms)
+            classes[name] = {
+                "weight": state.weight,
+                "waiting": len(state.queue),
+                "running": state.running,
+                "admitted": state.admitted,
+                "rejected": state.rejected,
+                "wait_ms_p50": round(waits[len(waits) // 2], 1) if waits else None,
+                "wait_ms_p95": round(waits[int(len(waits) * 0.95)], 1) if waits else None,
+            }
+        return {
+            "capacity": self.capacity,
+            "reserved_for_exam": self.reserved,
+            "running": self.running,
+            "waiting": self.waiting,
+            "queue_limit": self.queue_limit,
+            "rejected": dict(self.rejected),
+            "classes": classes,
+        }
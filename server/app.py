@@ -1,8 +1,10 @@
 from flask import Flask, request
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
-from models import db
+from models import db, upgrade_schema
 from utils.Auth.auth import auth_bp
+from utils.Auth.middleware import init_auth
 from tasks import tasks_bp
 from solutions import solutions_bp
 from reports import reports_bp
@@ -10,6 +12,8 @@ from profile import profile_bp
 from solution_integral import solution_integral_bp
 from tasks_generator import tasks_generator_bp
 from users import users_bp
+from slow_capture import reset_task_context
+from chat_history import chat_history_bp
 import logging
 from logging.handlers import RotatingFileHandler
 import os
@@ -25,6 +29,9 @@ file_handler.setLevel(logging.INFO)
 
 app = Flask(__name__)
 app.config.from_object(Config)
+if Config.PROXY_HOPS:
+    # request.remote_addr — адрес клиента, а не прокси (нужен для ограничения входа)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_HOPS)
 
 # Настройка логирования для приложения
 app.logger.addHandler(file_handler)
@@ -41,12 +48,20 @@ def after_request(response):
     if origin and (origin.startswith('http://localhost:') or origin.startswith('http://127.0.0.1:')):
         response.headers['Access-Control-Allow-Origin'] = origin
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Check-Priority'
     response.headers['Access-Control-Allow-Credentials'] = 'true'
+    # Курсор следующей страницы списка пользователей (users.py)
+    response.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
     return response
 
 db.init_app(app)
 
+# id задачи для захвата медленных выражений живёт только в пределах запроса
+app.teardown_request(reset_task_context)
+
+# Проверка JWT: g.user_id и g.role для каждого запроса
+init_auth(app)
+
 # Регистрация Blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(tasks_bp)
@@ -56,10 +71,15 @@ app.register_blueprint(profile_bp)
 app.register_blueprint(solution_integral_bp)
 app.register_blueprint(tasks_generator_bp)
 app.register_blueprint(users_bp)
+app.register_blueprint(chat_history_bp)
 
 # Создание таблиц, если их ещё нет
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+    # При preload_app (gunicorn.conf.py) импорт идёт в мастере: воркеры
+    # не должны унаследовать через fork его открытые соединения
+    db.engine.dispose()
 
 if __name__ == "__main__":
     app.run(debug=True)
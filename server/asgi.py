@@ -0,0 +1,236 @@
+"""
+ASGI-шлюз перед Flask-приложением.
+
+Запуск:  uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+Проверки решений, генерация задач и PDF-отчёты нагружают процессор
+(SymPy, ANTLR, reportlab) и в sync-воркерах gunicorn занимают воркер целиком,
+так что несколько тяжёлых запросов задерживают и дешёвые (GET /api/tasks).
+Здесь тяжёлые запросы (HEAVY_PATHS) выполняются тем же Flask-приложением,
+но в отдельном пуле процессов с контролем допуска (admission.py): не больше
+CHECK_WORKERS одновременно, очередь до CHECK_QUEUE_LIMIT на класс приоритета,
+у пользователя не больше CHECK_PER_USER_LIMIT запросов; сверх этого — 429
+с Retry-After. Остальные запросы выполняются в потоках этого процесса
+и тяжёлых не ждут.
+
+Класс приоритета: генерация задач — "generation", для проверок — claim
+check_priority проверенного токена (exam, homework, practice; по умолчанию
+practice). Экзаменационный токен выдаёт администратор (/api/auth/exam-token);
+заголовок X-Check-Priority может только понизить класс. Экзамен получает
+наибольший вес и CHECK_EXAM_RESERVED слотов, недоступных остальным классам.
+
+Потоковый /check/limit/stream через пул отдаётся одним ответом: события
+приходят клиенту вместе, когда проверка закончена.
+"""
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import jwt
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from admission import PRIORITY_CLASSES, AdmissionControl, Saturated
+from config import Config
+from utils.Auth.middleware import decode_token
+
+HEAVY_PATHS = re.compile(
+    r"^/api/solutions/(check/|check-integral|\d+/check_step)"
+    r"|^/api/tasks_generator"
+    r"|^/api/reports/pdf"
+)
+GENERATION_PATHS = re.compile(r"^/api/tasks_generator")
+# Классы, доступные проверкам: генерация определяется только по пути
+CHECK_CLASSES = tuple(name for name in PRIORITY_CLASSES if name != "generation")
+
+_flask_app = None
+
+
+def _wsgi_app():
+    # Flask-приложение импортируется при первом запросе в каждом процессе
+    global _flask_app
+    if _flask_app is None:
+        from app import app as flask_app
+        _flask_app = flask_app
+    return _flask_app
+
+
+def handle_wsgi(request):
+    """
+    Выполняет запрос Flask-приложением. request и результат — простые
+    структуры, чтобы передаваться между процессами:
+    request = {"method", "path", "query_string", "headers", "body", "remote_addr"},
+    результат — (код ответа, заголовки, тело).
+    """
+    from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+    builder = EnvironBuilder(
+        method=request["method"],
+        path=request["path"],
+        query_string=request["query_string"],
+        headers=request["headers"],
+        data=request["body"],
+        environ_base={"REMOTE_ADDR": request["remote_addr"]},
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    app_iter, status, headers = run_wsgi_app(_wsgi_app(), environ)
+    try:
+        body = b"".join(app_iter)
+    finally:
+        if hasattr(app_iter, "close"):
+            app_iter.close()
+    return int(status.split(" ", 1)[0]), list(headers.items()), body
+
+
+def _warm_worker():
+    import warmup
+    warmup.warm_up(_wsgi_app())
+
+
+def _token_claims(request):
+    """Claims проверенного токена из Authorization: Bearer; None — токена нет или он недействителен."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    try:
+        return decode_token(token.strip())
+    except jwt.InvalidTokenError:
+        return None
+
+
+def _user_key(request):
+    """
+    Ключ для лимита на пользователя: user_id из проверенного токена, иначе IP.
+    Заголовок или поле тела без проверки подписи не годятся — каждый запрос
+    получал бы новый ключ и обходил CHECK_PER_USER_LIMIT.
+    """
+    claims = _token_claims(request)
+    if claims and claims.get("user_id") is not None:
+        return f"user:{claims['user_id']}"
+    return f"ip:{request.client.host if request.client else '-'}"
+
+
+def _priority(request):
+    """
+    Класс приоритета решает сервер: генерация — по пути, для проверок — claim
+    check_priority проверенного токена (выдаёт /api/auth/exam-token), иначе practice.
+    Заголовок X-Check-Priority может только понизить класс.
+    """
+    if GENERATION_PATHS.match(request.url.path):
+        return "generation"
+    claims = _token_claims(request) or {}
+    granted = claims.get("check_priority")
+    if granted not in CHECK_CLASSES:
+        granted = "practice"
+    requested = request.headers.get("x-check-priority", granted).strip().lower()
+    # PRIORITY_CLASSES упорядочены от высшего класса к низшему
+    if requested in CHECK_CLASSES and CHECK_CLASSES.index(requested) > CHECK_CLASSES.index(granted):
+        return requested
+    return granted
+
+
+async def _as_wsgi_request(request):
+    body = await request.body()
+    return {
+        "method": request.method,
+        "path": request.url.path,
+        "query_string": request.url.query,
+        "headers": [(k.decode("latin-1"), v.decode("latin-1")) for k, v in request.headers.raw],
+        "body": body,
+        "remote_addr": request.client.host if request.client else "",
+    }
+
+
+def _response(result):
+    status, headers, body = result
+    response = Response(body, status_code=status)
+    # Content-Length выставит Starlette по фактическому телу
+    for name, value in headers:
+        if name.lower() != "content-length":
+            response.headers.append(name, value)
+    return response
+
+
+async def dispatch(request):
+    wsgi_request = await _as_wsgi_request(request)
+    if request.method == "OPTIONS" or not HEAVY_PATHS.match(request.url.path):
+        return _response(await run_in_threadpool(handle_wsgi, wsgi_request))
+
+    state = request.app.state
+    try:
+        async with state.admission.admit(_user_key(request), _priority(request)):
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(state.pool, handle_wsgi, wsgi_request)
+    except Saturated as e:
+        logging.warning(f"Запрос {request.url.path} отклонён: {e.reason}")
+        return JSONResponse(
+            {"error": "Сервер перегружен, повторите попытку позже", "reason": e.reason},
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return _response(result)
+
+
+async def gateway_status(request):
+    return JSONResponse(request.app.state.admission.stats())
+
+
+async def gateway_metrics(request):
+    """Глубина очередей и загрузка по классам приоритета в текстовом формате Prometheus."""
+    stats = request.app.state.admission.stats()
+    lines = []
+    for metric, key, kind in (
+        ("check_queue_depth", "waiting", "gauge"),
+        ("check_running", "running", "gauge"),
+        ("check_admitted_total", "admitted", "counter"),
+        ("check_rejected_total", "rejected", "counter"),
+    ):
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, values in stats["classes"].items():
+            lines.append(f'{metric}{{priority="{name}"}} {values[key]}')
+    lines.append("# TYPE check_wait_ms gauge")
+    for name, values in stats["classes"].items():
+        for quantile in ("p50", "p95"):
+            value = values[f"wait_ms_{quantile}"]
+            if value is not None:
+                lines.append(f'check_wait_ms{{priority="{name}",quantile="{quantile}"}} {value}')
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # spawn: дочерние процессы не наследуют цикл событий и потоки шлюза
+    app.state.pool = ProcessPoolExecutor(
+        max_workers=Config.CHECK_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_worker,
+    )
+    app.state.admission = AdmissionControl(
+        capacity=Config.CHECK_WORKERS,
+        queue_limit=Config.CHECK_QUEUE_LIMIT,
+        per_user=Config.CHECK_PER_USER_LIMIT,
+        weights=Config.CHECK_PRIORITY_WEIGHTS,
+        reserved=Config.CHECK_EXAM_RESERVED,
+    )
+    try:
+        yield
+    finally:
+        app.state.pool.shutdown(cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route("/gateway/status", gateway_status, methods=["GET"]),
+        Route("/gateway/metrics", gateway_metrics, methods=["GET"]),
+        Route("/{path:path}", dispatch, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]),
+    ],
+    lifespan=lifespan,
+)
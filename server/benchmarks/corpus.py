@@ -0,0 +1,119 @@
+"""
+Фиксированные корпуса для бенчмарков проверяющих функций.
+
+Каждая запись содержит ожидаемый вердикт, чтобы бенчмарк заодно
+подтверждал, что ускорение не изменило результат проверки.
+"""
+
+# safe_sympify: обычные выражения и выражения с \lim
+PARSE_EXPRESSIONS = [
+    r"\frac{2x+1}{x}",
+    r"\left(\frac{2x+1}{x-1}\right)^{x}",
+    r"\left(1+\frac{3}{x+2}\right)^{x}",
+    r"\frac{3x^{2}+2x}{x^{2}}",
+    r"x - \int_{0}^{x} (x-t) t \, dt",
+    r"\lim_{x\to\infty}\left(\frac{x+3}{x+1}\right)^{x}",
+]
+
+# solutions.check_algebraic_step: (prev, curr, is_correct)
+LIMIT_STEPS = [
+    (r"\left(\frac{2x+1}{x-1}\right)^{x}", r"\left(\frac{2+\frac{1}{x}}{1-\frac{1}{x}}\right)^{x}", True),
+    (r"\frac{2x+1}{x}", r"2+\frac{1}{x}", True),
+    (r"\frac{x^{2}-1}{x-1}", r"x+1", True),
+    (r"\left(1+\frac{3}{x+2}\right)^{x}", r"\left(\frac{x+5}{x+2}\right)^{x}", True),
+    (r"\lim_{x\to\infty}\left(\frac{x+3}{x+1}\right)^{x}", r"\lim_{x\to\infty}\left(1+\frac{2}{x+1}\right)^{x}", True),
+    (r"\frac{3x^{2}+2x}{x^{2}}", r"3+\frac{2}{x}", True),
+    (r"\frac{2x+1}{x}", r"2+\frac{2}{x}", False),
+    (r"\frac{x^{2}-1}{x-1}", r"x-1", False),
+    (r"\left(\frac{x+5}{x+2}\right)^{x}", r"\left(1+\frac{2}{x+2}\right)^{x}", False),
+    (r"\frac{3x^{2}+2x}{x^{2}}", r"3+\frac{2}{x^{2}}", False),
+    (r"\lim_{x\to\infty}\left(\frac{x+3}{x+1}\right)^{x}", r"\lim_{x\to\infty}\left(1+\frac{3}{x+1}\right)^{x}", False),
+]
+
+# Рациональные функции от x (шаги категории algebra и преобразования дробей):
+# solutions.check_algebraic_step, (prev, curr, is_correct)
+RATIONAL_STEPS = [
+    (r"3x^{2} - 7x + 2", r"(3x-1)(x-2)", True),
+    (r"(2x+1)^{3}", r"8x^{3}+12x^{2}+6x+1", True),
+    (r"\frac{x^{3}-8}{x-2}", r"x^{2}+2x+4", True),
+    (r"\frac{1}{x-1} - \frac{1}{x+1}", r"\frac{2}{x^{2}-1}", True),
+    (r"\frac{x^{2}+5x+6}{x^{2}-4}", r"\frac{x+3}{x-2}", True),
+    (r"\frac{2x^{2}+3x-2}{x^{2}+x-2}", r"\frac{2x-1}{x-1}", True),
+    (r"3x^{2} - 7x + 2", r"(3x+1)(x-2)", False),
+    (r"(2x+1)^{3}", r"8x^{3}+6x^{2}+6x+1", False),
+    (r"\frac{x^{3}-8}{x-2}", r"x^{2}-2x+4", False),
+    (r"\frac{1}{x-1} - \frac{1}{x+1}", r"\frac{2x}{x^{2}-1}", False),
+    (r"\frac{x^{2}+5x+6}{x^{2}-4}", r"\frac{x+2}{x-2}", False),
+    (r"\frac{2x^{2}+3x-2}{x^{2}+x-2}", r"\frac{2x+1}{x-1}", False),
+    # Граничные случаи точного сравнения (rational.py). Первый шаг до него
+    # принимался: расхождение меньше tolerance во всех test_values. Второй
+    # не определён ни в одной из test_values
+    (r"(x+1)^{2}", r"x^{2}+2x+1+\frac{1}{10^{9}}", False),
+    (r"\frac{1}{(x-2)(x-5)(x-10)(x-50)(x-100)}", r"0", False),
+    # Сокращение дроби на множитель, обращающийся в нуль в одной из test_values
+    (r"\frac{x^{2}-4}{x-2}", r"x+2", True),
+    # Десятичные коэффициенты: точный путь неприменим, прежняя проверка с tolerance
+    (r"\frac{x}{2}+1", r"0.5x+1", True),
+]
+
+# solution_integral.check_algebraic_step: (prev, curr, is_correct)
+INTEGRAL_STEPS = [
+    (r"x - \int_{0}^{x} (x-t) t \, dt", r"x - \frac{x^{3}}{6}", True),
+    (r"\int_{0}^{x} t^{2} dt", r"\frac{x^{3}}{3}", True),
+    (r"x - \int_{0}^{x} (x-t)\left(t-\frac{t^{3}}{6}\right) dt", r"x - \frac{x^{3}}{6} + \frac{x^{5}}{120}", True),
+    (r"x - \int_{0}^{x} (x-t) t \, dt", r"x - \frac{x^{3}}{3}", False),
+    (r"\int_{0}^{x} t^{2} dt", r"\frac{x^{3}}{2}", False),
+    (r"x - \int_{0}^{x} (x-t)\left(t-\frac{t^{3}}{6}\right) dt", r"x - \frac{x^{3}}{6} + \frac{x^{5}}{24}", False),
+    # Нет элементарной первообразной: сравнение квадратурой после таймаута sp.integrate
+    (r"x - \int_{0}^{x} (x-t) e^{-t^{2}} \sin(t^{3}) dt", r"x + \int_{0}^{x} (t-x) e^{-t^{2}} \sin(t^{3}) dt", True),
+    (r"x - \int_{0}^{x} (x-t) e^{-t^{2}} \sin(t^{3}) dt", r"x - \int_{0}^{x} x e^{-t^{2}} \sin(t^{3}) dt", False),
+]
+
+# check_limit: (expression, limit_point, expected limit as string)
+LIMITS = [
+    (r"\left(\frac{2x+3}{5x+7}\right)^{x+1}", "oo", "0"),
+    (r"\left(\frac{x+3}{x+1}\right)^{2x+1}", "oo", "exp(4)"),
+    (r"\left(\frac{3x+4}{x+2}\right)^{2x}", "oo", "oo"),
+    (r"\frac{2x+1}{x-1}", "oo", "2"),
+]
+
+# check_phi_sequence для φ(x) = x - ∫₀ˣ (x-t)φ(t)dt: (phi_steps, ожидаемое число ошибок)
+PHI_SEQUENCES = [
+    (
+        [
+            {"steps": ["x"]},
+            {"steps": [r"x - \int_{0}^{x} (x-t) t \, dt", r"x - \frac{x^{3}}{6}"]},
+            {"steps": [r"x - \frac{x^{3}}{6} + \frac{x^{5}}{120}"]},
+        ],
+        0,
+    ),
+    (
+        [
+            {"steps": ["x"]},
+            {"steps": [r"x - \frac{x^{3}}{2}"]},
+            {"steps": [r"x - \frac{x^{3}}{6} + \frac{x^{5}}{120}"]},
+        ],
+        2,
+    ),
+]
+
+# check_integral_solution_final: (окончательный ответ, is_correct)
+FINAL_SOLUTIONS = [
+    (r"\sin x", True),
+    (r"\sin(x)", True),
+    (r"x", False),
+    (r"\cos x", False),
+    (r"x - \frac{x^{3}}{6}", False),
+]
+
+# check_integral_solution_final с уравнением задачи: (f, K, λ в синтаксисе SymPy, ответ, is_correct).
+# Негладкое и быстро растущее решения: численная невязка выше допуска, верный ответ
+# принимается по символьной невязке
+EQUATION_SOLUTIONS = [
+    ("Abs(x - 1) - Piecewise((x - x**2/2, x < 1), (1/2 + (x - 1)**2/2, True))", "1", "1",
+     r"\left|x-1\right|", True),
+    ("Abs(x - 1) - Piecewise((x - x**2/2, x < 1), (1/2 + (x - 1)**2/2, True))", "1", "1",
+     r"\left|x-1\right| + x", False),
+    ("1", "1", "40", r"e^{40x}", True),
+    ("1", "1", "40", r"e^{40x}+1", False),
+]
@@ -0,0 +1,382 @@
+"""
+Нагрузочный тест Flask API целиком на localhost.
+
+Запуск из каталога server/:
+    python -m benchmarks.loadtest --rate 20 --duration 60
+    python -m benchmarks.loadtest --server gunicorn --gunicorn-workers 4 --rate 40
+    python -m benchmarks.loadtest --mix limit=50,integral=10,tasks=30,login=8,report=2 --json out.json
+
+Харнесс создаёт временную SQLite-базу, заполняет её пользователями и задачами
+из TEMPLATES, поднимает приложение (встроенный сервер werkzeug в этом же
+процессе или gunicorn app:app в подпроцессе) и отправляет смесь запросов
+с заданной частотой (открытая модель нагрузки). Задержка считается от
+запланированного момента отправки, поэтому очередь на стороне клиента
+не скрывает перегрузку сервера. В конце печатается пропускная способность,
+p50/p95/p99 и доля ошибок по каждому эндпоинту.
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+DEFAULT_MIX = "limit=40,integral=15,tasks=30,login=10,report=5"
+PASSWORD = "loadtest-password"
+SEED = 20240601
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    unknown = set(weights) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_environment(workdir):
+    """Переменные окружения, направляющие приложение во временный каталог."""
+    env = {
+        "DATABASE_PATH": os.path.join(workdir, "loadtest.db"),
+        "SLOW_CAPTURE_PATH": os.path.join(workdir, "slow_expressions.jsonl"),
+        # Все запросы идут с одного адреса; нагрузочный тест меряет сервер, а не ограничение входа
+        "LOGIN_IP_BURST": "1000000",
+        "LOGIN_USER_BURST": "1000000",
+        "LOGIN_GLOBAL_BURST": "1000000",
+    }
+    os.environ.update(env)
+    return env
+
+
+def limit_steps(expression, expected_value, correct=True):
+    """Строит правдоподобное решение задачи на предел: исходное выражение, деление на x, ответ."""
+    import sympy as sp
+
+    x = sp.Symbol("x")
+    expr = sp.sympify(expression)
+    base, exponent = expr.as_base_exp()
+    num, den = sp.fraction(sp.together(base))
+    if not correct:
+        num = num + 1
+    step1 = sp.latex(expr)
+    step2 = (
+        rf"\left(\frac{{{sp.latex(sp.expand(num / x))}}}{{{sp.latex(sp.expand(den / x))}}}\right)"
+        rf"^{{{sp.latex(exponent)}}}"
+    )
+    answer = sp.latex(sp.sympify(expected_value))
+    return [step1, step2, answer]
+
+
+def seed_database(users_count, tasks_per_category):
+    """Создаёт пользователей и задачи во временной базе, возвращает данные для сценариев."""
+    from app import app
+    from utils.Auth.auth import issue_token
+    from utils.Auth.passwords import hash_password
+    from models import db, User, Task
+    from tasks_generator import TEMPLATES, generate_random_task
+
+    random.seed(SEED)
+    password_hash = hash_password(PASSWORD)
+    with app.app_context():
+        users = []
+        for i in range(users_count):
+            user = User(
+                firstname="Load", lastname=f"Test{i}", username=f"load{i}",
+                email=f"load{i}@localhost", password=password_hash, role="student",
+            )
+            db.session.add(user)
+            users.append(user.username)
+
+        limit_tasks, volterra_tasks = [], []
+        for category, bucket in (("limits", limit_tasks), ("integral_volterra_2", volterra_tasks)):
+            for template in TEMPLATES[category][:tasks_per_category]:
+                generated = generate_random_task(template)
+                task = Task(
+                    title=generated["title"], description=generated["description"],
+                    expression=generated["expression"], limitVar=generated["limitVar"],
+                    expected_value=generated["expected_value"], category=generated["category"],
+                )
+                db.session.add(task)
+                bucket.append(task)
+        db.session.commit()
+        tokens = {user: issue_token(User.query.filter_by(username=user).first()) for user in users}
+
+        limits = []
+        for task in limit_tasks:
+            try:
+                limits.append({
+                    "id": task.id,
+                    "correct": limit_steps(task.expression, task.expected_value, True),
+                    "wrong": limit_steps(task.expression, task.expected_value, False),
+                })
+            except Exception as e:
+                print(f"Пропущена задача {task.id}: {e}")
+        return {"users": users, "tokens": tokens, "limits": limits, "volterra": [t.id for t in volterra_tasks]}
+
+
+# --- Сценарии: (метод, путь, json, заголовки) по случайному выбору -------------
+
+PHI_CORRECT = [
+    {"steps": ["x"]},
+    {"steps": [r"x - \int_{0}^{x} (x-t) t \, dt", r"x - \frac{x^{3}}{6}"]},
+    {"steps": [r"x - \frac{x^{3}}{6} + \frac{x^{5}}{120}"]},
+]
+PHI_WRONG = [
+    {"steps": ["x"]},
+    {"steps": [r"x - \frac{x^{3}}{2}"]},
+]
+
+
+def _auth(rnd, seed):
+    # Проверки идут от имени случайного пользователя с его токеном
+    return {"Authorization": f"Bearer {seed['tokens'][rnd.choice(seed['users'])]}"}
+
+
+def scenario_limit(rnd, seed):
+    task = rnd.choice(seed["limits"])
+    steps = task["correct"] if rnd.random() < 0.7 else task["wrong"]
+    body = {"taskId": task["id"], "steps": list(steps)}
+    return "POST", "/api/solutions/check/limit", body, _auth(rnd, seed)
+
+
+def scenario_integral(rnd, seed):
+    correct = rnd.random() < 0.7
+    body = {
+        "taskId": rnd.choice(seed["volterra"]),
+        "phiSteps": PHI_CORRECT if correct else PHI_WRONG,
+        "finalSolution": r"\sin x" if correct else "x",
+    }
+    return "POST", "/api/solutions/check-integral", body, _auth(rnd, seed)
+
+
+def scenario_tasks(rnd, seed):
+    return "GET", "/api/tasks", None, None
+
+
+def scenario_login(rnd, seed):
+    return "POST", "/api/auth/login", {"username": rnd.choice(seed["users"]), "password": PASSWORD}, None
+
+
+def scenario_report(rnd, seed):
+    return "POST", "/api/reports/pdf", {"task_id": rnd.choice(seed["limits"])["id"]}, None
+
+
+SCENARIOS = {
+    "limit": scenario_limit,
+    "integral": scenario_integral,
+    "tasks": scenario_tasks,
+    "login": scenario_login,
+    "report": scenario_report,
+}
+
+
+# --- Запуск сервера ---------------------------------------------------------------
+
+def start_werkzeug(port):
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server.shutdown
+
+
+def start_gunicorn(port, workers, workdir, env):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--pythonpath", SERVER_DIR, "-w", str(workers),
+         "-b", f"127.0.0.1:{port}", "app:app"],
+        cwd=workdir, env={**os.environ, **env},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    def stop():
+        proc.terminate()
+        proc.wait(timeout=30)
+    return stop
+
+
+def wait_until_ready(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{base_url}/api/tasks", timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("Сервер не поднялся")
+
+
+# --- Генерация нагрузки -----------------------------------------------------------
+
+def run_load(base_url, seed, weights, rate, duration, concurrency):
+    rnd = random.Random(SEED)
+    names = list(weights)
+    cum_weights = [weights[n] for n in names]
+    jobs = queue.Queue()
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            name, scheduled, method, path, body, headers = job
+            status, error = None, None
+            try:
+                response = session.request(method, base_url + path, json=body, headers=headers, timeout=120)
+                status = response.status_code
+                response.content
+            except requests.RequestException as e:
+                error = str(e)
+            finished = time.perf_counter()
+            with samples_lock:
+                samples.append({
+                    "scenario": name,
+                    "latency_ms": (finished - scheduled) * 1000,
+                    "ok": error is None and status is not None and status < 400,
+                    "status": status,
+                })
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+
+    # Открытая модель: запросы планируются по расписанию, независимо от ответов сервера
+    start = time.perf_counter()
+    interval = 1.0 / rate
+    next_at = start
+    while next_at - start < duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        name = rnd.choices(names, weights=cum_weights)[0]
+        method, path, body, headers = SCENARIOS[name](rnd, seed)
+        jobs.put((name, next_at, method, path, body, headers))
+        next_at += rnd.expovariate(1.0 / interval)
+
+    for _ in threads:
+        jobs.put(None)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    summary = {}
+    for name in sorted({s["scenario"] for s in samples}) + ["ALL"]:
+        group = samples if name == "ALL" else [s for s in samples if s["scenario"] == name]
+        latencies = sorted(s["latency_ms"] for s in group)
+        errors = sum(1 for s in group if not s["ok"])
+        summary[name] = {
+            "requests": len(group),
+            "throughput_rps": round(len(group) / elapsed, 2),
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "statuses": {str(k): v for k, v in _count(s["status"] for s in group).items()},
+        }
+    return summary
+
+
+def _count(values):
+    counts = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+    return counts
+
+
+def print_summary(summary, elapsed):
+    print(f"\nДлительность: {elapsed:.1f} с")
+    print(f"{'endpoint':<10} {'req':>6} {'rps':>8} {'err %':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in summary.items():
+        print(f"{name:<10} {s['requests']:>6} {s['throughput_rps']:>8.2f} {s['error_rate'] * 100:>7.2f} "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API на localhost")
+    parser.add_argument("--rate", type=float, default=10.0, help="целевая частота запросов, req/s")
+    parser.add_argument("--duration", type=float, default=30.0, help="длительность, секунды")
+    parser.add_argument("--concurrency", type=int, default=32, help="число клиентских потоков")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"веса сценариев (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks-per-category", type=int, default=5)
+    parser.add_argument("--server", choices=["werkzeug", "gunicorn"], default="werkzeug")
+    parser.add_argument("--gunicorn-workers", type=int, default=2)
+    parser.add_argument("--json", dest="json_out", default=None, help="сохранить сводку в JSON")
+    parser.add_argument("--keep", action="store_true", help="не удалять временный каталог")
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    json_out = os.path.abspath(args.json_out) if args.json_out else None
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="limitapp-loadtest-")
+    # app.py пишет logs/app.log относительно текущего каталога
+    os.chdir(workdir)
+    env = prepare_environment(workdir)
+    stop = None
+    try:
+        print(f"Временный каталог: {workdir}")
+        print("Заполнение базы...")
+        seed = seed_database(args.users, args.tasks_per_category)
+
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        if args.server == "gunicorn":
+            stop = start_gunicorn(port, args.gunicorn_workers, workdir, env)
+        else:
+            stop = start_werkzeug(port)
+        wait_until_ready(base_url)
+
+        print(f"Нагрузка: {args.rate} req/s в течение {args.duration} с, смесь {weights}")
+        samples, elapsed = run_load(base_url, seed, weights, args.rate, args.duration, args.concurrency)
+        summary = summarize(samples, elapsed)
+        print_summary(summary, elapsed)
+        if json_out:
+            report = {"config": vars(args), "elapsed_s": round(elapsed, 3), "endpoints": summary}
+            with open(json_out, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    finally:
+        if stop:
+            stop()
+        os.chdir(original_cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
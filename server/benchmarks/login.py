@@ -0,0 +1,97 @@
+"""
+Пропускная способность входа на одно ядро при разных политиках хеширования.
+
+Запуск из каталога server/:
+    python -m benchmarks.login                                  # методы по умолчанию
+    python -m benchmarks.login --methods scrypt:16384:8:1,pbkdf2:sha256:600000 --repeat 50
+    python -m benchmarks.login --storm 300 --window 60           # сколько ядер нужно на массовый вход
+
+Для каждого метода замеряется проверка пароля (check_password_hash) в одном
+потоке, а для текущей политики (PASSWORD_HASH_METHOD) ещё и POST /api/auth/login
+целиком на временной базе. По времени входа оценивается, сколько ядер нужно,
+чтобы storm студентов вошли за window секунд.
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from werkzeug.security import check_password_hash
+
+from config import Config
+from utils.Auth.passwords import hash_password
+
+DEFAULT_METHODS = "scrypt:16384:8:1,scrypt:32768:8:1,pbkdf2:sha256:600000,pbkdf2:sha256:1000000"
+PASSWORD = "benchmark-password"
+
+
+def _timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def measure_verify(method, repeat):
+    stored = hash_password(PASSWORD, method)
+    return _timed(lambda: check_password_hash(stored, PASSWORD), repeat)
+
+
+def measure_endpoint(repeat):
+    """Вход через /api/auth/login по текущей политике на временной базе."""
+    workdir = tempfile.mkdtemp(prefix="limitapp-login-")
+    os.environ["DATABASE_PATH"] = os.path.join(workdir, "login.db")
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.environ['DATABASE_PATH']}"
+    # Меряется сам вход, а не ограничение попыток одного пользователя
+    Config.LOGIN_USER_BURST = Config.LOGIN_GLOBAL_BURST = float(repeat)
+    # app.py пишет logs/app.log относительно текущего каталога
+    os.chdir(workdir)
+    from app import app
+    from models import db, User
+
+    with app.app_context():
+        db.session.add(User(
+            firstname="Login", lastname="Bench", username="login-bench", email="login@localhost",
+            password=hash_password(PASSWORD), role="student",
+        ))
+        db.session.commit()
+    client = app.test_client()
+    body = {"username": "login-bench", "password": PASSWORD}
+
+    def login():
+        assert client.post("/api/auth/login", json=body).status_code == 200
+    return _timed(login, repeat)
+
+
+def _row(name, ms, storm, window):
+    per_core = 1000 / ms
+    cores = math.ceil(storm / (per_core * window))
+    print(f"  {name:<34} {ms:>9.1f} мс {per_core:>9.1f}/с  {cores:>5}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пропускная способность входа")
+    parser.add_argument("--methods", default=DEFAULT_METHODS, help="методы werkzeug через запятую")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--storm", type=int, default=300, help="студентов входят одновременно")
+    parser.add_argument("--window", type=float, default=60, help="за сколько секунд")
+    args = parser.parse_args(argv)
+
+    print(f"Медиана по {args.repeat} входам; ядер на {args.storm} входов за {args.window:g} с")
+    print(f"  {'метод':<34} {'вход':>12} {'на ядро':>11}  {'ядер':>5}")
+    for method in args.methods.split(","):
+        _row(method.strip(), measure_verify(method.strip(), args.repeat), args.storm, args.window)
+    _row(f"/api/auth/login ({Config.PASSWORD_HASH_METHOD})", measure_endpoint(args.repeat), args.storm, args.window)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Создание учётных записей: по одной через /api/auth/signup и списком через
+/api/auth/provision (utils/Auth/provisioning.py).
+
+Запуск из каталога server/:
+    python -m benchmarks.provision                       # 100 студентов, воркеров — по числу ядер
+    python -m benchmarks.provision --count 1000 --workers 8 --method scrypt:16384:8:1
+
+Оба способа работают на временной базе; время пересчитывается на cohort
+студентов (по умолчанию 1000). Почти всё время уходит на хеши паролей,
+поэтому выигрыш списка — это в основном число ядер для пула хеширования.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import types
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from config import Config
+
+
+def _roster(prefix, count):
+    return [
+        {"firstname": "Bench", "lastname": f"Student{i}", "username": f"{prefix}{i}",
+         "email": f"{prefix}{i}@localhost", "password": "benchmark-password"}
+        for i in range(count)
+    ]
+
+
+def run(count, workers):
+    workdir = tempfile.mkdtemp(prefix="limitapp-provision-")
+    os.environ["DATABASE_PATH"] = os.path.join(workdir, "provision.db")
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.environ['DATABASE_PATH']}"
+    Config.PROVISION_HASH_WORKERS = workers
+    # Замер идёт через test_client, без таймаута воркера gunicorn
+    Config.PROVISION_MAX_ROWS = max(Config.PROVISION_MAX_ROWS, count)
+    # app.py пишет logs/app.log относительно текущего каталога
+    os.chdir(workdir)
+    from app import app
+    from utils.Auth.auth import issue_token
+
+    client = app.test_client()
+    started = time.perf_counter()
+    for row in _roster("signup", count):
+        assert client.post("/api/auth/signup", json=row).status_code == 201
+    signup = time.perf_counter() - started
+
+    headers = {"Authorization": f"Bearer {issue_token(types.SimpleNamespace(id=1, role='admin'))}"}
+    started = time.perf_counter()
+    response = client.post("/api/auth/provision", json=_roster("bulk", count), headers=headers)
+    bulk = time.perf_counter() - started
+    assert response.status_code == 201 and response.get_json()["created"] == count
+    return signup, bulk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Создание учётных записей по одной и списком")
+    parser.add_argument("--count", type=int, default=100, help="студентов на замер")
+    parser.add_argument("--cohort", type=int, default=1000, help="на сколько студентов пересчитать")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="процессов хеширования")
+    parser.add_argument("--method", default=None, help="PASSWORD_HASH_METHOD для замера")
+    args = parser.parse_args(argv)
+    if args.method:
+        Config.PASSWORD_HASH_METHOD = args.method
+
+    signup, bulk = run(args.count, args.workers)
+    scale = args.cohort / args.count
+    print(f"{args.count} студентов, {Config.PASSWORD_HASH_METHOD}, воркеров: {args.workers}")
+    print(f"  {'':<22} {'замер':>9} {f'на {args.cohort}':>10}")
+    print(f"  {'/api/auth/signup':<22} {signup:>8.1f}с {signup * scale:>9.1f}с")
+    print(f"  {'/api/auth/provision':<22} {bulk:>8.1f}с {bulk * scale:>9.1f}с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Воспроизводимый бенчмарк проверяющих функций.
+
+Запуск из каталога server/:
+    python -m benchmarks.run                         # все бенчмарки, результат в benchmarks/results/
+    python -m benchmarks.run -k limit --repeat 10    # только бенчмарки, содержащие "limit"
+    python -m benchmarks.run --compare benchmarks/results/<старый>.json
+
+Каждый бенчмарк прогоняет фиксированный корпус из benchmarks/corpus.py.
+Перед каждым повтором очищаются кэш SymPy и кэш отпечатков LaTeX-строк
+(если не указан --warm), чтобы замеры не зависели от порядка запуска. Кроме времени сохраняются
+несовпадения с ожидаемыми вердиктами и digest результатов: при сравнении
+двух запусков видно, изменилось ли поведение, а не только скорость.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+import sympy as sp
+from sympy.core.cache import clear_cache
+
+from config import Config
+from fingerprint import clear_latex_cache
+
+# Бенчмарк не должен засорять корпус медленных выражений
+Config.SLOW_CAPTURE_THRESHOLD_MS = float("inf")
+
+import checker
+import slow_capture
+import solutions
+import solution_integral
+import volterra
+from tasks_generator import TEMPLATES, generate_random_task
+from benchmarks import corpus
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SEED = 20240601
+
+BENCHMARKS = {}
+
+
+def benchmark(name, calls):
+    """Регистрирует бенчмарк. Функция возвращает (outputs, mismatches)."""
+    def decorator(func):
+        BENCHMARKS[name] = {"func": func, "calls": calls}
+        return func
+    return decorator
+
+
+def _unwrap(func):
+    # Меряем саму проверку, без обёртки захвата медленных выражений
+    return getattr(func, "__wrapped__", func)
+
+
+@benchmark("solutions.safe_sympify", len(corpus.PARSE_EXPRESSIONS))
+def bench_solutions_parse():
+    parse = _unwrap(solutions.safe_sympify)
+    return [str(parse(expr)) for expr in corpus.PARSE_EXPRESSIONS], []
+
+
+@benchmark("solution_integral.safe_sympify", len(corpus.PARSE_EXPRESSIONS) - 1)
+def bench_integral_parse():
+    parse = _unwrap(solution_integral.safe_sympify)
+    # \lim разбирает только парсер solutions.py
+    exprs = [e for e in corpus.PARSE_EXPRESSIONS if not e.startswith("\\lim")]
+    return [str(parse(expr)) for expr in exprs], []
+
+
+def _run_step_corpus(check, steps):
+    outputs, mismatches = [], []
+    for prev, curr, expected in steps:
+        result = check(prev, curr)
+        outputs.append(result["is_correct"])
+        if result["is_correct"] != expected:
+            mismatches.append(f"{prev} -> {curr}: ожидалось {expected}, получено {result['is_correct']}")
+    return outputs, mismatches
+
+
+@benchmark("solutions.check_algebraic_step", len(corpus.LIMIT_STEPS))
+def bench_solutions_step():
+    return _run_step_corpus(_unwrap(solutions.check_algebraic_step), corpus.LIMIT_STEPS)
+
+
+@benchmark("solutions.check_algebraic_step[rational]", len(corpus.RATIONAL_STEPS))
+def bench_solutions_rational_step():
+    return _run_step_corpus(_unwrap(solutions.check_algebraic_step), corpus.RATIONAL_STEPS)
+
+
+@benchmark("solutions.check_algebra[chain]", len(corpus.RATIONAL_STEPS))
+def bench_algebra_chain():
+    # Путь /check/algebra: разбор шагов, проверка пар и отпечатки для сохранения в Step
+    outputs, mismatches = [], []
+    for prev, curr, expected in corpus.RATIONAL_STEPS:
+        parsed = checker.parse_steps([prev, curr], solutions.LIMIT_RULES)
+        result = checker.check_chain(parsed, solutions.LIMIT_RULES)[0]
+        fingerprints = [step.fingerprint for step in parsed]
+        outputs.append([result["is_correct"], None not in fingerprints])
+        if result["is_correct"] != expected:
+            mismatches.append(f"{prev} -> {curr}: ожидалось {expected}, получено {result['is_correct']}")
+    return outputs, mismatches
+
+
+@benchmark("solution_integral.check_algebraic_step", len(corpus.INTEGRAL_STEPS))
+def bench_integral_step():
+    return _run_step_corpus(_unwrap(solution_integral.check_algebraic_step), corpus.INTEGRAL_STEPS)
+
+
+@benchmark("solutions.check_limit", len(corpus.LIMITS))
+def bench_check_limit():
+    check = _unwrap(solutions.check_limit)
+    outputs, mismatches = [], []
+    for expr, point, expected in corpus.LIMITS:
+        result = check(expr, "x", point)
+        computed = result["computed_limit"]
+        outputs.append(str(computed))
+        expected_value = sp.sympify(expected)
+        if computed is None or (computed != expected_value and sp.simplify(computed - expected_value) != 0):
+            mismatches.append(f"{expr}: ожидалось {expected}, получено {computed}")
+    return outputs, mismatches
+
+
+@benchmark("solution_integral.check_phi_sequence", len(corpus.PHI_SEQUENCES))
+def bench_phi_sequence():
+    check = _unwrap(solution_integral.check_phi_sequence)
+    outputs, mismatches = [], []
+    for phi_steps, expected_errors in corpus.PHI_SEQUENCES:
+        errors = check(phi_steps)
+        outputs.append(len(errors))
+        if len(errors) != expected_errors:
+            mismatches.append(f"{phi_steps}: ожидалось ошибок {expected_errors}, получено {len(errors)}")
+    return outputs, mismatches
+
+
+@benchmark("solution_integral.check_integral_solution_final", len(corpus.FINAL_SOLUTIONS))
+def bench_integral_final():
+    check = _unwrap(solution_integral.check_integral_solution_final)
+    outputs, mismatches = [], []
+    for answer, expected in corpus.FINAL_SOLUTIONS:
+        result = check(answer)
+        outputs.append(result["is_correct"])
+        if result["is_correct"] != expected:
+            mismatches.append(f"{answer}: ожидалось {expected}, получено {result['is_correct']}")
+    return outputs, mismatches
+
+
+@benchmark("solution_integral.check_integral_solution_final[equation]", len(corpus.EQUATION_SOLUTIONS))
+def bench_integral_final_equation():
+    check = _unwrap(solution_integral.check_integral_solution_final)
+    symbols = {"x": volterra.x, "t": volterra.t}
+    outputs, mismatches = [], []
+    for f, kernel, lam, answer, expected in corpus.EQUATION_SOLUTIONS:
+        equation = tuple(sp.sympify(part, locals=symbols) for part in (f, kernel, lam))
+        result = check(answer, equation=equation)
+        outputs.append(result["is_correct"])
+        if result["is_correct"] != expected:
+            mismatches.append(f"{answer} ({f}): ожидалось {expected}, получено {result['is_correct']}")
+    return outputs, mismatches
+
+
+@benchmark("slow_capture.replay[integral.final]", len(corpus.EQUATION_SOLUTIONS))
+def bench_replay_integral_final():
+    # Круговой прогон: вызов с equation= записывается в корпус, replay должен
+    # восстановить уравнение из записи и вернуть тот же вердикт
+    check = solution_integral.check_integral_solution_final
+    symbols = {"x": volterra.x, "t": volterra.t}
+    saved = Config.SLOW_CAPTURE_PATH, Config.SLOW_CAPTURE_THRESHOLD_MS
+    outputs, mismatches = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.SLOW_CAPTURE_PATH = os.path.join(tmp, "slow_expressions.jsonl")
+        Config.SLOW_CAPTURE_THRESHOLD_MS = 0
+        try:
+            for f, kernel, lam, answer, expected in corpus.EQUATION_SOLUTIONS:
+                equation = tuple(sp.sympify(part, locals=symbols) for part in (f, kernel, lam))
+                check(answer, equation=equation, parsed=checker.ParsedStep(answer, solution_integral.INTEGRAL_RULES))
+        finally:
+            Config.SLOW_CAPTURE_PATH, Config.SLOW_CAPTURE_THRESHOLD_MS = saved
+            entries = slow_capture.load_corpus(os.path.join(tmp, "slow_expressions.jsonl"))
+    results = slow_capture.replay(entries)
+    if len(results) != len(corpus.EQUATION_SOLUTIONS):
+        mismatches.append(f"записано {len(results)} вызовов из {len(corpus.EQUATION_SOLUTIONS)}")
+    for (f, _, _, answer, expected), result in zip(corpus.EQUATION_SOLUTIONS, results):
+        verdict = (result["result"] or {}).get("is_correct")
+        outputs.append(verdict)
+        if "parsed" in result["kwargs"] or "equation" not in result["kwargs"]:
+            mismatches.append(f"{answer} ({f}): записаны kwargs {sorted(result['kwargs'])}")
+        if result["status"] != "ok" or verdict != expected:
+            mismatches.append(f"{answer} ({f}): replay {result['status']}, ожидалось {expected}, получено {verdict}")
+    return outputs, mismatches
+
+
+def _register_generation(category):
+    templates = TEMPLATES[category]
+
+    def bench():
+        # Фиксированный seed: одинаковые параметры задач при каждом запуске
+        random.seed(SEED)
+        return [generate_random_task(t).get("expected_value") for t in templates], []
+
+    benchmark(f"generate_random_task[{category}]", len(templates))(bench)
+
+
+for _category in TEMPLATES:
+    _register_generation(_category)
+
+
+def _digest(outputs):
+    return hashlib.sha1(json.dumps(outputs, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names, repeat, warm):
+    results = {}
+    for name in names:
+        entry = BENCHMARKS[name]
+        times = []
+        outputs, mismatches = None, []
+        for i in range(repeat):
+            if not warm:
+                clear_cache()
+                clear_latex_cache()
+            start = time.perf_counter()
+            run_outputs, run_mismatches = entry["func"]()
+            times.append(time.perf_counter() - start)
+            if i == 0:
+                outputs, mismatches = run_outputs, run_mismatches
+        median = statistics.median(times)
+        results[name] = {
+            "calls": entry["calls"],
+            "repeat": repeat,
+            "times_s": [round(t, 6) for t in times],
+            "min_s": round(min(times), 6),
+            "median_s": round(median, 6),
+            "per_call_ms": round(median / entry["calls"] * 1000, 3) if entry["calls"] else None,
+            "digest": _digest(outputs),
+            "outputs": json.loads(json.dumps(outputs, ensure_ascii=False, default=str)),
+            "mismatches": mismatches,
+        }
+        flag = f"  НЕСОВПАДЕНИЙ: {len(mismatches)}" if mismatches else ""
+        print(f"{name:<52} {results[name]['per_call_ms']:>10.3f} мс/вызов{flag}")
+    return results
+
+
+def compare(base, current):
+    print()
+    print(f"{'benchmark':<52} {'было мс':>10} {'стало мс':>10} {'ускорение':>10}")
+    for name, cur in current.items():
+        old = base.get(name)
+        if not old:
+            print(f"{name:<52} {'-':>10} {cur['per_call_ms']:>10.3f} {'-':>10}")
+            continue
+        speedup = old["per_call_ms"] / cur["per_call_ms"] if cur["per_call_ms"] else float("inf")
+        changed = "  (результаты изменились)" if old.get("digest") != cur.get("digest") else ""
+        print(f"{name:<52} {old['per_call_ms']:>10.3f} {cur['per_call_ms']:>10.3f} {speedup:>9.2f}x{changed}")
+        if changed:
+            _print_changed_outputs(old.get("outputs"), cur["outputs"])
+
+
+def _print_changed_outputs(old, new):
+    """Номера записей корпуса, на которых результат отличается от прошлого запуска."""
+    if old is None or len(old) != len(new):
+        print("    (в прошлом запуске нет результатов по записям или другой корпус)")
+        return
+    for i, (was, now) in enumerate(zip(old, new)):
+        if was != now:
+            print(f"    #{i}: {was} -> {now}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк проверяющих функций")
+    parser.add_argument("-k", dest="keyword", default=None, help="запускать только бенчмарки, содержащие подстроку")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="не очищать кэш SymPy между повторами")
+    parser.add_argument("--output", default=None, help="путь к JSON с результатами")
+    parser.add_argument("--compare", default=None, help="JSON предыдущего запуска для сравнения")
+    parser.add_argument("--list", action="store_true", help="показать список бенчмарков")
+    args = parser.parse_args(argv)
+
+    names = [n for n in BENCHMARKS if not args.keyword or args.keyword in n]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results = run_benchmarks(names, args.repeat, args.warm)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "sympy": sp.__version__,
+            "repeat": args.repeat,
+            "warm": args.warm,
+            "seed": SEED,
+        },
+        "benchmarks": results,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['commit'] or 'nocommit'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f)["benchmarks"], results)
+
+    return 1 if any(r["mismatches"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
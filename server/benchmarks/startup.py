@@ -0,0 +1,158 @@
+"""
+Бенчмарк времени старта приложения.
+
+Запуск из каталога server/:
+    python -m benchmarks.startup                        # 2 воркера, 3 повтора
+    python -m benchmarks.startup --workers 4 --repeat 5 --json out.json
+
+Замеряется:
+  * import — `python -c "import app"` в новом интерпретаторе;
+  * cold_start — от запуска gunicorn до первого ответа GET /api/tasks;
+  * first_check — первая проверка решения (POST /api/solutions/check/algebra);
+  * recycle — от SIGKILL всех воркеров до следующего ответа (мастер
+    поднимает новые воркеры, как после падения или --max-requests);
+  * recycled_first_check — первая проверка в перезапущенных воркерах.
+gunicorn запускается без конфига (каждый воркер импортирует приложение сам),
+с gunicorn.conf.py без прогрева (preload_app: импорт один раз в мастере,
+воркеры — fork) и с прогревом (warmup.py).
+Приложение работает на копии базы во временном каталоге.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONF = os.path.join(SERVER_DIR, "gunicorn.conf.py")
+# Режим -> (аргументы gunicorn, переменные окружения)
+MODES = {
+    "gunicorn": ([], {}),
+    "gunicorn+preload": (["-c", GUNICORN_CONF], {"WARMUP_ENABLED": "0"}),
+    "gunicorn+preload+warmup": (["-c", GUNICORN_CONF], {"WARMUP_ENABLED": "1"}),
+}
+_check_counter = iter(range(2, 10 ** 6))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _environment(workdir):
+    database = os.path.join(workdir, "startup.db")
+    source = os.path.join(SERVER_DIR, "database", "math_checker.db")
+    if os.path.exists(source):
+        shutil.copy(source, database)
+    return {
+        **os.environ,
+        "DATABASE_PATH": database,
+        "SLOW_CAPTURE_PATH": os.path.join(workdir, "slow_expressions.jsonl"),
+        "PYTHONPATH": SERVER_DIR,
+    }
+
+
+def _wait_for_response(url, deadline_s=120):
+    deadline = time.perf_counter() + deadline_s
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(url, timeout=deadline_s).status_code == 200:
+                return
+        except requests.ConnectionError:
+            time.sleep(0.01)
+    raise RuntimeError("Сервер не ответил")
+
+
+def _first_check(base_url):
+    """Время проверки решения, которое ещё не встречалось (отпечатки не закэшированы)."""
+    k = next(_check_counter)
+    steps = [rf"\frac{{x^2-{k * k}}}{{x-{k}}}", rf"\frac{{(x-{k})(x+{k})}}{{x-{k}}}", f"x+{k}"]
+    started = time.perf_counter()
+    response = requests.post(f"{base_url}/api/solutions/check/algebra",
+                             json={"taskId": 1, "user": "startup", "steps": steps}, timeout=120)
+    response.raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def _workers(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def measure_import(workdir, env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], cwd=workdir, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return {"import": (time.perf_counter() - started) * 1000}
+
+
+def measure_gunicorn(workdir, env, workers, extra_args):
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    url = f"{base_url}/api/tasks"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", *extra_args, "-w", str(workers),
+         "-b", f"127.0.0.1:{port}", "app:app"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_response(url)
+        cold_start = (time.perf_counter() - started) * 1000
+        first_check = _first_check(base_url)
+        # Даём всем воркерам догрузиться, чтобы recycle мерил только перезапуск
+        time.sleep(1 + workers)
+        started = time.perf_counter()
+        for pid in _workers(proc.pid):
+            os.kill(pid, signal.SIGKILL)
+        _wait_for_response(url)
+        recycle = (time.perf_counter() - started) * 1000
+        recycled_first_check = _first_check(base_url)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {"cold_start": cold_start, "first_check": first_check,
+            "recycle": recycle, "recycled_first_check": recycled_first_check}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время старта приложения")
+    parser.add_argument("--workers", type=int, default=2, help="число воркеров gunicorn")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_out", default=None, help="сохранить сводку в JSON")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="limitapp-startup-")
+    env = _environment(workdir)
+    samples = {}
+    try:
+        for _ in range(args.repeat):
+            for name, value in measure_import(workdir, env).items():
+                samples.setdefault(name, []).append(value)
+            for mode, (extra_args, extra_env) in MODES.items():
+                results = measure_gunicorn(workdir, {**env, **extra_env}, args.workers, extra_args)
+                for name, value in results.items():
+                    samples.setdefault(f"{mode} {name}", []).append(value)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = {name: round(statistics.median(values), 1) for name, values in samples.items()}
+    print(f"Медиана по {args.repeat} повторам, воркеров: {args.workers}")
+    for name, value in summary.items():
+        print(f"  {name:<44} {value:>9.1f} мс")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "median_ms": summary, "samples_ms": samples}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+История чата: сообщения строками и архивные сегменты.
+
+Раньше вся история хранилась одной JSON-строкой в User.chat_history, и
+каждое новое сообщение переписывало её целиком. Теперь:
+  * новое сообщение — одна строка ChatMessage (INSERT, без чтения истории);
+  * когда у пользователя набирается CHAT_LIVE_MESSAGES + CHAT_SEGMENT_SIZE
+    строк, самые старые CHAT_SEGMENT_SIZE пакуются в ChatSegment — JSON,
+    сжатый zlib, — и удаляются из таблицы сообщений. Упаковка случается раз
+    на CHAT_SEGMENT_SIZE сообщений, поэтому запись остаётся O(1) в среднем;
+  * чтение идёт страницами от новых к старым (курсор before — id сообщения):
+    последние сообщения берутся из таблицы, а сегменты распаковываются,
+    только если страница уходит в архив.
+Старая строка User.chat_history переносится при первом обращении к истории
+пользователя или сразу для всех: python chat_history.py migrate (из server/).
+
+GET  /chat_history?limit=50&before=<id> — страница истории
+POST /chat_history {"role": "user"|"model", "message": "..."} — добавить сообщение
+Пользователь определяется только по токену (g.user_id); без токена — 401.
+"""
+import argparse
+import json
+import logging
+import sys
+import zlib
+
+from flask import Blueprint, g, jsonify, request
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from models import db, ChatMessage, ChatSegment, User
+
+chat_history_bp = Blueprint('chat_history', __name__, url_prefix='/chat_history')
+
+ROLES = ("user", "model")
+
+
+class ArchiveConflict(Exception):
+    """Сообщения, которые пакует _archive, уже упаковал параллельный запрос."""
+
+
+def _pack(entries):
+    return zlib.compress(json.dumps(entries, ensure_ascii=False).encode("utf-8"))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def _entry(message):
+    created_at = message.created_at.isoformat() if message.created_at else None
+    return [message.id, message.role, message.message, created_at]
+
+
+def _archive(user_id):
+    """
+    Пакует самые старые сообщения в сегменты, пока в таблице их больше предела.
+    Сообщения удаляются до записи сегмента: если их уже упаковал параллельный
+    запрос, удалится меньше строк — тогда ArchiveConflict, и транзакцию нужно
+    откатить. Уникальный индекс (user_id, first_message_id) не даст записать
+    дубликат сегмента и в остальных случаях (IntegrityError при flush).
+    """
+    live = db.session.query(func.count(ChatMessage.id)).filter(ChatMessage.user_id == user_id).scalar()
+    while live >= Config.CHAT_LIVE_MESSAGES + Config.CHAT_SEGMENT_SIZE:
+        oldest = (ChatMessage.query.filter(ChatMessage.user_id == user_id)
+                  .order_by(ChatMessage.id).limit(Config.CHAT_SEGMENT_SIZE).all())
+        deleted = ChatMessage.query.filter(ChatMessage.id.in_([message.id for message in oldest])).delete(
+            synchronize_session=False)
+        if deleted != len(oldest):
+            raise ArchiveConflict(f"сообщения чата пользователя {user_id} уже упакованы")
+        db.session.add(ChatSegment(
+            user_id=user_id,
+            first_message_id=oldest[0].id,
+            last_message_id=oldest[-1].id,
+            count=len(oldest),
+            data=_pack([_entry(message) for message in oldest]),
+        ))
+        db.session.flush()
+        live -= len(oldest)
+
+
+def migrate_legacy(user_id):
+    """Переносит User.chat_history в ChatMessage/ChatSegment. Возвращает число перенесённых сообщений."""
+    raw = db.session.query(User.chat_history).filter(
+        User.id == user_id, User.chat_history.isnot(None)).scalar()
+    if raw is None:
+        return 0
+    try:
+        history = json.loads(raw) if raw.strip() else []
+        if not isinstance(history, list):
+            raise ValueError("ожидался список сообщений")
+    except ValueError as e:
+        # Строка остаётся в User.chat_history, чтобы её можно было восстановить вручную
+        logging.warning(f"История чата пользователя {user_id} не разобрана и не перенесена: {e}")
+        return 0
+    messages = [
+        ChatMessage(user_id=user_id, role=str(item.get("role") or "user"), message=str(item.get("message") or ""),
+                    created_at=None)
+        for item in history if isinstance(item, dict)
+    ]
+    db.session.add_all(messages)
+    db.session.flush()
+    _archive(user_id)
+    User.query.filter(User.id == user_id).update({User.chat_history: None}, synchronize_session=False)
+    return len(messages)
+
+
+def append_message(user_id, role, message):
+    """Добавляет сообщение в историю пользователя и сохраняет его."""
+    for attempt in range(2):
+        try:
+            migrate_legacy(user_id)
+            row = ChatMessage(user_id=user_id, role=role, message=message)
+            db.session.add(row)
+            db.session.flush()
+            _archive(user_id)
+            db.session.commit()
+            return row.id
+        except (ArchiveConflict, IntegrityError) as e:
+            # Те же сообщения упаковал параллельный запрос: повтор видит уже упакованную историю
+            db.session.rollback()
+            if attempt:
+                raise
+            logging.info(f"Повтор записи сообщения чата: {e}")
+
+
+def _has_older(user_id, cutoff):
+    if db.session.query(ChatMessage.id).filter(
+            ChatMessage.user_id == user_id, ChatMessage.id < cutoff).first():
+        return True
+    return db.session.query(ChatSegment.id).filter(
+        ChatSegment.user_id == user_id, ChatSegment.first_message_id < cutoff).first() is not None
+
+
+def read_history(user_id, limit=None, before=None):
+    """
+    До limit сообщений старше before (или последних) в хронологическом порядке
+    и курсор для следующей, более старой страницы (None — старше ничего нет).
+    """
+    limit = limit or Config.CHAT_PAGE_SIZE
+    try:
+        if migrate_legacy(user_id):
+            db.session.commit()
+    except (ArchiveConflict, IntegrityError):
+        # Старую историю одновременно перенёс параллельный запрос
+        db.session.rollback()
+    query = ChatMessage.query.filter(ChatMessage.user_id == user_id)
+    if before is not None:
+        query = query.filter(ChatMessage.id < before)
+    # Собираются от новых к старым
+    entries = [_entry(message) for message in query.order_by(ChatMessage.id.desc()).limit(limit)]
+    cutoff = entries[-1][0] if entries else before
+    while len(entries) < limit:
+        query = ChatSegment.query.filter(ChatSegment.user_id == user_id)
+        if cutoff is not None:
+            query = query.filter(ChatSegment.first_message_id < cutoff)
+        segment = query.order_by(ChatSegment.first_message_id.desc()).first()
+        if segment is None:
+            break
+        older = [entry for entry in _unpack(segment.data) if cutoff is None or entry[0] < cutoff]
+        taken = older[-(limit - len(entries)):]
+        entries.extend(reversed(taken))
+        cutoff = taken[0][0]
+
+    next_before = entries[-1][0] if entries and _has_older(user_id, entries[-1][0]) else None
+    messages = [
+        {"id": message_id, "role": role, "message": message, "created_at": created_at}
+        for message_id, role, message, created_at in reversed(entries)
+    ]
+    return messages, next_before
+
+
+@chat_history_bp.route('', methods=['GET'])
+def get_chat_history():
+    # История чата личная: ?username= больше не принимается, нужен токен
+    user_id = g.get("user_id")
+    if user_id is None:
+        return jsonify({"error": "Authorization required"}), 401
+    try:
+        limit = min(max(int(request.args.get('limit', Config.CHAT_PAGE_SIZE)), 1), Config.CHAT_PAGE_MAX)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    before = request.args.get('before')
+    if before is not None:
+        if not (before.isascii() and before.isdigit()):
+            return jsonify({"error": "before must be a non-negative integer"}), 400
+        before = int(before)
+    messages, next_before = read_history(user_id, limit, before)
+    return jsonify({"chat_history": messages, "next_before": next_before}), 200
+
+
+@chat_history_bp.route('', methods=['POST'])
+def post_chat_message():
+    user_id = g.get("user_id")
+    if user_id is None:
+        return jsonify({"error": "Authorization required"}), 401
+    data = request.get_json(silent=True) or {}
+    role, message = data.get('role'), data.get('message')
+    if role not in ROLES or not isinstance(message, str) or not message:
+        return jsonify({"error": f"role ({', '.join(ROLES)}) and message are required"}), 400
+    message_id = append_message(user_id, role, message)
+    return jsonify({"id": message_id}), 201
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="История чата")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="перенести User.chat_history всех пользователей в сообщения и сегменты")
+    parser.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(User.chat_history.isnot(None))]
+        migrated = 0
+        for user_id in user_ids:
+            migrated += migrate_legacy(user_id)
+            db.session.commit()
+        print(f"Перенесено сообщений: {migrated}, пользователей: {len(user_ids)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
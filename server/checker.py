@@ -1,57 +1,270 @@
+"""
+Единый движок проверки шагов решения.
+
+Каждый присланный шаг разбирается ровно один раз: шаги превращаются в список
+ParsedStep, выражение и отпечаток которых вычисляются лениво и запоминаются,
+а затем проверяются все соседние пары. Для N шагов это N разборов вместо
+2N − 2 (раньше каждый шаг разбирался и как «предыдущий», и как «текущий»).
+
+Порядок проверок один для всех эндпоинтов; отличия задаются объектом Rules:
+функция разбора (например, с вычислением интегралов), точки и допуск
+численной проверки, формат подсказок и фаза для slow_capture.
+
+Порядок проверки пары шагов:
+  1. маркер LIMIT — пара не проверяется;
+  2. оба шага \\lim_{...} — сравниваются выражения под знаком предела;
+  3. рациональные функции от x — точно через sp.Poly (rational.py);
+  4. совпадение отпечатков — эквивалентность без sp.simplify;
+  5. невычисленные интегралы — сравнение значений, посчитанных квадратурой;
+  6. sp.simplify(prev − curr) == 0;
+  7. численная проверка в точках rules.test_values.
+"""
+import functools
+import hashlib
+import logging
+import re
+
+import latex2sympy2
+import numpy as np
 import sympy as sp
+from latex2sympy2 import latex2sympy
 
-def safe_sympify(expr):
-    """Безопасное преобразование выражения в sympy-формат."""
-    try:
-        if expr == "LIMIT":
-            # Если приходит LIMIT, сразу возвращаем что-то
-            # Но лучше вообще не передавать его как expr :)
-            return sp.Integer(0)  # заглушка
-        expr = expr.replace("e^{", "exp(").replace(r"\ln", "log")
-        return sp.sympify(expr)
-    except Exception as e:
-        raise ValueError(f"Ошибка преобразования выражения '{expr}': {e}")
+import integration
+import limits
+import rational
+from fingerprint import fingerprint, latex_fingerprint, remember
+from slow_capture import capture_slow
 
-def check_algebraic_step(prev_expr_str, curr_expr_str, tolerance=1e-6):
+x = sp.Symbol("x")
+LIMIT_MARKER = "LIMIT"
+NUMERIC_TEST_POINTS = np.array([0.25, 0.5, 1.0, 1.5, 2.0, 3.0])
+QUADRATURE_TOLERANCE = 1e-8
+
+_LIM_WITH_POINT = re.compile(r"\\lim_\{([^}]+)\\to\s*([^}]+)\}(.*)")
+_LIM_PREFIX = re.compile(r"\\lim_\{([^}]+)\}(.*)")
+
+
+def parse_latex(expr):
+    """
+    Преобразует LaTeX-выражение в sympy. Выражение \\lim_{x\\to a}(...) сразу
+    заменяется значением предела; маркер LIMIT даёт 0.
+    """
     try:
-        # Если в prev_expr_str = "LIMIT", можно пропустить проверку
-        if prev_expr_str == "LIMIT":
-            return {"is_correct": True, "error_type": None, "hint": "LIMIT как предыдущий шаг пропущен."}
-
-        prev_expr = sp.simplify(safe_sympify(prev_expr_str))
-        curr_expr = sp.simplify(safe_sympify(curr_expr_str))
-        if prev_expr.equals(curr_expr):
-            return {"is_correct": True, "error_type": None, "hint": ""}
-        # Доп.числовая проверка
-        for val in [1, 2, 3]:
-            if abs(prev_expr.subs({'x': val}) - curr_expr.subs({'x': val})) > tolerance:
-                return {
-                    "is_correct": False,
-                    "error_type": "algebraic_error",
-                    "hint": "Ошибка в алгебраических преобразованиях. Проверьте сокращение или вынесение множителя."
-                }
-        return {"is_correct": True, "error_type": None, "hint": ""}
+        expr_strip = expr.strip()
+        if expr_strip.upper() == LIMIT_MARKER:
+            return sp.Integer(0)
+        match = _LIM_WITH_POINT.search(expr_strip) if expr_strip.startswith("\\lim") else None
+        if not match:
+            return latex2sympy(expr_strip)
+        var_str, limit_val_str, rest = (g.strip() for g in match.groups())
+        # Если после выражения есть лишний текст, берём содержимое от \left( до \right)
+        start = rest.find("\\left(")
+        end = rest.rfind("\\right)")
+        inner_expr_str = rest[start:end + len("\\right)")] if start != -1 and end > start else rest
+        if limit_val_str in ["∞", "\\infty", "infty", "infinity"]:
+            limit_val = sp.oo
+        elif limit_val_str in ["-∞", "-\\infty", "-infty", "-infinity"]:
+            limit_val = -sp.oo
+        else:
+            limit_val = parse_latex(limit_val_str)
+        computed_limit = limits.limit(latex2sympy(inner_expr_str), sp.Symbol(var_str), limit_val)
+        logging.info(f"Вычислен предел для {expr_strip}: {computed_limit}")
+        return computed_limit
     except Exception as e:
-        return {"is_correct": False, "error_type": "parse_error", "hint": f"Ошибка парсинга: {str(e)}"}
+        logging.error(f"Expression parsing error: '{expr}' - {str(e)}")
+        raise ValueError(f"Cannot parse expression '{expr}': {str(e)}")
+    finally:
+        # latex2sympy2 записывает символ дифференциала (dt после \int ... dt + ...)
+        # в свой глобальный словарь var, после чего падают все следующие разборы
+        if not isinstance(latex2sympy2.var, dict):
+            latex2sympy2.var = {}
+
+
+class Rules:
+    """
+    Настройки проверки для эндпоинта.
+
+    parse       — LaTeX -> sympy (разбор выполняется один раз на шаг);
+    test_values — значения x для численной проверки;
+    tolerance   — допустимое расхождение значений в этих точках;
+    hint        — шаблон подсказки при расхождении значений: {val}, {prev}, {curr};
+    inner_hint  — то же для сравнения выражений под \\lim;
+    error_hint  — шаблон подсказки при ошибке разбора: {error};
+    phase       — фаза slow_capture для проверки пары шагов.
+    """
+
+    def __init__(self, parse, test_values, tolerance, hint, inner_hint=None, error_hint="{error}", phase=None):
+        self.parse = parse
+        self.test_values = test_values
+        self.tolerance = tolerance
+        self.hint = hint
+        self.inner_hint = inner_hint or hint
+        self.error_hint = error_hint
+        check = functools.partial(check_pair, rules=self)
+        self.check_pair = capture_slow(phase)(check) if phase else check
+
+
+class ParsedStep:
+    """Шаг решения: LaTeX и лениво вычисляемые выражение, выражение под \\lim и отпечаток."""
+
+    _UNSET = object()
+
+    def __init__(self, latex, rules):
+        self.latex = str(latex)
+        self.rules = rules
+        self.is_marker = self.latex.strip().upper() == LIMIT_MARKER
+        self._expr = self._inner = self._fingerprint = self._UNSET
+        self._error = None
+
+    def __str__(self):
+        # slow_capture сохраняет аргументы строкой — для повторного прогона нужен исходный LaTeX
+        return self.latex
+
+    @property
+    def expr(self):
+        if self._expr is self._UNSET:
+            try:
+                self._expr = self.rules.parse(self.latex)
+            except Exception as e:
+                self._expr, self._error = None, str(e)
+        if self._error is not None:
+            raise ValueError(self._error)
+        return self._expr
+
+    @property
+    def inner(self):
+        """Выражение под знаком \\lim_{...} или None, если шаг не начинается с \\lim."""
+        if self._inner is self._UNSET:
+            match = _LIM_PREFIX.search(self.latex) if self.latex.strip().startswith("\\lim") else None
+            self._inner = self.rules.parse(match.group(2).strip()) if match else None
+        return self._inner
+
+    @property
+    def fingerprint(self):
+        """Отпечаток для Step.fingerprint; без повторного разбора, если шаг уже разобран."""
+        if self._fingerprint is self._UNSET:
+            if self.is_marker:
+                self._fingerprint = None
+            elif self.latex.strip().startswith("\\lim"):
+                # Отпечаток шага с \lim — по выражению под пределом: значение предела
+                # заново не вычисляется, а inner обычно уже разобран при сравнении пары
+                self._fingerprint = latex_fingerprint(self.latex, lambda _: self._limit_fingerprint(), self.rules)
+            elif self._expr is not self._UNSET:
+                self._fingerprint = None if self._error else _fingerprint(self._expr)
+                remember(self.latex, self._fingerprint, self.rules)
+            else:
+                self._fingerprint = latex_fingerprint(self.latex, lambda _: _fingerprint(self.expr), self.rules)
+        return self._fingerprint
+
+    def _limit_fingerprint(self):
+        inner_fp = _fingerprint(self.inner)
+        if inner_fp is None:
+            raise ValueError("отпечаток выражения под пределом не вычислен")
+        # Точка предела входит в отпечаток: \lim_{x\to 0} f и \lim_{x\to\infty} f различаются
+        point = re.sub(r"\s+", "", _LIM_PREFIX.search(self.latex).group(1))
+        return "l" + hashlib.sha1(f"{point}:{inner_fp}".encode("utf-8")).hexdigest()[:15]
+
 
-def check_limit(last_expr_str, expected_value_str):
+def _fingerprint(expr):
+    # Отпечаток с невычисленным интегралом потребовал бы медленного evalf
+    return None if expr.has(sp.Integral) else fingerprint(expr)
+
+
+def parse_steps(latexes, rules):
+    return [ParsedStep(latex, rules) for latex in latexes]
+
+
+def as_parsed(step, rules):
+    return step if isinstance(step, ParsedStep) else ParsedStep(step, rules)
+
+
+def _ok():
+    return {"is_correct": True, "error_type": None, "hint": None}
+
+
+def _mismatch(hint_template, val, prev, curr):
+    return {
+        "is_correct": False,
+        "error_type": "algebraic_error",
+        "hint": hint_template.format(val=val, prev=float(prev), curr=float(curr)),
+    }
+
+
+def _compare(prev, curr, rules, hint_template, prev_fp=None, curr_fp=None):
+    exact = rational.compare(prev, curr, x, rules.test_values)
+    if exact is not None:
+        is_equal, point = exact
+        if is_equal:
+            return _ok()
+        if point is None:
+            return {"is_correct": False, "error_type": "algebraic_error", "hint": "Выражения не равны тождественно"}
+        return _mismatch(hint_template, *point)
+    if prev_fp is not None and prev_fp == curr_fp:
+        return _ok()
+    if prev.has(sp.Integral) or curr.has(sp.Integral):
+        return _compare_numerically(prev, curr, hint_template)
+    if sp.simplify(prev - curr) == 0:
+        return _ok()
+    for val in rules.test_values:
+        try:
+            prev_val = float(prev.evalf(subs={x: val}))
+            curr_val = float(curr.evalf(subs={x: val}))
+        except Exception as e:
+            logging.debug(f"Шаг не вычисляется при x={val}: {e}")
+            continue
+        if abs(prev_val - curr_val) > rules.tolerance:
+            return _mismatch(hint_template, val, prev_val, curr_val)
+    return _ok()
+
+
+def _compare_numerically(prev, curr, hint_template):
+    """Сравнение по значениям в NUMERIC_TEST_POINTS; интегралы считаются квадратурой."""
+    prev_vals = integration.numeric_values(prev, x, NUMERIC_TEST_POINTS)
+    curr_vals = integration.numeric_values(curr, x, NUMERIC_TEST_POINTS)
+    error = np.abs(prev_vals - curr_vals) / np.maximum(1.0, np.abs(prev_vals))
+    if np.all(error <= QUADRATURE_TOLERANCE):
+        return _ok()
+    worst = int(np.argmax(error))
+    return _mismatch(hint_template, NUMERIC_TEST_POINTS[worst], prev_vals[worst].real, curr_vals[worst].real)
+
+
+def check_pair(prev, curr, rules):
+    """Проверяет переход prev -> curr (ParsedStep). Результат: is_correct, error_type, hint."""
     try:
-        x = sp.Symbol('x')
-        last_expr = safe_sympify(last_expr_str)
-        computed_limit = sp.limit(last_expr, x, sp.oo)
-        expected_value = safe_sympify(expected_value_str)
-        if sp.simplify(computed_limit - expected_value) == 0:
-            return {"is_correct": True, "computed_limit": computed_limit, "error_type": None, "hint": ""}
-        else:
-            return {
-                "is_correct": False,
-                "computed_limit": computed_limit,
-                "error_type": "limit_error",
-                "hint": f"Ожидаемый предел: {expected_value}"
-            }
+        if prev.is_marker or curr.is_marker:
+            return _ok()
+        if prev.inner is not None and curr.inner is not None:
+            return _compare(prev.inner, curr.inner, rules, rules.inner_hint)
+        return _compare(prev.expr, curr.expr, rules, rules.hint, prev.fingerprint, curr.fingerprint)
     except Exception as e:
-        return {
-            "is_correct": False,
-            "error_type": "limit_parse_error",
-            "hint": f"Ошибка вычисления предела: {str(e)}"
-        }
+        logging.error(f"Ошибка при проверке шага: {str(e)}")
+        return {"is_correct": False, "error_type": "parse_error", "hint": rules.error_hint.format(error=e)}
+
+
+def iter_chain(steps, rules, known=None):
+    """
+    Результаты проверки соседних пар списка ParsedStep — по мере готовности каждой пары.
+    known(prev, curr) может вернуть уже известный вердикт пары (resubmission.py) — тогда пара не проверяется.
+    """
+    for i in range(len(steps) - 1):
+        verdict = known(steps[i], steps[i + 1]) if known else None
+        yield verdict if verdict is not None else rules.check_pair(steps[i], steps[i + 1])
+
+
+def check_chain(steps, rules, known=None):
+    """Результаты проверки всех соседних пар списка ParsedStep (len(steps) − 1 элементов)."""
+    return list(iter_chain(steps, rules, known))
+
+
+DEFAULT_RULES = Rules(
+    parse=parse_latex,
+    test_values=[1, 2, 3, 5, 10, 100],
+    tolerance=1e-6,
+    hint="При x={val}: было {prev:.6f}, стало {curr:.6f}",
+)
+
+
+def check_step(prev_expr_str, curr_expr_str, rules=None):
+    """Проверка одной пары шагов по строкам (для routes.py и обёрток в эндпоинтах)."""
+    rules = rules or DEFAULT_RULES
+    return check_pair(as_parsed(prev_expr_str, rules), as_parsed(curr_expr_str, rules), rules)
@@ -1,7 +1,7 @@
 import os
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, "database", "math_checker.db")
+DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(BASE_DIR, "database", "math_checker.db"))
 
 # Используем абсолютный путь
 print("DATABASE_PATH:", DATABASE_PATH)  # 🔹 Вывод пути в консоль
@@ -14,10 +14,94 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, "database", "math_checker.db")
+DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(BASE_DIR, "database", "math_checker.db"))
+
+
+def _priority_weights(value):
+    """Веса классов приоритета из "exam=8,homework=4,..."; вес должен быть положительным."""
+    weights = {}
+    for item in value.split(','):
+        if not item:
+            continue
+        name, weight = (part.strip() for part in item.split('='))
+        weights[name] = int(weight)
+        if weights[name] <= 0:
+            raise ValueError(f"CHECK_PRIORITY_WEIGHTS: вес класса {name} должен быть больше нуля")
+    return weights
 
 class Config:
     DB_SECRET_KEY = os.getenv('DB_SECRET_KEY', '23e629b053aeda6ff423b58a99f861cecd1670e05af7bb9ea55757f419e2a0dcdab40e36e772fbf55ef0ba5533527e4360ad2c25b740336049a9d30667ca126c')
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{DATABASE_PATH}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEBUG = True
+
+    # Захват медленных выражений (см. slow_capture.py)
+    SLOW_CAPTURE_THRESHOLD_MS = float(os.getenv('SLOW_CAPTURE_THRESHOLD_MS', '1000'))
+    SLOW_CAPTURE_PATH = os.getenv('SLOW_CAPTURE_PATH', os.path.join(BASE_DIR, "logs", "slow_expressions.jsonl"))
+    SLOW_CAPTURE_MAX_BYTES = int(os.getenv('SLOW_CAPTURE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+    # Индекс типичных ошибок (см. mistakes.py)
+    MISTAKE_INDEX_PATH = os.getenv('MISTAKE_INDEX_PATH', os.path.join(BASE_DIR, "database", "mistake_index.tsv"))
+    MISTAKE_HINTS_PATH = os.getenv('MISTAKE_HINTS_PATH', os.path.join(BASE_DIR, "database", "mistake_hints.json"))
+
+    # Вычисление интегралов в шагах (см. integration.py)
+    INTEGRATION_TIME_BUDGET_S = float(os.getenv('INTEGRATION_TIME_BUDGET_S', '2'))
+    # Процессов для sp.integrate вне главного потока (потоковые воркеры, ASGI-шлюз)
+    INTEGRATION_WORKERS = int(os.getenv('INTEGRATION_WORKERS', '1'))
+
+    # Пошаговая проверка: сессии с разобранными шагами решений (см. step_sessions.py)
+    STEP_SESSION_TTL_S = float(os.getenv('STEP_SESSION_TTL_S', '1800'))
+    STEP_SESSION_MAX_SIZE = int(os.getenv('STEP_SESSION_MAX_SIZE', '1024'))
+
+    # ASGI-шлюз: пул процессов для тяжёлых запросов и контроль допуска (см. asgi.py)
+    CHECK_WORKERS = int(os.getenv('CHECK_WORKERS', str(os.cpu_count() or 2)))
+    CHECK_QUEUE_LIMIT = int(os.getenv('CHECK_QUEUE_LIMIT', '32'))
+    CHECK_PER_USER_LIMIT = int(os.getenv('CHECK_PER_USER_LIMIT', '2'))
+    # Веса классов приоритета ("exam=8,homework=4,practice=2,generation=1") и слоты только для экзамена
+    CHECK_PRIORITY_WEIGHTS = _priority_weights(os.getenv('CHECK_PRIORITY_WEIGHTS', ''))
+    CHECK_EXAM_RESERVED = int(os.getenv('CHECK_EXAM_RESERVED', '1'))
+    # Срок токена с экзаменационным классом приоритета (/api/auth/exam-token)
+    EXAM_TOKEN_HOURS = int(os.getenv('EXAM_TOKEN_HOURS', '4'))
+
+    # Прогрев процесса перед первыми запросами (см. warmup.py)
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', '1') == '1'
+    WARMUP_STEP_LIMIT = int(os.getenv('WARMUP_STEP_LIMIT', '50'))
+    WARMUP_TIME_BUDGET_S = float(os.getenv('WARMUP_TIME_BUDGET_S', '3'))
+
+    # Кэш раскодированных JWT (см. utils/Auth/middleware.py)
+    AUTH_CLAIMS_CACHE_SIZE = int(os.getenv('AUTH_CLAIMS_CACHE_SIZE', '4096'))
+
+    # Хеширование паролей (см. utils/Auth/passwords.py)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', '16'))
+
+    # Массовое создание пользователей по списку класса (см. utils/Auth/provisioning.py)
+    PROVISION_HASH_WORKERS = int(os.getenv('PROVISION_HASH_WORKERS', str(os.cpu_count() or 2)))
+    # Строк в одном запросе /api/auth/provision: хеш scrypt:32768 — около 0,1 с на ядро, и 200 строк
+    # укладываются в таймаут воркера gunicorn (30 с) даже на одном ядре; больше — через CLI
+    PROVISION_MAX_ROWS = int(os.getenv('PROVISION_MAX_ROWS', '200'))
+
+    # Список пользователей: размер страницы по умолчанию и наибольший (см. users.py)
+    USERS_PAGE_SIZE = int(os.getenv('USERS_PAGE_SIZE', '100'))
+    USERS_PAGE_MAX = int(os.getenv('USERS_PAGE_MAX', '500'))
+
+    # История чата: сообщений в таблице до упаковки в сегмент, размер сегмента, страницы (см. chat_history.py)
+    CHAT_LIVE_MESSAGES = int(os.getenv('CHAT_LIVE_MESSAGES', '200'))
+    CHAT_SEGMENT_SIZE = int(os.getenv('CHAT_SEGMENT_SIZE', '100'))
+    CHAT_PAGE_SIZE = int(os.getenv('CHAT_PAGE_SIZE', '50'))
+    CHAT_PAGE_MAX = int(os.getenv('CHAT_PAGE_MAX', '200'))
+
+    # Ограничение попыток входа (см. utils/Auth/ratelimit.py). Пределы на адрес рассчитаны
+    # на класс за одним NAT: 300 студентов входят в начале экзамена за минуту
+    LOGIN_RATE_LIMIT_STORE = os.getenv('LOGIN_RATE_LIMIT_STORE', 'memory')  # memory | sqlite
+    LOGIN_RATE_LIMIT_DB = os.getenv('LOGIN_RATE_LIMIT_DB', os.path.join(BASE_DIR, "database", "rate_limit.db"))
+    LOGIN_IP_BURST = float(os.getenv('LOGIN_IP_BURST', '100'))
+    LOGIN_IP_PER_MINUTE = float(os.getenv('LOGIN_IP_PER_MINUTE', '300'))
+    LOGIN_USER_BURST = float(os.getenv('LOGIN_USER_BURST', '5'))
+    LOGIN_USER_PER_MINUTE = float(os.getenv('LOGIN_USER_PER_MINUTE', '10'))
+    LOGIN_GLOBAL_BURST = float(os.getenv('LOGIN_GLOBAL_BURST', '40'))
+    LOGIN_GLOBAL_PER_SECOND = float(os.getenv('LOGIN_GLOBAL_PER_SECOND', '20'))
+    # Число прокси перед приложением: адрес клиента берётся из X-Forwarded-For.
+    # Обязательно при развёртывании за прокси (Railway — PROXY_HOPS=1): при 0 все клиенты
+    # приходят с адреса прокси, и ведро ip для входа не применяется (см. utils/Auth/ratelimit.py)
+    PROXY_HOPS = int(os.getenv('PROXY_HOPS', '0'))
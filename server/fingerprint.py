@@ -0,0 +1,171 @@
+"""
+Канонические отпечатки (fingerprint) выражений.
+
+Отпечаток — короткий детерминированный хэш значений выражения в фиксированных
+псевдослучайных точках. Эквивалентные выражения (\\frac{2x+1}{x} и 2 + \\frac{1}{x})
+дают одинаковый отпечаток, поэтому проверку эквивалентности и поиск типичных
+ошибок можно начинать со сравнения строк, не вызывая sp.simplify.
+
+Два режима:
+  * "m" — рациональные выражения (целые, дроби, +, *, целые степени) вычисляются
+    точно по модулю большого простого числа;
+  * "f" — всё остальное вычисляется с точностью 30 знаков и округляется
+    до FLOAT_DIGITS значащих цифр.
+
+Совпадение отпечатков означает равенство с вероятностью, близкой к 1
+(лемма Шварца–Зиппеля для режима "m"). Несовпадение в режиме "f" не доказывает
+неравенство (значение могло оказаться на границе округления), поэтому
+отрицательный результат всегда нужно перепроверять обычным способом.
+"""
+import hashlib
+import logging
+import random
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+
+import sympy as sp
+
+PRIME = 2 ** 61 - 1
+SEED = 1729
+N_POINTS = 3
+FLOAT_DIGITS = 12
+# Значения меньше этого порога считаются нулём (погрешность сокращения при 30 знаках)
+FLOAT_ZERO = 1e-20
+
+
+class _NotRational(Exception):
+    pass
+
+
+def _points_for(symbol, index):
+    """Точки вычисления для символа: зависят только от имени символа и номера точки."""
+    rnd = random.Random(f"{SEED}:{symbol.name}:{index}")
+    return rnd.randrange(2, PRIME - 1), rnd.uniform(0.5, 2.5)
+
+
+def _eval_mod(expr, env):
+    if expr.is_Integer:
+        return int(expr) % PRIME
+    if expr.is_Rational:
+        q = int(expr.q) % PRIME
+        if q == 0:
+            raise _NotRational()
+        return int(expr.p) * pow(q, -1, PRIME) % PRIME
+    if expr.is_Symbol:
+        return env[expr]
+    if expr.is_Add:
+        total = 0
+        for arg in expr.args:
+            total = (total + _eval_mod(arg, env)) % PRIME
+        return total
+    if expr.is_Mul:
+        product = 1
+        for arg in expr.args:
+            product = product * _eval_mod(arg, env) % PRIME
+        return product
+    if expr.is_Pow and expr.exp.is_Integer:
+        base = _eval_mod(expr.base, env)
+        exp = int(expr.exp)
+        if exp < 0:
+            if base == 0:
+                # Точка попала в полюс — считаем выражение непредставимым в этом режиме
+                raise _NotRational()
+            base = pow(base, -1, PRIME)
+            exp = -exp
+        return pow(base, exp, PRIME)
+    raise _NotRational()
+
+
+def _float_token(value):
+    value = sp.N(value, 30)
+    if value.has(sp.nan, sp.zoo, sp.oo, -sp.oo):
+        return str(value)
+    re_part, im_part = value.as_real_imag()
+    if not (re_part.is_Number and im_part.is_Number):
+        raise ValueError("значение не является числом")
+    parts = []
+    for part in (re_part, im_part):
+        part = float(part)
+        parts.append("0" if abs(part) < FLOAT_ZERO else f"{part:.{FLOAT_DIGITS - 1}e}")
+    return parts[0] if parts[1] == "0" else f"{parts[0]}{parts[1]}j"
+
+
+def _digest(mode, values):
+    payload = mode + ":" + ",".join(str(v) for v in values)
+    return mode + hashlib.sha1(payload.encode("utf-8")).hexdigest()[:15]
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(expr):
+    """
+    Возвращает отпечаток sympy-выражения (строка из 16 символов)
+    или None, если выражение не удалось вычислить в точках.
+    """
+    try:
+        expr = sp.sympify(expr)
+        symbols = sorted(expr.free_symbols, key=lambda s: s.name)
+        try:
+            values = []
+            for i in range(N_POINTS):
+                env = {s: _points_for(s, i)[0] for s in symbols}
+                values.append(_eval_mod(expr, env))
+            return _digest("m", values)
+        except _NotRational:
+            pass
+        values = []
+        for i in range(N_POINTS):
+            subs = {s: sp.Float(_points_for(s, i)[1], 30) for s in symbols}
+            values.append(_float_token(expr.evalf(30, subs=subs)))
+        return _digest("f", values)
+    except Exception as e:
+        logging.debug(f"Не удалось вычислить отпечаток для {expr}: {e}")
+        return None
+
+
+def same_fingerprint(a, b):
+    """True, если оба отпечатка вычислены и совпадают (выражения эквивалентны)."""
+    fa = fingerprint(a)
+    return fa is not None and fa == fingerprint(b)
+
+
+# Отпечатки уже разобранных LaTeX-строк, чтобы при сохранении Step не разбирать их заново.
+# Ключ — (scope, LaTeX): одна и та же строка по разным правилам разбора (checker.Rules)
+# может дать разные выражения, поэтому scope — объект правил, которыми строка разобрана
+_LATEX_CACHE_SIZE = 4096
+_latex_cache = OrderedDict()
+_latex_lock = Lock()
+
+
+def remember(latex, fp, scope=None):
+    """Запоминает отпечаток LaTeX-строки, вычисленный во время проверки по правилам scope."""
+    key = (scope, latex)
+    with _latex_lock:
+        _latex_cache[key] = fp
+        _latex_cache.move_to_end(key)
+        while len(_latex_cache) > _LATEX_CACHE_SIZE:
+            _latex_cache.popitem(last=False)
+
+
+def clear_latex_cache():
+    """Очищает кэш отпечатков LaTeX-строк (холодные прогоны benchmarks/run.py)."""
+    with _latex_lock:
+        _latex_cache.clear()
+
+
+def latex_fingerprint(latex, compute, scope=None):
+    """
+    Отпечаток LaTeX-строки. Берётся из кэша, если строку уже разбирали по правилам scope,
+    иначе вычисляется функцией compute(latex). Ошибка разбора даёт None.
+    """
+    key = (scope, latex)
+    with _latex_lock:
+        if key in _latex_cache:
+            _latex_cache.move_to_end(key)
+            return _latex_cache[key]
+    try:
+        fp = compute(latex)
+    except Exception:
+        fp = None
+    remember(latex, fp, scope)
+    return fp
@@ -0,0 +1,37 @@
+"""
+Настройки gunicorn. Файл подхватывается автоматически: railway.toml запускает
+`gunicorn app:app` из каталога server/.
+
+preload_app: приложение со всеми тяжёлыми модулями (SymPy, latex2sympy2/ANTLR,
+numpy, SQLAlchemy) импортируется один раз в мастер-процессе, там же
+проверяется схема БД. Воркеры получают готовое приложение через fork и делят
+его страницы памяти (copy-on-write), поэтому старт N воркеров стоит одного
+импорта, а перезапуск воркера (падение, --max-requests, HUP) — миллисекунды
+вместо полного импорта. Там же процесс прогревается (warmup.py), и первый
+запрос в новом воркере не платит за холодные кэши парсера и SymPy.
+Замер: python -m benchmarks.startup.
+
+Число воркеров и адрес gunicorn по умолчанию берёт из WEB_CONCURRENCY и PORT.
+"""
+preload_app = True
+
+
+def _warm_up(log):
+    import warmup
+    from app import app
+
+    summary = warmup.warm_up(app)
+    if summary:
+        log.info("Прогрев: разобрано %(parsed)s из %(corpus)s выражений, проверено %(pairs)s пар за %(ms)s мс", summary)
+
+
+def when_ready(server):
+    # preload_app: прогрев один раз в мастере, воркеры наследуют его через fork
+    if server.cfg.preload_app:
+        _warm_up(server.log)
+
+
+def post_worker_init(worker):
+    # Без preload_app каждый воркер прогревается сам до приёма запросов;
+    # после прогрева в мастере вызов ничего не делает
+    _warm_up(worker.log)
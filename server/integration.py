@@ -0,0 +1,282 @@
+"""
+Вычисление интегралов в шагах решения.
+
+sp.integrate может работать очень долго на интегралах без элементарной
+первообразной, поэтому символьная попытка ограничена по времени
+(INTEGRATION_TIME_BUDGET_S): в главном потоке — через SIGALRM, в остальных —
+в постоянном пуле процессов (spawn), процессы которого завершаются по таймауту.
+Многочлены по переменной интегрирования берутся сразу по коэффициентам. Результат — вычисленный интеграл
+или отметка о неудаче (включая таймаут) — кэшируется по паре
+(подынтегральное выражение, пределы): повторный шаг с тем же интегралом
+не запускает sp.integrate снова.
+
+Интегралы, которые не удалось взять, остаются в выражении, а сравнение шагов
+переходит на численные значения (numeric_values): каждый интеграл считается
+адаптивной квадратурой Гаусса–Кронрода (G7–K15) сразу во всех точках x —
+все подотрезки всех точек обрабатываются одной операцией NumPy.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+import numpy as np
+import sympy as sp
+
+from config import Config
+
+_CACHE_SIZE = 2048
+_FAILED = object()
+_cache = OrderedDict()
+_lock = Lock()
+
+# Узлы и веса Кронрода (15 точек) и Гаусса (7 точек) на [-1, 1], неотрицательная половина
+_XGK = np.array([
+    0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245, 0.000000000000000000000000000000000,
+])
+_WGK = np.array([
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714,
+])
+_WG = np.array([
+    0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975, 0.417959183673469387755102040816327,
+])
+_NODES = np.concatenate([-_XGK[:-1], _XGK[::-1]])
+_KRONROD_WEIGHTS = np.concatenate([_WGK[:-1], _WGK[::-1]])
+# Узлы Гаусса — это узлы Кронрода с нечётными номерами
+_GAUSS_WEIGHTS = np.zeros(15)
+_GAUSS_WEIGHTS[1::2] = np.concatenate([_WG[:-1], _WG[::-1]])
+
+QUADRATURE_TOLERANCE = 1e-10
+MAX_SUBDIVISIONS = 30
+
+
+def _key(integral):
+    return integral.function, integral.limits
+
+
+def _cached(key):
+    with _lock:
+        if key not in _cache:
+            return None
+        _cache.move_to_end(key)
+        return _cache[key]
+
+
+def _store(key, value):
+    with _lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _integrate_polynomial(function, limits):
+    """Многочлен по переменной интегрирования — точная первообразная по коэффициентам."""
+    if len(limits) != 1 or len(limits[0]) != 3:
+        return None
+    var, lower, upper = limits[0]
+    if not function.is_polynomial(var):
+        return None
+    antiderivative = sp.Poly(function, var).integrate().as_expr()
+    return sp.expand(antiderivative.subs(var, upper) - antiderivative.subs(var, lower))
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout()
+
+
+def _integrate_alarm(function, limits, budget):
+    # В главном потоке (sync-воркеры gunicorn) sp.integrate прерывается сигналом
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, budget)
+    try:
+        return sp.integrate(function, *limits)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _integrate_worker(function, limits):
+    return sp.integrate(function, *limits)
+
+
+def _ready():
+    # Дочерний процесс импортирует этот модуль (а с ним sympy) при первой задаче
+    return True
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = Lock()
+
+
+def _get_pool():
+    """Пул процессов для sp.integrate вне главного потока: один на процесс сервера, создаётся лениво."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        # После fork (preload_app в gunicorn) пул мастера в воркере не работает
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn, как в asgi.py: fork многопоточного процесса наследует захваченные блокировки
+            pool = ProcessPoolExecutor(
+                max_workers=Config.INTEGRATION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            # Запуск процесса и импорт sympy не должны съедать бюджет первого интеграла
+            pool.submit(_ready).result()
+            _pool, _pool_pid = pool, os.getpid()
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # ProcessPoolExecutor не прерывает выполняющуюся задачу, поэтому процессы пула завершаются
+    # принудительно; следующий интеграл создаст новый пул
+    for process in list(pool._processes.values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _integrate_pooled(function, limits, budget):
+    # Вне главного потока сигнал недоступен: считаем в постоянном пуле процессов
+    pool = _get_pool()
+    future = pool.submit(_integrate_worker, function, limits)
+    try:
+        return future.result(timeout=budget)
+    except FuturesTimeout:
+        _discard_pool(pool)
+        raise _Timeout()
+
+
+def integrate_symbolic(integral, budget=None):
+    """
+    Вычисленный интеграл или None, если первообразную найти не удалось
+    или sp.integrate не уложился в budget секунд. Неудачи тоже кэшируются.
+    """
+    budget = Config.INTEGRATION_TIME_BUDGET_S if budget is None else budget
+    key = _key(integral)
+    value = _cached(key)
+    if value is None:
+        value = _integrate_polynomial(*key)
+    if value is None:
+        use_alarm = hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+        try:
+            result = (_integrate_alarm if use_alarm else _integrate_pooled)(*key, budget)
+            # sp.integrate возвращает Integral, если не нашёл первообразную
+            value = _FAILED if result.has(sp.Integral) else result
+        except BrokenProcessPool:
+            # Пул закрыт из-за таймаута другого интеграла — этот не кэшируется как неудача
+            logging.warning(f"Интеграл {integral} не вычислен: пул процессов перезапущен")
+            return None
+        except _Timeout:
+            logging.warning(f"Интеграл {integral} не вычислен за {budget} с, используется численная проверка")
+            value = _FAILED
+        except Exception as e:
+            logging.debug(f"sp.integrate не справился с {integral}: {e}")
+            value = _FAILED
+    _store(key, value)
+    return None if value is _FAILED else value
+
+
+def evaluate_integrals(expr, budget=None):
+    """
+    Заменяет интегралы в выражении вычисленными значениями. Интегралы, которые
+    не удалось взять символьно, остаются — их значения даёт numeric_values.
+    """
+    while True:
+        # Сначала внутренние интегралы; внешние — после подстановки их значений
+        innermost = [i for i in expr.atoms(sp.Integral) if not i.function.has(sp.Integral)]
+        evaluated = {}
+        for integral in innermost:
+            value = integrate_symbolic(integral, budget)
+            if value is not None:
+                evaluated[integral] = value
+        if not evaluated:
+            return expr
+        expr = expr.xreplace(evaluated)
+
+
+def _vectorize(expr, *symbols):
+    func = sp.lambdify(symbols, expr, modules="numpy")
+
+    def call(*args):
+        # Константы lambdify возвращает скаляром — приводим к форме аргументов
+        return np.broadcast_to(np.asarray(func(*args), dtype=complex), np.broadcast(*args).shape)
+    return call
+
+
+def gauss_kronrod(integrand, lower, upper, tol=QUADRATURE_TOLERANCE):
+    """
+    ∫ integrand от lower[i] до upper[i] для всех i сразу.
+    integrand(s, owner) принимает массив узлов и номера точек, которым они принадлежат.
+    Отрезки, где оценка ошибки |K15 − G7| больше допустимой, делятся пополам.
+    """
+    a = np.asarray(lower, dtype=float).ravel()
+    b = np.asarray(upper, dtype=float).ravel()
+    total = np.zeros(a.size, dtype=complex)
+    owner = np.arange(a.size)
+    for depth in range(MAX_SUBDIVISIONS + 1):
+        half = (b - a) / 2
+        nodes = (a + b)[:, None] / 2 + half[:, None] * _NODES[None, :]
+        values = integrand(nodes, owner[:, None])
+        kronrod = half * (values @ _KRONROD_WEIGHTS)
+        gauss = half * (values @ _GAUSS_WEIGHTS)
+        if not np.all(np.isfinite(kronrod)):
+            raise ValueError("подынтегральное выражение не определено на отрезке")
+        done = np.abs(kronrod - gauss) <= tol * np.maximum(1.0, np.abs(kronrod))
+        if depth == MAX_SUBDIVISIONS:
+            # Точность не достигнута — берём лучшую оценку на оставшихся отрезках
+            done[:] = True
+        np.add.at(total, owner[done], kronrod[done])
+        if done.all():
+            break
+        a, b, owner = a[~done], b[~done], owner[~done]
+        middle = (a + b) / 2
+        a, b, owner = np.concatenate([a, middle]), np.concatenate([middle, b]), np.concatenate([owner, owner])
+    return total
+
+
+def _integral_values(integral, var, points):
+    if len(integral.limits) != 1 or len(integral.limits[0]) != 3:
+        raise ValueError(f"Численно вычисляются только определённые интегралы по одной переменной: {integral}")
+    dummy, lower, upper = integral.limits[0]
+    if integral.function.has(sp.Integral) or not (integral.free_symbols <= {var}):
+        raise ValueError(f"Интеграл нельзя вычислить численно: {integral}")
+    func = _vectorize(integral.function, dummy, var)
+    lo = np.broadcast_to(np.real(_vectorize(lower, var)(points)), points.shape)
+    hi = np.broadcast_to(np.real(_vectorize(upper, var)(points)), points.shape)
+    return gauss_kronrod(lambda s, owner: func(s, points[owner]), lo, hi)
+
+
+def numeric_values(expr, var, points):
+    """
+    Значения выражения в точках var = points. Оставшиеся в выражении
+    интегралы вычисляются квадратурой, остальное — через lambdify.
+    """
+    points = np.asarray(points, dtype=float)
+    integrals = sorted(expr.atoms(sp.Integral), key=sp.default_sort_key)
+    placeholders = sp.symbols(f"_integral0:{len(integrals)}")
+    outer = expr.subs(dict(zip(integrals, placeholders)))
+    if not (outer.free_symbols <= {var, *placeholders}):
+        raise ValueError(f"Выражение содержит посторонние переменные: {outer.free_symbols - {var}}")
+    values = [_integral_values(integral, var, points) for integral in integrals]
+    return _vectorize(outer, var, *placeholders)(points, *values)
@@ -0,0 +1,101 @@
+"""
+Пределы при x → ±∞ в замкнутой форме для задач вида
+
+    lim  (P(x)/Q(x))^E(x),     P, Q — многочлены, E — рациональная функция от x,
+
+к которым сводятся все шаблоны TEMPLATES["limits"]. Общий sp.limit (алгоритм
+Грунтца) для них избыточен: ответ определяется старшими коэффициентами.
+
+Пусть B = P/Q → L, E → e. Основание должно быть положительным для больших x.
+  * e конечно: ответ L^e (для L = 0 или ∞ и e = 0 ответ 1 — E·ln B → 0,
+    так как E = O(1/x), а ln B = O(ln x));
+  * e = ±∞, L ≠ 1: ∞ или 0 в зависимости от L ≷ 1 и знака e;
+  * e = ±∞, L = 1 (неопределённость 1^∞): B^E = exp(E·ln(1 + u)), u = (P − Q)/Q → 0,
+    ответ exp(M), M = lim E·(P − Q)/Q (M = ±∞ даёт ∞ или 0).
+
+Всё остальное (дробные степени, отрицательное основание, другие функции)
+возвращает None — вызывающий код использует sp.limit.
+"""
+import logging
+
+import sympy as sp
+
+from rational import as_fraction
+
+
+def _leading(poly):
+    return poly.degree(), poly.LC()
+
+
+def _ratio_limit(num, den):
+    """lim num/den при x → +∞ для многочленов sp.Poly: число, oo или -oo."""
+    (dn, cn), (dd, cd) = _leading(num), _leading(den)
+    if num.is_zero:
+        return sp.Integer(0)
+    if dn < dd:
+        return sp.Integer(0)
+    if dn == dd:
+        return cn / cd
+    return sp.oo if (cn > 0) == (cd > 0) else -sp.oo
+
+
+def _power_limit(base, exponent, var):
+    fb = as_fraction(base, var)
+    fe = as_fraction(exponent, var)
+    if fb is None or fe is None:
+        return None
+    (p, q), (en, ed) = fb, fe
+    if p.is_zero or q.is_zero or ed.is_zero:
+        return None
+    # Основание должно быть положительным при больших x
+    if (p.LC() > 0) != (q.LC() > 0):
+        return None
+    L = _ratio_limit(p, q)
+    e = _ratio_limit(en, ed)
+
+    if e.is_finite:
+        if L.is_finite and L > 0:
+            return L ** e
+        if e == 0:
+            return sp.Integer(1)
+        # L = 0 или ∞
+        grows = (L == sp.oo) == (e > 0)
+        return sp.oo if grows else sp.Integer(0)
+
+    if L == 1:
+        # 1^∞: exp(lim E·(P − Q)/Q)
+        M = _ratio_limit(en * (p - q), ed * q)
+        if M == sp.oo:
+            return sp.oo
+        if M == -sp.oo:
+            return sp.Integer(0)
+        return sp.exp(M)
+    grows = (L > 1) == (e == sp.oo)
+    return sp.oo if grows else sp.Integer(0)
+
+
+def limit_at_infinity(expr, var, direction=1):
+    """
+    Предел expr при var → +∞ (direction=1) или −∞ (direction=-1) в замкнутой форме,
+    либо None, если выражение не подходит под (P/Q)^E или P/Q.
+    """
+    try:
+        if direction < 0:
+            expr = expr.subs(var, -var)
+        if expr.is_Pow and expr.base.has(var):
+            return _power_limit(expr.base, expr.exp, var)
+        fraction = as_fraction(expr, var)
+        if fraction is not None:
+            return _ratio_limit(*fraction)
+    except Exception as e:
+        logging.debug(f"Предел {expr} не вычислен в замкнутой форме: {e}")
+    return None
+
+
+def limit(expr, var, point):
+    """sp.limit с быстрым путём для x → ±∞."""
+    if point in (sp.oo, -sp.oo):
+        value = limit_at_infinity(expr, var, 1 if point == sp.oo else -1)
+        if value is not None:
+            return value
+    return sp.limit(expr, var, point)
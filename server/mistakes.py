@@ -0,0 +1,216 @@
+"""
+Индекс типичных ошибок с заранее подготовленными подсказками.
+
+Индекс сопоставляет паре (ключ задачи, отпечаток неверного шага) конкретную
+подсказку. Он строится офлайн и хранится в компактной TSV-таблице
+MISTAKE_INDEX_PATH, которая загружается один раз при старте. Во время проверки
+поиск — это обращение к словарю по отпечатку, уже вычисленному при проверке
+шага, без дополнительных символьных вычислений.
+
+Источники индекса:
+  * курируемый файл MISTAKE_HINTS_PATH — подсказки, написанные преподавателями;
+  * исторические неверные шаги (Step.is_correct = False), встречавшиеся не реже
+    --min-count раз: из них берётся частота ошибки, а с --with-mined-hints
+    ещё и самая частая сохранённая подсказка. По умолчанию сохранённые подсказки
+    не используются: они обычно числовые и зависят от предыдущего шага.
+Курируемые подсказки имеют приоритет.
+
+Команды (из каталога server/):
+    python mistakes.py build [--min-count 3] [--backfill] [--with-mined-hints]
+    python mistakes.py candidates [--min-count 3] [--top 30]
+
+candidates печатает частые неверные шаги без подсказки — их стоит
+перенести в курируемый файл.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+from config import Config
+
+_WHITESPACE = re.compile(r"\s+")
+
+CATEGORY_PARSERS = {
+    "limits": "solutions",
+    "integral_volterra_2": "solution_integral",
+}
+
+
+def template_key(category, expression):
+    """
+    Ключ задачи для индекса: категория и выражение без пробелов.
+    Задачи, сгенерированные из одного шаблона с одинаковыми параметрами,
+    получают одинаковый ключ (отпечаток неверного шага зависит от параметров).
+    """
+    return f"{category}:{_WHITESPACE.sub('', expression or '')}"
+
+
+def task_key(task):
+    return template_key(task.category, task.expression)
+
+
+def load_index(path=None):
+    """Читает TSV-индекс: ключ задачи, отпечаток, количество, подсказка (JSON-строка)."""
+    path = path or Config.MISTAKE_INDEX_PATH
+    index = {}
+    if not os.path.exists(path):
+        return index
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            try:
+                key, fp, _count, hint = line.rstrip("\n").split("\t", 3)
+                index[(key, fp)] = json.loads(hint)
+            except ValueError:
+                logging.warning(f"Пропущена повреждённая строка индекса ошибок: {line!r}")
+    return index
+
+
+_index = load_index()
+
+
+def lookup_hint(task, fp):
+    """Подсказка для известной ошибки или None. Без символьных вычислений."""
+    if fp is None or task is None:
+        return None
+    return _index.get((task_key(task), fp))
+
+
+def reload_index(path=None):
+    global _index
+    _index = load_index(path)
+    return len(_index)
+
+
+# --- Офлайн-построение -----------------------------------------------------------
+
+def _step_fingerprint_for(category):
+    import importlib
+    module = CATEGORY_PARSERS.get(category)
+    if not module:
+        return None
+    return importlib.import_module(module).step_fingerprint
+
+
+def mine(min_count, backfill=False):
+    """
+    Группирует исторические неверные шаги по (ключ задачи, отпечаток).
+    Шаги без отпечатка (сохранённые до его появления) при backfill=True
+    получают отпечаток, который также записывается в базу.
+    """
+    from models import db, Task, Solution, Step
+
+    rows = (
+        db.session.query(Step, Task.category, Task.expression)
+        .join(Solution, Step.solution_id == Solution.id)
+        .join(Task, Solution.task_id == Task.id)
+        .filter(Step.is_correct.is_(False))
+        .all()
+    )
+    groups = defaultdict(lambda: {"count": 0, "hints": Counter(), "examples": Counter()})
+    for step, category, expression in rows:
+        fp = step.fingerprint
+        if fp is None and backfill and step.input_expr.strip().upper() != "LIMIT":
+            compute = _step_fingerprint_for(category)
+            if compute:
+                fp = compute(step.input_expr)
+                step.fingerprint = fp
+        if fp is None:
+            continue
+        group = groups[(template_key(category, expression), fp)]
+        group["count"] += 1
+        group["examples"][step.input_expr] += 1
+        if step.hint:
+            group["hints"][step.hint] += 1
+    if backfill:
+        db.session.commit()
+    return {k: g for k, g in groups.items() if g["count"] >= min_count}
+
+
+def load_curated(path=None):
+    """
+    Курируемый файл — список записей {"template": ключ, "latex": неверный шаг, "hint": подсказка}.
+    Ключ имеет вид "<категория>:<выражение задачи без пробелов>", см. template_key.
+    """
+    path = path or Config.MISTAKE_HINTS_PATH
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build(min_count, backfill=False, output=None, with_mined_hints=False):
+    mined = mine(min_count, backfill)
+    entries = {}
+    if with_mined_hints:
+        for (key, fp), group in mined.items():
+            if group["hints"]:
+                hint, _ = group["hints"].most_common(1)[0]
+                entries[(key, fp)] = (group["count"], hint)
+
+    curated = 0
+    for item in load_curated():
+        category = item["template"].split(":", 1)[0]
+        compute = _step_fingerprint_for(category)
+        fp = compute(item["latex"]) if compute else None
+        if fp is None:
+            print(f"Не удалось вычислить отпечаток курируемого шага: {item['latex']}")
+            continue
+        group = mined.get((item["template"], fp))
+        count = group["count"] if group else 0
+        entries[(item["template"], fp)] = (count, item["hint"])
+        curated += 1
+
+    output = output or Config.MISTAKE_INDEX_PATH
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        f.write("# template_key\tfingerprint\tcount\thint\n")
+        for (key, fp), (count, hint) in sorted(entries.items(), key=lambda e: -e[1][0]):
+            f.write(f"{key}\t{fp}\t{count}\t{json.dumps(hint, ensure_ascii=False)}\n")
+    print(f"Индекс: {len(entries)} записей (курируемых {curated}) -> {output}")
+    return len(entries)
+
+
+def candidates(min_count, top):
+    indexed = load_index()
+    groups = mine(min_count)
+    missing = [
+        (key, fp, g) for (key, fp), g in groups.items()
+        if (key, fp) not in indexed and not g["hints"]
+    ]
+    missing.sort(key=lambda m: -m[2]["count"])
+    for key, fp, g in missing[:top]:
+        example, _ = g["examples"].most_common(1)[0]
+        print(json.dumps({"template": key, "latex": example, "count": g["count"], "hint": ""}, ensure_ascii=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Индекс типичных ошибок")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="построить индекс")
+    build_parser.add_argument("--min-count", type=int, default=3)
+    build_parser.add_argument("--backfill", action="store_true", help="дописать отпечатки старым шагам в базе")
+    build_parser.add_argument("--with-mined-hints", action="store_true",
+                              help="брать подсказки из сохранённых шагов, если нет курируемой")
+    build_parser.add_argument("--output", default=None)
+    cand_parser = sub.add_parser("candidates", help="частые ошибки без подсказки")
+    cand_parser.add_argument("--min-count", type=int, default=3)
+    cand_parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.command == "build":
+            build(args.min_count, args.backfill, args.output, args.with_mined_hints)
+        else:
+            candidates(args.min_count, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,10 +11,13 @@ class User(db.Model):
     username = db.Column(db.String(100), unique=True, nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
-    bio = db.Column(db.Text, default="")
+    # Большие колонки отложены: читаются отдельным запросом при первом обращении
+    # или сразу через .options(undefer(User.bio)), а вход и проверки их не грузят
+    bio = db.deferred(db.Column(db.Text, default=""))
     image = db.Column(db.String(300), default="")
     role = db.Column(db.String(50), default="student")  # или "admin"
-    chat_history = db.Column(db.Text)  # можно хранить JSON как строку
+    # Старый формат истории чата (весь JSON одной строкой); переносится в ChatMessage (см. chat_history.py)
+    chat_history = db.deferred(db.Column(db.Text))
 
     solutions = db.relationship('Solution', backref='user', lazy=True)
 
@@ -48,4 +51,77 @@ class Step(db.Model):
     is_correct = db.Column(db.Boolean, default=True)
     error_type = db.Column(db.String(100))
     hint = db.Column(db.String(300))
+    fingerprint = db.Column(db.String(32), index=True)  # отпечаток выражения (см. fingerprint.py)
+    phi_index = db.Column(db.Integer)  # номер φ-функции в интегральных решениях (-1 — окончательный ответ)
+    pair_verdict = db.Column(db.Boolean)  # вердикт — проверка перехода из предыдущего шага (см. resubmission.py)
 
+class ChatMessage(db.Model):
+    """Сообщение чата; старые сообщения пакуются в ChatSegment (см. chat_history.py)"""
+    __tablename__ = 'chat_messages'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # user или model
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChatSegment(db.Model):
+    """Архив: подряд идущие сообщения пользователя, сжатые zlib одним JSON"""
+    __tablename__ = 'chat_segments'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    first_message_id = db.Column(db.Integer, nullable=False)
+    last_message_id = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Колонки, добавленные после первого create_all: (таблица, колонка, тип SQL)
+ADDED_COLUMNS = [
+    ("steps", "fingerprint", "VARCHAR(32)"),
+    ("steps", "phi_index", "INTEGER"),
+    ("steps", "pair_verdict", "BOOLEAN"),
+]
+
+# Индексы, добавленные после первого create_all: (имя индекса, таблица, колонки)
+ADDED_INDEXES = [
+    ("ix_steps_fingerprint", "steps", "fingerprint"),
+    # Предыдущее решение пользователя по задаче (resubmission.py)
+    ("ix_solutions_task_user_created", "solutions", "task_id, user_id, created_at"),
+    # Список пользователей (users.py): фильтр по роли, поиск и сортировка по фамилии
+    ("ix_users_role_id", "users", "role, id"),
+    ("ix_users_lastname_id", "users", "lastname, id"),
+    ("ix_users_role_lastname_id", "users", "role, lastname, id"),
+    # История чата (chat_history.py): последние сообщения пользователя
+    ("ix_chat_messages_user_id", "chat_messages", "user_id, id"),
+]
+
+# Уникальные индексы: (имя индекса, таблица, колонки). Перед созданием из таблицы
+# удаляются дубликаты по этим колонкам (остаётся строка с меньшим id)
+ADDED_UNIQUE_INDEXES = [
+    # Сегмент архива чата создаётся один раз, даже если два запроса пакуют одни и те же сообщения
+    ("ux_chat_segments_user_first", "chat_segments", "user_id, first_message_id"),
+]
+
+# Индексы, заменённые уникальными
+DROPPED_INDEXES = ["ix_chat_segments_user_first"]
+
+def upgrade_schema():
+    """
+    db.create_all() не меняет уже существующие таблицы, поэтому
+    недостающие колонки и индексы добавляются здесь через ALTER TABLE.
+    """
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table, column, sql_type in ADDED_COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(db.text(f'ALTER TABLE {table} ADD COLUMN "{column}" {sql_type}'))
+        for name, table, columns in ADDED_INDEXES:
+            conn.execute(db.text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        for name, table, columns in ADDED_UNIQUE_INDEXES:
+            if name not in {index["name"] for index in inspector.get_indexes(table)}:
+                conn.execute(db.text(f"DELETE FROM {table} WHERE id NOT IN "
+                                     f"(SELECT MIN(id) FROM {table} GROUP BY {columns})"))
+                conn.execute(db.text(f"CREATE UNIQUE INDEX {name} ON {table} ({columns})"))
+        for name in DROPPED_INDEXES:
+            conn.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
@@ -1,12 +1,12 @@
-import cloudinary
 from flask import Blueprint, request, jsonify
+from sqlalchemy.orm import undefer
 from models import db, User
 
 profile_bp = Blueprint('profile', __name__, url_prefix='/profile')
 
 @profile_bp.route("/<username>", methods=["GET"])
 def get_user(username):
-    user = User.query.filter_by(username=username).first()
+    user = User.query.options(undefer(User.bio)).filter_by(username=username).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
     print(user)
@@ -49,6 +49,8 @@ def upload_image():
         return jsonify({"error": "No selected file"}), 400
     
     try:
+        # cloudinary нужен только для загрузки, поэтому импортируется здесь, а не при старте
+        import cloudinary.uploader
         upload_result = cloudinary.uploader.upload(file)
         image_url = upload_result.get('secure_url')
         return jsonify({"imageUrl": image_url}), 200
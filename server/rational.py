@@ -0,0 +1,61 @@
+"""
+Быстрая проверка шагов для рациональных функций от x.
+
+Большинство шагов в задачах на многочлены и дроби — рациональные функции
+с рациональными коэффициентами. Для них sp.simplify не нужен: выражение
+приводится к виду P/Q (sp.Poly над QQ), и два шага равны тогда и только тогда,
+когда P₁·Q₂ − P₂·Q₁ = 0. Ответ точный в обе стороны, поэтому для неверного
+шага не нужны ни simplify, ни вычисления с плавающей точкой — точку, где
+значения расходятся, ищем точной подстановкой в многочлены.
+
+Арифметику sp.Poly выполняет ground types SymPy: если установлен python-flint
+и задано SYMPY_GROUND_TYPES=flint, умножение многочленов идёт через FLINT.
+"""
+from functools import lru_cache
+
+import sympy as sp
+
+
+@lru_cache(maxsize=4096)
+def as_fraction(expr, var):
+    """
+    (P, Q) — числитель и знаменатель как sp.Poly над QQ, или None,
+    если expr не рациональная функция от var с рациональными коэффициентами.
+    """
+    if expr.free_symbols - {var} or not expr.is_rational_function(var) or expr.has(sp.Float):
+        return None
+    try:
+        num, den = sp.fraction(sp.together(expr))
+        num, den = sp.Poly(num, var, domain=sp.QQ), sp.Poly(den, var, domain=sp.QQ)
+    except (sp.PolynomialError, sp.polys.polyerrors.CoercionFailed):
+        return None
+    if den.is_zero:
+        return None
+    return num, den
+
+
+def compare(a, b, var, points=()):
+    """
+    Сравнивает два выражения как рациональные функции.
+
+    None — метод неприменим (нужна общая проверка);
+    (True, None) — выражения тождественно равны;
+    (False, (x₀, a(x₀), b(x₀))) — не равны; x₀ — первая из points, где оба
+    выражения определены и различаются (значения — точные рациональные числа),
+    или None, если такой точки среди points нет.
+    """
+    fa = as_fraction(a, var)
+    fb = as_fraction(b, var)
+    if fa is None or fb is None:
+        return None
+    (pa, qa), (pb, qb) = fa, fb
+    if (pa * qb - pb * qa).is_zero:
+        return True, None
+    for point in points:
+        da, db = qa.eval(point), qb.eval(point)
+        if da == 0 or db == 0:
+            continue
+        va, vb = pa.eval(point) / da, pb.eval(point) / db
+        if va != vb:
+            return False, (point, va, vb)
+    return False, None
@@ -0,0 +1,112 @@
+"""
+Повторная отправка решения: проверяются только изменённые пары шагов.
+
+Обычно студент исправляет одну строку и отправляет всё решение заново.
+Вердикт для пары соседних шагов зависит только от их текста, поэтому
+вердикты пар, которые уже проверялись в предыдущем решении того же
+пользователя по той же задаче, берутся из сохранённых Step, а проверяются
+(разбираются и сравниваются) только пары, затрагивающие изменённые строки.
+
+Используются только строки Step с pair_verdict — их вердикт относится к
+переходу из предыдущей строки той же цепочки:
+  * /check/limit и /<id>/check_step — алгебраические шаги до маркера LIMIT;
+  * /check-integral — шаги одной φ-функции (Step.phi_index); первый шаг
+    φ-функции хранит вердикт связи φᵢ → φᵢ₊₁ и как вердикт пары не используется.
+/check/algebra, /check/integral и строки, записанные до появления колонки,
+помечают ошибкой все шаги решения сразу — их пары проверяются заново.
+Отпечатки сохранённых шагов кладутся в кэш fingerprint.py, чтобы неизменённые
+шаги не разбирались ради отпечатка.
+"""
+import logging
+
+from fingerprint import remember
+from models import Solution, Step
+from utils.Auth.middleware import ANONYMOUS_USER_ID
+
+
+def _key(latex):
+    return str(latex).strip()
+
+
+def limit_chains(rows):
+    """Цепочки /check/limit: шаги до первого маркера LIMIT."""
+    chain = []
+    for row in rows:
+        if row.input_expr.strip().upper() == "LIMIT":
+            break
+        chain.append(row)
+    return [chain]
+
+
+def phi_chains(rows):
+    """Цепочки /check-integral: шаги каждой φ-функции по отдельности."""
+    chains = {}
+    for row in rows:
+        if row.phi_index is not None and row.phi_index >= 0:
+            chains.setdefault(row.phi_index, []).append(row)
+    return list(chains.values())
+
+
+def _is_placeholder(row):
+    # Числовой шаг φ-функции с номером i > 0 /check-integral хранит как i·1000 + n, а не как LaTeX
+    return (row.phi_index or 0) > 0 and row.input_expr.strip().isdigit()
+
+
+def _reusable_fingerprint(row):
+    # У шагов с \lim отпечаток считается по выражению под пределом (префикс "l");
+    # старые строки хранят отпечаток значения предела — такие не подставляются
+    if row.fingerprint is None or _is_placeholder(row):
+        return False
+    return not row.input_expr.strip().startswith("\\lim") or row.fingerprint.startswith("l")
+
+
+class PreviousVerdicts:
+    """Вердикты пар шагов предыдущего решения: (LaTeX предыдущего, LaTeX текущего) -> результат."""
+
+    def __init__(self, chains=()):
+        self._verdicts = {}
+        for chain in chains:
+            for prev, curr in zip(chain, chain[1:]):
+                if not curr.pair_verdict:
+                    continue
+                self._verdicts[_key(prev.input_expr), _key(curr.input_expr)] = {
+                    "is_correct": bool(curr.is_correct),
+                    "error_type": curr.error_type,
+                    "hint": curr.hint or None,
+                }
+        self.reused = 0
+
+    def __len__(self):
+        return len(self._verdicts)
+
+    def get(self, prev, curr):
+        """Сохранённый вердикт для пары checker.ParsedStep или None, если пару нужно проверить."""
+        verdict = self._verdicts.get((_key(prev.latex), _key(curr.latex)))
+        if verdict is None:
+            return None
+        self.reused += 1
+        return dict(verdict)
+
+
+def previous_verdicts(task_id, user_id, chains, rules):
+    """
+    Вердикты из последнего решения пользователя по задаче.
+    chains — функция, разбивающая строки Step на цепочки (limit_chains или phi_chains);
+    rules — checker.Rules эндпоинта, по которым вычислены сохранённые отпечатки.
+    Анонимный запрос вердиктов не получает: его решения ничьи.
+    """
+    if user_id == ANONYMOUS_USER_ID:
+        return PreviousVerdicts()
+    solution = (Solution.query
+                .filter_by(task_id=task_id, user_id=user_id)
+                .order_by(Solution.created_at.desc(), Solution.id.desc())
+                .first())
+    if solution is None:
+        return PreviousVerdicts()
+    rows = Step.query.filter_by(solution_id=solution.id).order_by(Step.step_number).all()
+    for row in rows:
+        if _reusable_fingerprint(row):
+            remember(row.input_expr, row.fingerprint, rules)
+    previous = PreviousVerdicts(chains(rows))
+    logging.info(f"Предыдущее решение {solution.id}: {len(previous)} проверенных пар шагов")
+    return previous
@@ -0,0 +1,258 @@
+"""
+Захват медленных выражений и их повторный прогон (replay).
+
+Любой разбор или проверка, которые дольше порога SLOW_CAPTURE_THRESHOLD_MS,
+записываются в JSONL-файл SLOW_CAPTURE_PATH вместе с исходным LaTeX,
+id задачи, фазой и длительностью. Так собирается корпус реальных
+«тяжёлых» вводов студентов для регрессионной проверки производительности.
+Именованные аргументы сохраняются отдельно (kwargs); выражения SymPy в них
+(например, equation = (f, K, λ)) записываются через srepr и при replay
+восстанавливаются точно.
+
+Повторный прогон корпуса на текущем коде проверки:
+    python slow_capture.py replay [--phase solutions.step] [--limit 100] [--json out.json]
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import sympy as sp
+
+from config import Config
+
+# id задачи, для которой сейчас выполняется проверка (выставляется в эндпоинтах)
+current_task_id = contextvars.ContextVar("slow_capture_task_id", default=None)
+# Во время replay захват отключён, чтобы корпус не дублировался
+_capture_disabled = contextvars.ContextVar("slow_capture_disabled", default=False)
+_write_lock = threading.Lock()
+
+# Фаза -> функция, которую нужно вызвать при повторном прогоне
+PHASES = {
+    "solutions.parse": "solutions:safe_sympify",
+    "solutions.step": "solutions:check_algebraic_step",
+    "solutions.limit": "solutions:check_limit",
+    "integral.parse": "solution_integral:safe_sympify",
+    "integral.step": "solution_integral:check_algebraic_step",
+    "integral.final": "solution_integral:check_integral_solution_final",
+    "integral.phi_sequence": "solution_integral:check_phi_sequence",
+}
+
+
+def set_task_context(task_id):
+    """Запоминает id задачи текущего запроса для последующих записей."""
+    current_task_id.set(task_id)
+
+
+def reset_task_context(exc=None):
+    """
+    teardown_request: сбрасывает id задачи после запроса, иначе поток воркера,
+    взявший следующий запрос, припишет его медленные выражения старой задаче.
+    """
+    current_task_id.set(None)
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _encode(value):
+    # Именованные аргументы: выражения SymPy — через srepr, кортежи — с пометкой,
+    # чтобы replay передал в функцию те же типы
+    if isinstance(value, sp.Basic):
+        return {"srepr": sp.srepr(value)}
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return _jsonable(value)
+
+
+def _decode(value):
+    if isinstance(value, dict) and set(value) == {"srepr"}:
+        return sp.sympify(value["srepr"])
+    if isinstance(value, dict) and set(value) == {"tuple"}:
+        return tuple(_decode(v) for v in value["tuple"])
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def record(phase, args, duration_ms, error=None, kwargs=None):
+    """Добавляет одну запись в хранилище медленных выражений."""
+    entry = {
+        "captured_at": datetime.utcnow().isoformat(),
+        "phase": phase,
+        "task_id": current_task_id.get(),
+        "duration_ms": round(duration_ms, 3),
+        "args": [_jsonable(a) for a in args],
+        "kwargs": {name: _encode(value) for name, value in (kwargs or {}).items()},
+        "error": error,
+    }
+    path = Config.SLOW_CAPTURE_PATH
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) >= Config.SLOW_CAPTURE_MAX_BYTES:
+                logging.warning(f"Хранилище медленных выражений переполнено: {path}")
+                return
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logging.error(f"Не удалось записать медленное выражение: {e}")
+
+
+def capture_slow(phase, derived=()):
+    """
+    Декоратор: если вызов длился дольше порога (в том числе завершился исключением),
+    его аргументы сохраняются в хранилище под именем фазы.
+    derived — именованные аргументы, которые лишь кэшируют разбор позиционных
+    (parsed=, expr=): они не сохраняются, и при replay функция разбирает LaTeX сама.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                duration_ms = (time.perf_counter() - start) * 1000
+                if duration_ms >= Config.SLOW_CAPTURE_THRESHOLD_MS and not _capture_disabled.get():
+                    saved = {name: value for name, value in kwargs.items() if name not in derived}
+                    record(phase, args, duration_ms, error, saved)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def capture_disabled():
+    """Отключает захват в текущем контексте (повторный прогон, прогрев воркера)."""
+    token = _capture_disabled.set(True)
+    try:
+        yield
+    finally:
+        _capture_disabled.reset(token)
+
+
+def load_corpus(path=None, phase=None):
+    """Читает записанный корпус, пропуская повреждённые строки."""
+    path = path or Config.SLOW_CAPTURE_PATH
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logging.warning(f"Пропущена повреждённая строка {line_no} в {path}")
+                continue
+            if phase and entry.get("phase") != phase:
+                continue
+            entries.append(entry)
+    return entries
+
+
+def _resolve(phase):
+    module_name, func_name = PHASES[phase].split(":")
+    func = getattr(importlib.import_module(module_name), func_name)
+    # Повторно прогоняем исходную функцию, а не обёртку захвата
+    return getattr(func, "__wrapped__", func)
+
+
+def replay(entries):
+    """Прогоняет корпус на текущем коде и возвращает замеры по каждой записи."""
+    results = []
+    with capture_disabled():
+        for entry in entries:
+            phase = entry.get("phase")
+            if phase not in PHASES:
+                results.append({**entry, "replay_ms": None, "status": "unknown_phase"})
+                continue
+            func = _resolve(phase)
+            # Записи до появления kwargs хранят только позиционные аргументы
+            kwargs = {name: _decode(value) for name, value in (entry.get("kwargs") or {}).items()}
+            result = None
+            start = time.perf_counter()
+            try:
+                result = func(*entry.get("args", []), **kwargs)
+                status = "ok"
+            except Exception as e:
+                status = f"error: {e}"
+            replay_ms = (time.perf_counter() - start) * 1000
+            results.append({**entry, "replay_ms": round(replay_ms, 3), "status": status,
+                            "result": json.loads(json.dumps(result, default=str))})
+    return results
+
+
+def _print_report(results):
+    print(f"{'phase':<24} {'task':>6} {'captured ms':>12} {'replay ms':>10} {'ratio':>6}  args")
+    for r in results:
+        replay_ms = r["replay_ms"]
+        ratio = f"{replay_ms / r['duration_ms']:.2f}" if replay_ms is not None and r["duration_ms"] else "-"
+        replay_str = f"{replay_ms:.1f}" if replay_ms is not None else "-"
+        args = json.dumps(r.get("args"), ensure_ascii=False)
+        if r.get("kwargs"):
+            args += " " + json.dumps(r["kwargs"], ensure_ascii=False)
+        if len(args) > 60:
+            args = args[:57] + "..."
+        print(f"{r['phase']:<24} {str(r.get('task_id') or '-'):>6} {r['duration_ms']:>12.1f} "
+              f"{replay_str:>10} {ratio:>6}  {args}")
+        if r["status"] != "ok":
+            print(f"{'':<24} {r['status']}")
+
+    timed = [r for r in results if r["replay_ms"] is not None]
+    captured = sum(r["duration_ms"] for r in timed)
+    replayed = sum(r["replay_ms"] for r in timed)
+    print()
+    print(f"Записей: {len(results)}, прогнано: {len(timed)}")
+    if timed and captured:
+        print(f"Суммарно: захвачено {captured:.1f} мс, сейчас {replayed:.1f} мс ({replayed / captured:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Корпус медленных выражений")
+    sub = parser.add_subparsers(dest="command", required=True)
+    replay_parser = sub.add_parser("replay", help="повторно прогнать корпус на текущем коде")
+    replay_parser.add_argument("--path", default=None, help="файл корпуса (по умолчанию SLOW_CAPTURE_PATH)")
+    replay_parser.add_argument("--phase", choices=sorted(PHASES), default=None)
+    replay_parser.add_argument("--limit", type=int, default=None, help="прогнать только первые N записей")
+    replay_parser.add_argument("--json", dest="json_out", default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    entries = load_corpus(args.path, args.phase)
+    if args.limit is not None:
+        entries = entries[:args.limit]
+    if not entries:
+        print("Корпус пуст")
+        return 0
+
+    results = replay(entries)
+    _print_report(results)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,132 +1,137 @@
 import logging
+import numpy as np
 import sympy as sp
 from flask import Blueprint, request, jsonify
-from models import db, Task, Solution, Step, User
+from models import db, Task, Solution, Step
+from slow_capture import capture_slow, set_task_context
+from mistakes import lookup_hint
+import checker
+import integration
+import resubmission
+import step_sessions
+from volterra import (
+    x as volterra_x, t as volterra_t, apply_operator, picard_iterates, equivalent,
+    task_equation, numeric_residual, symbolic_residual, residual_vanishes, describe_equation,
+    SAMPLE_POINTS, RESIDUAL_TOLERANCE,
+)
 from flask_cors import cross_origin
-from latex2sympy2 import latex2sympy  # Преобразование LaTeX в Sympy
-from typing import List
-import re
+from utils.Auth.middleware import current_user_id
 
 solution_integral_bp = Blueprint('solution_integral', __name__, url_prefix='/api/solutions')
 
+@capture_slow("integral.parse")
 def safe_sympify(expr):
-    """Безопасно преобразует LaTeX-выражение в объект sympy, используя latex2sympy2."""
+    """Безопасно преобразует LaTeX-выражение в объект sympy (checker.parse_latex)."""
     print(f"Parsed expression: {expr}")
-    try:
-        sympy_expr = latex2sympy(expr)
-        return sympy_expr
-    except Exception as e:
-        logging.error(f"Expression parsing error: '{expr}' - {str(e)}")
-        raise ValueError(f"Cannot parse expression '{expr}': {str(e)}")
+    return checker.parse_latex(expr)
 
 def evaluate_integrals(expr):
     """
-    Рекурсивно ищет в выражении все объекты Integral и вычисляет их,
-    подставляя вычисленные значения вместо неопределённых интегралов.
+    Вычисляет интегралы в выражении (integration.evaluate_integrals): символьно,
+    с ограничением по времени и кэшем. Невычисленные интегралы остаются
+    в выражении и сравниваются численно.
     """
-    integrals = list(expr.atoms(sp.Integral))
-    for integral in integrals:
-        try:
-            evaluated = sp.integrate(integral.function, *integral.limits)
-            expr = expr.subs(integral, evaluated)
-        except Exception as e:
-            logging.error(f"Ошибка при вычислении интеграла {integral}: {e}")
-    return expr
-
-def check_algebraic_step(prev_expr_str, curr_expr_str, tolerance=1e-10):
+    return integration.evaluate_integrals(expr)
+
+def parse_step(expr_str):
+    """LaTeX шага -> sympy с уже вычисленными интегралами."""
+    return evaluate_integrals(safe_sympify.__wrapped__(str(expr_str)))
+
+INTEGRAL_RULES = checker.Rules(
+    parse=parse_step,
+    test_values=[1, 2, 3, 5, 10, 100],
+    tolerance=1e-10,
+    hint="При x={val}: предыдущее значение = {prev:.6f}, текущее значение = {curr:.6f}",
+    error_hint="Ошибка: {error}",
+    phase="integral.step",
+)
+
+def step_fingerprint(expr_str):
+    """Отпечаток шага для сохранения в Step (с уже вычисленными интегралами)."""
+    return checker.as_parsed(str(expr_str), INTEGRAL_RULES).fingerprint
+
+@capture_slow("integral.step")
+def check_algebraic_step(prev_expr_str, curr_expr_str):
     """
-    Проверяет корректность алгебраического преобразования между двумя шагами.
-    Если один из шагов равен "LIMIT", проверка пропускается.
-    
-    1. Преобразует строки LaTeX в sympy-выражения.
-    2. Вычисляет интегралы внутри выражений (через evaluate_integrals) и упрощает результат.
-    3. Сначала выполняется символическая проверка (equals), а при необходимости – численная,
-       подставляя тестовые значения переменной \( x \).
+    Проверяет корректность алгебраического преобразования между двумя шагами
+    (интегралы в шагах вычисляются, см. parse_step). Если один из шагов равен
+    "LIMIT", проверка пропускается. Шаги можно передать строками или уже
+    разобранными (checker.ParsedStep).
     """
-    try:
-        if prev_expr_str.strip().upper() == "LIMIT" or curr_expr_str.strip().upper() == "LIMIT":
-            return {"is_correct": True, "error_type": None, "hint": None}
-        
-        # Преобразование в символьное представление и вычисление интегралов
-        prev_expr_raw = safe_sympify(prev_expr_str)
-        curr_expr_raw = safe_sympify(curr_expr_str)
-        prev_expr = sp.simplify(evaluate_integrals(prev_expr_raw))
-        curr_expr = sp.simplify(evaluate_integrals(curr_expr_raw))
-        
-        # Символическая проверка
-        if prev_expr.equals(curr_expr):
-            return {"is_correct": True, "error_type": None, "hint": None}
-        
-        # Если символическое сравнение не дало результата, выполняется численная проверка
-        x = sp.Symbol('x')
-        test_values = [1, 2, 3, 5, 10, 100]
-        for val in test_values:
-            try:
-                prev_val = float(prev_expr.subs({x: val}))
-                curr_val = float(curr_expr.subs({x: val}))
-                if abs(prev_val - curr_val) > tolerance:
-                    return {
-                        "is_correct": False,
-                        "error_type": "algebraic_error",
-                        "hint": f"При x={val}: предыдущее значение = {prev_val:.6f}, текущее значение = {curr_val:.6f}"
-                    }
-            except Exception:
-                continue
-        return {"is_correct": True, "error_type": None, "hint": None}
-    except Exception as e:
-        logging.error(f"Error checking step: {str(e)}")
-        return {"is_correct": False, "error_type": "parse_error", "hint": f"Ошибка: {str(e)}"}
+    return checker.check_step(prev_expr_str, curr_expr_str, INTEGRAL_RULES)
+
+# Уравнение по умолчанию φ(x) = x - ∫₀ˣ (x-t)φ(t)dt в виде (f, K, λ)
+DEFAULT_EQUATION = (volterra_x, volterra_x - volterra_t, sp.Integer(-1))
 
-def check_integral_solution_final(final_solution_str, var_str="x"):
+@capture_slow("integral.final", derived=("parsed",))
+def check_integral_solution_final(final_solution_str, var_str="x", equation=None, parsed=None):
     """
-    Проверяет окончательный ответ по интегральной задаче Вольтерры второго рода:
-        φ(x) = x - ∫₀ˣ (x-t) φ(t) dt.
-    
-    Для данного примера верное решение должно удовлетворять следующему:
-    
-        1. Начальное условие: φ(0) = 0.
-        2. Производная в точке 0: φ'(0) = 1.
-        3. Дифференциальное уравнение: φ''(x) + φ(x) = 0.
-    
-    Если все условия выполнены, решение считается корректным (как для sin x).
+    Проверяет окончательный ответ по интегральной задаче Вольтерры второго рода
+        φ(x) = f(x) + λ ∫₀ˣ K(x,t) φ(t) dt,
+    где (f, K, λ) берутся из задачи (volterra.task_equation), по умолчанию
+    φ(x) = x - ∫₀ˣ (x-t) φ(t) dt.
+
+    Ответ подставляется в уравнение, и невязка φ - f - λ∫₀ˣKφ вычисляется численно
+    (квадратура Гаусса–Лежандра) во многих точках x. Если численная проверка
+    невозможна (например, ответ содержит посторонние символы) или не прошла,
+    невязка упрощается символьно: у негладких и быстро растущих решений (|x|,
+    кусочные функции, большие экспоненты) погрешность квадратуры выше допуска,
+    и ответ отклоняется, только если и символьная невязка не нулевая.
+    Уже разобранный ответ (checker.ParsedStep) можно передать в parsed.
     """
+    f, kernel, lam = equation or DEFAULT_EQUATION
     try:
         x = sp.Symbol(var_str)
-        F_expr = sp.simplify(safe_sympify(final_solution_str))
-        # Проверка начального условия: φ(0)=0
-        if not sp.Eq(F_expr.subs(x, 0), 0):
-            return {"is_correct": False, "error_type": "integral_error", 
-                    "hint": f"Начальное условие неверно: φ(0) должно быть 0, получено {F_expr.subs(x, 0)}"}
-        # Проверка производной в нуле: φ'(0)=1
-        F_prime = sp.diff(F_expr, x)
-        if not sp.Eq(F_prime.subs(x, 0), 1):
-            return {"is_correct": False, "error_type": "integral_error", 
-                    "hint": f"Производная в точке 0 неверна: φ'(0) должно быть 1, получено {F_prime.subs(x, 0)}"}
-        # Проверка дифференциального уравнения: φ''(x)+φ(x)=0
-        F_double = sp.diff(F_expr, x, 2)
-        residual = sp.simplify(F_double + F_expr)
-        if not residual.equals(0):
-            # Проверим остаток для нескольких значений x
-            test_values = [0.5, 1, 2]
-            for val in test_values:
-                res_val = residual.subs(x, val)
-                if abs(float(res_val)) > 1e-6:
-                    return {"is_correct": False, "error_type": "integral_error", 
-                            "hint": f"Функция не удовлетворяет дифференциальному уравнению: φ''(x) + φ(x) ≠ 0 при x={val}, получено {res_val}"}
-        return {"is_correct": True, "error_type": None, "hint": None}
+        phi = parsed.expr if parsed is not None else evaluate_integrals(safe_sympify(final_solution_str))
+        phi = phi.subs(x, volterra_x)
+        x = volterra_x
+        numeric_failure = None
+        if phi.free_symbols <= {x}:
+            try:
+                residual, scale = numeric_residual(phi, f, kernel, lam)
+                if np.all(np.isfinite(residual)):
+                    error = np.abs(residual) / np.maximum(1.0, np.abs(scale))
+                    if error.max() <= RESIDUAL_TOLERANCE:
+                        return {"is_correct": True, "error_type": None, "hint": None}
+                    worst = int(np.argmax(error))
+                    numeric_failure = {"is_correct": False, "error_type": "integral_error",
+                                       "hint": f"Функция не удовлетворяет уравнению {describe_equation(f, kernel, lam)}: "
+                                               f"при x={SAMPLE_POINTS[worst]:.3f} невязка {residual[worst]:.6g}"}
+            except Exception as e:
+                logging.debug(f"Численная проверка невязки не удалась для {phi}: {e}")
+        residual = symbolic_residual(phi, f, kernel, lam)
+        if residual_vanishes(residual, phi):
+            return {"is_correct": True, "error_type": None, "hint": None}
+        if numeric_failure is not None:
+            return numeric_failure
+        return {"is_correct": False, "error_type": "integral_error",
+                "hint": f"Функция не удовлетворяет уравнению {describe_equation(f, kernel, lam)}: "
+                        f"невязка {residual if residual is not None else 'не вычислена'}"}
     except Exception as e:
         logging.error(f"Error checking integral solution: {str(e)}")
         return {"is_correct": False, "error_type": "parse_error", "hint": f"Ошибка проверки: {str(e)}"}
 
-def check_phi_sequence(phi_steps):
+@capture_slow("integral.phi_sequence", derived=("parsed",))
+def check_phi_sequence(phi_steps, equation=None, parsed=None):
     """
     Проверяет правильность последовательности φ-функций для интегрального уравнения Вольтерры 2-го рода:
-    φ(x) = x - ∫₀ˣ (x-t)φ(t)dt
+    φ(x) = f(x) + λ ∫₀ˣ K(x,t)φ(t)dt  (по умолчанию φ(x) = x - ∫₀ˣ (x-t)φ(t)dt)
     
     Для φₙ₊₁ должно выполняться:
-    φₙ₊₁(x) = x - ∫₀ˣ (x-t)φₙ(t)dt
+    φₙ₊₁(x) = f(x) + λ ∫₀ˣ K(x,t)φₙ(t)dt
+
+    Ожидаемые итерации строятся один раз от φ₀ студента и кэшируются (volterra.picard_iterates).
+    Если φᵢ студента расходится с итерацией, φᵢ₊₁ сверяется с оператором от его собственной φᵢ,
+    чтобы ошибка указывалась в том месте, где она сделана.
+
+    parsed — шаги φ-функций, уже разобранные маршрутом (checker.ParsedStep), чтобы не разбирать их повторно.
     """
     errors = []
+    if parsed is None:
+        parsed = [checker.parse_steps(phi.get("steps") or [], INTEGRAL_RULES) for phi in phi_steps]
+    f, kernel, lam = equation or DEFAULT_EQUATION
+    x = volterra_x
+    phi0 = None
     
     for i in range(len(phi_steps) - 1):
         current_phi = phi_steps[i]
@@ -135,28 +140,21 @@ def check_phi_sequence(phi_steps):
         if not current_phi["steps"] or not next_phi["steps"]:
             continue
             
-        # Берем последний шаг текущей φᵢ и первый шаг следующей φᵢ₊₁
-        current_last_step = current_phi["steps"][-1]
-        next_first_step = next_phi["steps"][0]
-        
         try:
-            # Преобразуем выражения в sympy
-            current_expr = safe_sympify(current_last_step)
-            next_expr = safe_sympify(next_first_step)
-            
-            # Создаем символы для проверки
-            x, t = sp.symbols('x t')
-            
-            # Формируем ожидаемое выражение для следующей φ
-            # φₙ₊₁(x) = x - ∫₀ˣ (x-t)φₙ(t)dt
-            integral = sp.Integral((x-t) * current_expr.subs(x, t), (t, 0, x))
-            expected_next = x - integral
-            
-            # Упрощаем и сравниваем
-            expected_next = sp.simplify(evaluate_integrals(expected_next))
-            next_expr = sp.simplify(next_expr)
+            # Берем последний шаг текущей φᵢ и первый шаг следующей φᵢ₊₁
+            current_expr = sp.expand(parsed[i][-1].expr)
+            next_expr = sp.expand(parsed[i + 1][0].expr)
+            if phi0 is None:
+                phi0 = current_expr
+
+            # φₙ₊₁ = f + λ∫₀ˣKφₙ: берём готовую итерацию, если φₙ студента совпадает с ней
+            iterates = picard_iterates(f, kernel, lam, phi0, i)
+            if equivalent(current_expr, iterates[i]):
+                expected_next = picard_iterates(f, kernel, lam, phi0, i + 1)[i + 1]
+            else:
+                expected_next = apply_operator(current_expr, f, kernel, lam)
             
-            if not expected_next.equals(next_expr):
+            if not equivalent(expected_next, next_expr):
                 # Проверяем численно для нескольких точек
                 test_points = [0.5, 1, 2]
                 for point in test_points:
@@ -169,7 +167,7 @@ def check_phi_sequence(phi_steps):
                                 "stepIndex": 0,
                                 "error": f"Некорректная связь между φ{i} и φ{i+1}",
                                 "hint": f"При x={point}: ожидалось {expected_val:.6f}, получено {actual_val:.6f}. " +
-                                       f"Должно выполняться: φ{i+1}(x) = x - ∫₀ˣ (x-t)φ{i}(t)dt"
+                                       f"Должно выполняться: {describe_equation(f, kernel, lam, i)}"
                             })
                             break
                     except Exception:
@@ -208,9 +206,21 @@ def check_integral_solution():
         task = Task.query.get(task_id)
         if not task:
             return jsonify({"success": False, "message": "Task not found"}), 404
+        set_task_context(task.id)
+        equation = task_equation(task, DEFAULT_EQUATION)
 
         errors = []  # Список ошибок для φ-функций и окончательного ответа
 
+        # Каждый шаг разбирается один раз; разобранные шаги используются во всех проверках ниже
+        parsed = [
+            checker.parse_steps(phi["steps"] if isinstance(phi.get("steps"), list) else [], INTEGRAL_RULES)
+            for phi in phi_steps
+        ]
+        parsed_final = checker.ParsedStep(final_solution, INTEGRAL_RULES)
+        user_id = current_user_id()
+        # Пары, не изменившиеся с предыдущей отправки, не проверяются повторно
+        previous = resubmission.previous_verdicts(task.id, user_id, resubmission.phi_chains, INTEGRAL_RULES)
+
         # Проверка последовательности шагов для каждой φ-функции
         for phi_index, phi in enumerate(phi_steps):
             if "steps" not in phi or not isinstance(phi["steps"], list):
@@ -233,18 +243,19 @@ def check_integral_solution():
             if len(steps) == 1:
                 continue
 
-            for i in range(len(steps) - 1):
-                result = check_algebraic_step(steps[i], steps[i + 1])
+            for i, result in enumerate(checker.check_chain(parsed[phi_index], INTEGRAL_RULES, previous.get)):
                 if not result["is_correct"]:
+                    # Известная типичная ошибка — готовая подсказка по отпечатку шага
+                    known_hint = lookup_hint(task, parsed[phi_index][i + 1].fingerprint)
                     errors.append({
                         "phiIndex": phi_index,
                         "stepIndex": i + 1,
                         "error": "Некорректное преобразование",
-                        "hint": result["hint"] or "Проверьте шаги"
+                        "hint": known_hint or result["hint"] or "Проверьте шаги"
                     })
 
         # Проверка связей между последовательными φ-функциями
-        phi_sequence_errors = check_phi_sequence(phi_steps)
+        phi_sequence_errors = check_phi_sequence(phi_steps, equation=equation, parsed=parsed)
         errors.extend(phi_sequence_errors)
 
         # Проверка окончательного ответа по интегральной задаче
@@ -255,7 +266,9 @@ def check_integral_solution():
                 "hint": "Введите окончательный ответ по интегралу"
             })
         else:
-            integral_check = check_integral_solution_final(final_solution, var_str="x")
+            integral_check = check_integral_solution_final(
+                final_solution, var_str="x", equation=equation, parsed=parsed_final
+            )
             if not integral_check["is_correct"]:
                 errors.append({
                     "phiIndex": -1,
@@ -265,20 +278,14 @@ def check_integral_solution():
 
         # Сохранение в базу данных
         try:
-            user_id = User.query.filter_by(username=data.get("user")).first()
-            if user_id:
-                user_id = user_id.id
-            else:
-                user_id = 1
-
             solution = Solution(task_id=task.id, user_id=user_id, status="in_progress")
             db.session.add(solution)
             db.session.flush()
 
             step_counter = 1
             for phi_index, phi in enumerate(phi_steps):
-                steps = phi.get("steps", [])
-                for step_index, step in enumerate(steps):
+                for step_index, parsed_step in enumerate(parsed[phi_index]):
+                    step = parsed_step.latex
                     is_error = False
                     error_hint = ""
                     for error in errors:
@@ -302,7 +309,10 @@ def check_integral_solution():
                         input_expr=step_expr,
                         is_correct=not is_error,
                         error_type="error" if is_error else None,
-                        hint=error_hint
+                        hint=error_hint,
+                        fingerprint=parsed_step.fingerprint,
+                        phi_index=phi_index,
+                        pair_verdict=True
                     )
                     db.session.add(step_record)
                     step_counter += 1
@@ -314,7 +324,9 @@ def check_integral_solution():
                 input_expr=final_solution,
                 is_correct=not final_error,
                 error_type="error" if final_error else None,
-                hint=final_error.get("hint", "") if final_error else ""
+                hint=final_error.get("hint", "") if final_error else "",
+                fingerprint=parsed_final.fingerprint,
+                phi_index=-1
             )
             db.session.add(final_step_record)
 
@@ -399,6 +411,8 @@ def finish_solution(solution_id):
             
         solution.status = "completed"
         db.session.commit()
+        # Решение завершено — разобранные шаги пошаговой проверки больше не нужны
+        step_sessions.sessions.pop(solution_id)
         
         return jsonify({
             "success": True,
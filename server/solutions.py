@@ -1,11 +1,17 @@
+import json
 import logging
-import re
 import sympy as sp
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import cross_origin
-from latex2sympy2 import latex2sympy  # Преобразование LaTeX в sympy-выражения
-from models import db, Task, Solution, Step, User
+from models import db, Task, Solution, Step
+from slow_capture import capture_slow, set_task_context
+from mistakes import lookup_hint
+import checker
+import limits
+import resubmission
+import step_sessions
 from typing import List
+from utils.Auth.middleware import current_user_id, is_anonymous
 
 solutions_bp = Blueprint('solutions', __name__, url_prefix='/api/solutions')
 
@@ -21,142 +27,51 @@ def normalize_steps_with_limit(steps: List[str]) -> List[str]:
             steps.insert(mid, "LIMIT")
         return steps
 
+@capture_slow("solutions.parse")
 def safe_sympify(expr: str):
     """
-    Преобразует LaTeX-выражение в символьное выражение sympy.
-    Если выражение начинается с '\\lim', то выделяет компоненты и вычисляет предел явно.
-    Теперь не удаляет фрагменты, а пытается корректно разобрать выражение даже если в конце есть комментарий.
+    Преобразует LaTeX-выражение в символьное выражение sympy (checker.parse_latex).
+    Если выражение начинается с '\\lim', предел вычисляется явно.
     """
-    try:
-        expr_strip = expr.strip()
-        if expr_strip.upper() == "LIMIT":
-            return sp.Integer(0)
-        # Если выражение начинается с \lim, пытаемся его разобрать
-        if expr_strip.startswith("\\lim"):
-            # Используем регулярное выражение, которое берёт всё от \lim_{...} до первой закрывающей пары скобок после \right)
-            pattern = re.compile(r"\\lim_\{([^}]+)\\to\s*([^}]+)\}(.*)")
-            m = pattern.search(expr_strip)
-            if m:
-                var_str = m.group(1).strip()
-                limit_val_str = m.group(2).strip()
-                rest = m.group(3).strip()
-                # Если во второй части есть лишние символы (например, комментарий),
-                # попробуем выделить содержимое от \left( до \right)
-                start = rest.find("\\left(")
-                end = rest.rfind("\\right)")
-                if start != -1 and end != -1 and end > start:
-                    inner_expr_str = rest[start:end+len("\\right)")]
-                else:
-                    # Если нет обрамляющих конструкций, берем весь оставшийся текст
-                    inner_expr_str = rest
-                var = sp.Symbol(var_str)
-                # Определяем точку предела
-                if limit_val_str in ["∞", "infty", "infinity"]:
-                    limit_val = sp.oo
-                elif limit_val_str in ["-∞", "-infty", "-infinity"]:
-                    limit_val = -sp.oo
-                else:
-                    # Пробуем вычислить как число/выражение
-                    limit_val = safe_sympify(limit_val_str)
-                # Преобразуем внутреннее выражение
-                inner_expr = latex2sympy(inner_expr_str)
-                computed_limit = sp.limit(inner_expr, var, limit_val)
-                logging.info(f"Вычислен предел для {expr_strip}: {computed_limit}")
-                return computed_limit
-            else:
-                # Если шаблон не подошёл, пытаемся обычное преобразование
-                return latex2sympy(expr_strip)
-        # Для остальных выражений – обычное преобразование
-        return latex2sympy(expr_strip)
-    except Exception as e:
-        logging.error(f"Expression parsing error: '{expr}' - {str(e)}")
-        raise ValueError(f"Cannot parse expression '{expr}': {str(e)}")
-
-def check_algebraic_step(prev_expr_str: str, curr_expr_str: str, tolerance=1e-6):
+    return checker.parse_latex(expr)
+
+LIMIT_RULES = checker.Rules(
+    parse=safe_sympify.__wrapped__,
+    test_values=[2, 5, 10, 50, 100],
+    tolerance=1e-6,
+    hint="Ошибка внутри предела: при x={val}: было {prev:.6f}, стало {curr:.6f}",
+    inner_hint="(шек ішінде) x={val} кезінде: {prev:.6f} -> {curr:.6f}",
+    phase="solutions.step",
+)
+
+def step_fingerprint(expr_str: str):
+    """Отпечаток шага для сохранения в Step (маркер LIMIT отпечатка не имеет)."""
+    return checker.as_parsed(expr_str, LIMIT_RULES).fingerprint
+
+@capture_slow("solutions.step")
+def check_algebraic_step(prev_expr_str: str, curr_expr_str: str):
     """
     Проверяет корректность алгебраического преобразования между двумя шагами.
-    Если оба шага начинаются с \lim — сначала сравниваются внутренние части лимита.
-    Затем выполняется обычная символьная и численная проверка.
+    Если оба шага начинаются с \\lim — сравниваются внутренние части лимита.
+    Шаги можно передать строками или уже разобранными (checker.ParsedStep).
     """
-    try:
-        if prev_expr_str.strip().upper() == "LIMIT" or curr_expr_str.strip().upper() == "LIMIT":
-            return {"is_correct": True, "error_type": None, "hint": None}
-
-        # Проверка: оба шага — лимитные выражения
-        if prev_expr_str.strip().startswith("\\lim") and curr_expr_str.strip().startswith("\\lim"):
-            lim_pattern = re.compile(r"\\lim_\{[^}]+\}(.*)")
-
-            prev_match = lim_pattern.search(prev_expr_str)
-            curr_match = lim_pattern.search(curr_expr_str)
-
-            if prev_match and curr_match:
-                prev_inner = prev_match.group(1).strip()
-                curr_inner = curr_match.group(1).strip()
-
-                prev_inner_expr = sp.simplify(safe_sympify(prev_inner))
-                curr_inner_expr = sp.simplify(safe_sympify(curr_inner))
-
-                if sp.simplify(prev_inner_expr - curr_inner_expr) == 0:
-                    return {"is_correct": True, "error_type": None, "hint": None}
-
-                # Проверка по точкам
-                x = sp.Symbol("x")
-                test_values = [2, 5, 10, 50, 100]
-                for val in test_values:
-                    try:
-                        prev_val = float(prev_inner_expr.evalf(subs={x: val}))
-                        curr_val = float(curr_inner_expr.evalf(subs={x: val}))
-                        if abs(prev_val - curr_val) > tolerance:
-                            return {
-                                "is_correct": False,
-                                "error_type": "algebraic_error",
-                                "hint": f"(шек ішінде) x={val} кезінде: {prev_val:.6f} -> {curr_val:.6f}"
-                            }
-                    except Exception as e:
-                        logging.warning(f"Inner limit eval error: {e}")
-                        continue
-
-        # Обычная проверка всего выражения
-        prev_expr = sp.simplify(safe_sympify(prev_expr_str))
-        curr_expr = sp.simplify(safe_sympify(curr_expr_str))
-
-        if sp.simplify(prev_expr - curr_expr) == 0:
-            return {"is_correct": True, "error_type": None, "hint": None}
-
-        # Проверка по численным значениям
-        x = sp.Symbol('x')
-        test_values = [2, 5, 10, 50, 100]
-        for val in test_values:
-            try:
-                prev_val = float(prev_expr.evalf(subs={x: val}))
-                curr_val = float(curr_expr.evalf(subs={x: val}))
-                if abs(prev_val - curr_val) > tolerance:
-                    return {
-                        "is_correct": False,
-                        "error_type": "algebraic_error",
-                        "hint": f"Ошибка внутри предела: при x={val}: было {prev_val:.6f}, стало {curr_val:.6f}"
-                    }
-            except Exception as e:
-                logging.warning(f"Outer eval error: {e}")
-                continue
-
-        return {"is_correct": True, "error_type": None, "hint": None}
-
-    except Exception as e:
-        logging.error(f"Ошибка при проверке шага: {str(e)}")
-        return {"is_correct": False, "error_type": "parse_error", "hint": str(e)}
+    return checker.check_step(prev_expr_str, curr_expr_str, LIMIT_RULES)
 
-def check_limit(expr_str: str, var_str: str, limit_point: str):
+@capture_slow("solutions.limit", derived=("expr",))
+def check_limit(expr_str: str, var_str: str, limit_point: str, expr=None):
     """
     Вычисляет предел выражения expr_str для переменной var_str при стремлении к limit_point.
+    Уже разобранное выражение можно передать в expr, чтобы не разбирать шаг повторно.
     """
     try:
-        expr = safe_sympify(expr_str)
+        if expr is None:
+            expr = safe_sympify(expr_str)
         var = sp.Symbol(var_str)
+        # (P/Q)^E при x → ±∞ считается в замкнутой форме (limits.py), остальное — sp.limit
         if limit_point in ["oo", "∞", "infty", "infinity"]:
-            limit_result = sp.limit(expr, var, sp.oo)
+            limit_result = limits.limit(expr, var, sp.oo)
         elif limit_point in ["-oo", "-∞", "-infty", "-infinity"]:
-            limit_result = sp.limit(expr, var, -sp.oo)
+            limit_result = limits.limit(expr, var, -sp.oo)
         else:
             limit_result = sp.limit(expr, var, limit_point)
         logging.info(f"Computed limit for '{expr_str}': {limit_result}")
@@ -178,44 +93,39 @@ def compare_limit_values(student_result, expected_result):
     except Exception:
         return str(student_result) == str(expected_result)
 
-@solutions_bp.route('/check/limit', methods=['POST'])
-@cross_origin()
-def check_solution():
+def _limit_request(data):
     """
-    Принимает JSON:
-    {
-        "taskId": <номер задачи>,
-        "steps": [
-            "шаг 1", "шаг 2", ..., "LIMIT", "окончательный ответ"
-        ]
-    }
-    Выполняет пошаговую проверку: 
-    - Последовательность алгебраических преобразований.
-    - Вычисление лимита на основе последнего алгебраического шага.
-    - Сравнение окончательного ответа со значением лимита.
+    Проверяет формат запроса на проверку предела.
+    Возвращает (task, steps, None) или (None, None, (ответ, код)) при ошибке.
     """
-    data = request.json
-    logging.info(f"Received solution check request: {data}")
-
     if not data or "taskId" not in data or "steps" not in data:
-        return jsonify({"error": "Invalid request format"}), 400
+        return None, None, (jsonify({"error": "Invalid request format"}), 400)
 
-    task_id = data["taskId"]
     steps_raw = data["steps"]
     logging.info(f"Received steps: {steps_raw}")
 
     if not isinstance(steps_raw, list) or len(steps_raw) < 2:
-        return jsonify({
+        return None, None, (jsonify({
             "success": False,
             "errors": [{"step": 1, "error": "Решение должно состоять как минимум из двух шагов"}]
-        }), 400
+        }), 400)
 
     # Если среди поступивших шагов нет ни одного содержащего "\lim", вставляем маркер "LIMIT"
     steps = normalize_steps_with_limit(steps_raw)
-    task = Task.query.get(task_id)
+    task = Task.query.get(data["taskId"])
     if not task:
-        return jsonify({"error": "Task not found"}), 404
+        return None, None, (jsonify({"error": "Task not found"}), 404)
+    return task, steps, None
 
+def limit_check_events(task, steps, user_id):
+    """
+    Пошаговая проверка решения задачи на предел в виде последовательности событий (имя, данные):
+    - "step"   — вердикт для очередной пары алгебраических шагов, сразу после её проверки;
+    - "limit"  — вычисленный предел;
+    - "result" — итог, тот же JSON, что возвращает /check/limit.
+    Используется и обычным, и потоковым эндпоинтом.
+    """
+    set_task_context(task.id)
     errors = []
     algebraic_steps = []
     found_limit = False
@@ -230,25 +140,39 @@ def check_solution():
         algebraic_steps.append(step)
 
     if not algebraic_steps:
-        return jsonify({
+        yield "result", {
             "success": False,
             "errors": [{"step": 1, "error": "Алгебраические шаги отсутствуют", "hint": "Добавьте хотя бы один шаг перед LIMIT"}]
-        }), 200
+        }
+        return
 
-    # Проверка последовательности алгебраических шагов
-    for i in range(len(algebraic_steps) - 1):
-        res = check_algebraic_step(algebraic_steps[i], algebraic_steps[i + 1])
-        if not res["is_correct"]:
-            errors.append({
-                "step": i + 2,
-                "error": "Дұрыс емес түрлендіру",
-                "hint": res["hint"] or (
-                    f"{i+2}-қадам: «{algebraic_steps[i]}» өрнегінен «{algebraic_steps[i+1]}» өрнегіне өткенде "
-                    "өрнек дұрыс өзгермеген. Мысалы, көбейткішті шығару, бөлшекті ықшамдау немесе ұқсас мүшелерді "
-                    "қосу операцияларын тексеріңіз."
-                )
-            })
+    # Каждый шаг разбирается один раз; разобранные шаги используются во всех проверках ниже
+    parsed = checker.parse_steps(steps, LIMIT_RULES)
+    parsed_algebraic = parsed[:len(algebraic_steps)]
+    # Пары, не изменившиеся с предыдущей отправки, не проверяются повторно
+    previous = resubmission.previous_verdicts(task.id, user_id, resubmission.limit_chains, LIMIT_RULES)
 
+    # Проверка последовательности алгебраических шагов
+    for i, res in enumerate(checker.iter_chain(parsed_algebraic, LIMIT_RULES, previous.get)):
+        if res["is_correct"]:
+            yield "step", {"step": i + 2, "is_correct": True}
+            continue
+        # Известная типичная ошибка — готовая подсказка по отпечатку шага
+        known_hint = lookup_hint(task, parsed_algebraic[i + 1].fingerprint)
+        error = {
+            "step": i + 2,
+            "error": "Дұрыс емес түрлендіру",
+            "error_type": res["error_type"],
+            "hint": known_hint or res["hint"] or (
+                f"{i+2}-қадам: «{algebraic_steps[i]}» өрнегінен «{algebraic_steps[i+1]}» өрнегіне өткенде "
+                "өрнек дұрыс өзгермеген. Мысалы, көбейткішті шығару, бөлшекті ықшамдау немесе ұқсас мүшелерді "
+                "қосу операцияларын тексеріңіз."
+            )
+        }
+        errors.append(error)
+        yield "step", {**error, "is_correct": False}
+
+    logging.info(f"Вердиктов из предыдущего решения: {previous.reused} из {len(parsed_algebraic) - 1}")
 
     computed_limit = None
     if found_limit and not errors:
@@ -263,8 +187,9 @@ def check_solution():
                 if len(parts) == 2:
                     limit_var = parts[0].strip()
                     limit_point = parts[1].strip()
-            limit_res = check_limit(last_expr, limit_var, limit_point)
+            limit_res = check_limit(last_expr, limit_var, limit_point, expr=parsed_algebraic[-1].expr)
             computed_limit = limit_res.get("computed_limit")
+            yield "limit", {"step": limit_index + 1, "is_correct": limit_res["is_correct"], "limit": str(computed_limit)}
             if not limit_res["is_correct"]:
                 errors.append({
                     "step": limit_index + 1,
@@ -283,7 +208,7 @@ def check_solution():
                     elif student_answer.strip() in ["-\\infty", "-\\infinity", "-∞"]:
                         student_result = -sp.oo
                     else:
-                        student_result = sp.simplify(safe_sympify(student_answer))
+                        student_result = sp.simplify(parsed[-1].expr)
                     if not compare_limit_values(student_result, computed_limit):
                         errors.append({
                             "step": len(steps),
@@ -305,20 +230,24 @@ def check_solution():
             })
 
     # Сохраняем решение и шаги в базу
-    user_id = User.query.filter_by(username=data["user"]).first().id if User.query.filter_by(username=data["user"]).first() else 1
     solution = Solution(task_id=task.id, user_id=user_id, status="in_progress")
     db.session.add(solution)
     db.session.flush()
 
-    for i, step in enumerate(steps, start=1):
-        is_correct = (len(errors) == 0)
+    # Вердикт сохраняется для каждого шага отдельно — по нему строится индекс типичных ошибок
+    errors_by_step = {error["step"]: error for error in errors}
+    for i, (step, parsed_step) in enumerate(zip(steps, parsed), start=1):
+        step_error = errors_by_step.get(i)
+        is_correct = step_error is None
         step_record = Step(
             solution_id=solution.id,
             step_number=i,
             input_expr=step,
             is_correct=is_correct,
-            error_type=None if is_correct else "error",
-            hint=""
+            error_type=None if is_correct else (step_error.get("error_type") or "error"),
+            hint="" if is_correct else (step_error.get("hint") or "")[:300],
+            fingerprint=parsed_step.fingerprint,
+            pair_verdict=True
         )
         db.session.add(step_record)
 
@@ -326,15 +255,197 @@ def check_solution():
     db.session.commit()
 
     if errors:
-        return jsonify({"success": False, "errors": errors, "solution_id": solution.id}), 200
+        yield "result", {"success": False, "errors": errors, "solution_id": solution.id}
+        return
 
-    return jsonify({
+    yield "result", {
         "success": True,
         "message": f"Шешім дұрыс. Шек мәні = {computed_limit}" if computed_limit is not None else "Шешім дұрыс",
         "solution_id": solution.id
-    }), 200
+    }
 
+@solutions_bp.route('/check/limit', methods=['POST'])
+@cross_origin()
+def check_solution():
+    """
+    Принимает JSON:
+    {
+        "taskId": <номер задачи>,
+        "steps": [
+            "шаг 1", "шаг 2", ..., "LIMIT", "окончательный ответ"
+        ]
+    }
+    Выполняет пошаговую проверку: 
+    - Последовательность алгебраических преобразований.
+    - Вычисление лимита на основе последнего алгебраического шага.
+    - Сравнение окончательного ответа со значением лимита.
+    """
+    data = request.json
+    logging.info(f"Received solution check request: {data}")
+    task, steps, failure = _limit_request(data)
+    if failure:
+        return failure
 
+    result = None
+    for event, payload in limit_check_events(task, steps, current_user_id()):
+        if event == "result":
+            result = payload
+    return jsonify(result), 200
+
+@solutions_bp.route('/check/limit/stream', methods=['POST'])
+@cross_origin()
+def check_solution_stream():
+    """
+    То же, что /check/limit, но результат отдаётся потоком Server-Sent Events:
+    событие "step" на каждую проверенную пару шагов, "limit" — вычисленный предел,
+    "result" — итоговый ответ (как у /check/limit). Клиент видит первый вердикт,
+    не дожидаясь проверки всего решения.
+    """
+    data = request.json
+    logging.info(f"Received streaming solution check request: {data}")
+    task, steps, failure = _limit_request(data)
+    if failure:
+        return failure
+
+    def stream():
+        for event, payload in limit_check_events(task, steps, current_user_id()):
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        # Отключаем буферизацию в nginx, иначе события придут одним куском
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _step_rules(task):
+    """Правила проверки шагов по категории задачи."""
+    if task.category and task.category.startswith("integral"):
+        from solution_integral import INTEGRAL_RULES
+        return INTEGRAL_RULES
+    return LIMIT_RULES
+
+def _step_session(solution):
+    """
+    Сессия пошаговой проверки. Источник истины — принятые Step в базе: запрос
+    мог прийти в другой воркер или после правки в другом воркере, поэтому
+    цепочка сессии сверяется с ними при каждом запросе (вызывать под session.lock).
+    Разобранные шаги сессии переиспользуются, пока их LaTeX совпадает с базой.
+    """
+    session = step_sessions.sessions.get(solution.id)
+    if session is None:
+        session = step_sessions.StepSession(_step_rules(solution.task))
+        step_sessions.sessions.put(solution.id, session)
+    return session
+
+def _sync_session(session, solution_id):
+    rows = (db.session.query(Step.step_number, Step.is_correct, Step.input_expr)
+            .filter(Step.solution_id == solution_id).order_by(Step.step_number))
+    accepted = []
+    for step_number, is_correct, input_expr in rows:
+        if not is_correct or step_number != len(accepted) + 1:
+            break
+        accepted.append(input_expr)
+    kept = 0
+    while kept < min(len(session.steps), len(accepted)) and session.steps[kept].latex == accepted[kept]:
+        kept += 1
+    session.steps[kept:] = [checker.ParsedStep(latex, session.rules) for latex in accepted[kept:]]
+
+@solutions_bp.route('/start', methods=['POST'])
+@cross_origin()
+def start_solution():
+    """
+    Начинает пошаговое решение: {"taskId": <номер задачи>} от пользователя из токена.
+    Возвращает solution_id для /<solution_id>/check_step.
+    """
+    if is_anonymous():
+        return jsonify({"error": "Authorization required"}), 401
+    data = request.json
+    if not data or "taskId" not in data:
+        return jsonify({"error": "Invalid request format"}), 400
+    task = Task.query.get(data["taskId"])
+    if not task:
+        return jsonify({"error": "Task not found"}), 404
+
+    solution = Solution(task_id=task.id, user_id=current_user_id(), status="in_progress")
+    db.session.add(solution)
+    db.session.commit()
+    step_sessions.sessions.put(solution.id, step_sessions.StepSession(_step_rules(task)))
+    return jsonify({"solution_id": solution.id}), 200
+
+@solutions_bp.route('/<int:solution_id>/check_step', methods=['POST'])
+@cross_origin()
+def check_solution_step(solution_id):
+    """
+    Пошаговая проверка. Принимает JSON:
+    {
+        "step": "LaTeX шага",
+        "step_number": <номер шага, необязательно>
+    }
+    Без step_number шаг добавляется в конец цепочки принятых шагов. Номер уже
+    принятого шага означает правку: этот шаг и следующие за ним заменяются.
+    Шаг сравнивается только с предыдущим принятым шагом, разобранное выражение
+    которого хранится в сессии (step_sessions.py). Неверный шаг сохраняется,
+    но в цепочку не добавляется — его нужно исправить и прислать с тем же номером.
+    """
+    if is_anonymous():
+        return jsonify({"error": "Authorization required"}), 401
+    data = request.json
+    if not data or not isinstance(data.get("step"), str) or not data["step"].strip():
+        return jsonify({"error": "Invalid request format"}), 400
+
+    solution = Solution.query.get(solution_id)
+    if not solution:
+        return jsonify({"error": "Solution not found"}), 404
+    if solution.user_id != current_user_id():
+        return jsonify({"error": "Forbidden"}), 403
+    set_task_context(solution.task_id)
+
+    session = _step_session(solution)
+    with session.lock:
+        _sync_session(session, solution.id)
+        step_number = data.get("step_number")
+        if step_number is None:
+            step_number = len(session.steps) + 1
+        # bool — подкласс int: true не должен становиться шагом 1
+        if (isinstance(step_number, bool) or not isinstance(step_number, int)
+                or not 1 <= step_number <= len(session.steps) + 1):
+            return jsonify({
+                "error": f"Номер шага должен быть от 1 до {len(session.steps) + 1}"
+            }), 400
+
+        current = checker.ParsedStep(data["step"], session.rules)
+        if step_number == 1:
+            # Первый шаг не с чем сравнивать — проверяем только, что он разбирается
+            try:
+                current.expr
+                result = {"is_correct": True, "error_type": None, "hint": None}
+            except ValueError as e:
+                result = {"is_correct": False, "error_type": "parse_error", "hint": str(e)}
+        else:
+            result = session.rules.check_pair(session.steps[step_number - 2], current)
+            if not result["is_correct"]:
+                # Известная типичная ошибка — готовая подсказка по отпечатку шага
+                result["hint"] = lookup_hint(solution.task, current.fingerprint) or result["hint"]
+
+        Step.query.filter(Step.solution_id == solution.id, Step.step_number >= step_number).delete()
+        db.session.add(Step(
+            solution_id=solution.id,
+            step_number=step_number,
+            input_expr=current.latex,
+            is_correct=result["is_correct"],
+            error_type=result["error_type"],
+            hint=(result["hint"] or "")[:300],
+            fingerprint=current.fingerprint,
+            pair_verdict=True
+        ))
+        db.session.commit()
+
+        del session.steps[step_number - 1:]
+        if result["is_correct"]:
+            session.steps.append(current)
+
+    return jsonify({**result, "step_number": step_number, "solution_id": solution.id}), 200
 
 @solutions_bp.route('/last/<int:task_id>', methods=['GET'])
 @cross_origin()
@@ -359,14 +470,16 @@ def check_integral():
     task = Task.query.get(data["taskId"])
     if not task:
         return jsonify({"error": "Task not found"}), 404
+    set_task_context(task.id)
 
     steps = data["steps"]
+    parsed = checker.parse_steps(steps, LIMIT_RULES)
     errors = []
 
     try:
         # Предполагаем, что последний шаг — результат интегрирования
-        expected = sp.simplify(latex2sympy(task.expected_value))
-        student = sp.simplify(latex2sympy(steps[-1]))
+        expected = sp.simplify(checker.parse_latex(task.expected_value))
+        student = sp.simplify(parsed[-1].expr)
 
         if not sp.simplify(expected - student) == 0:
             errors.append({
@@ -381,20 +494,21 @@ def check_integral():
             "error": "Ошибка разбора",
             "hint": str(e)
         })
-    user_id = User.query.filter_by(username=data["user"]).first().id if User.query.filter_by(username=data["user"]).first() else 1
 
-    solution = Solution(task_id=task.id, user_id=user_id, status="completed" if not errors else "error")
+    solution = Solution(task_id=task.id, user_id=current_user_id(), status="completed" if not errors else "error")
     db.session.add(solution)
     db.session.flush()
 
-    for i, step in enumerate(steps):
+    for i, step in enumerate(parsed):
         db.session.add(Step(
             solution_id=solution.id,
             step_number=i + 1,
-            input_expr=step,
+            input_expr=step.latex,
             is_correct=(len(errors) == 0),
             error_type=None if len(errors) == 0 else "error",
-            hint=""
+            hint="",
+            # Разбирается только последний шаг — промежуточные не разбираем ради отпечатка
+            fingerprint=step.fingerprint if i == len(parsed) - 1 else None
         ))
 
     db.session.commit()
@@ -415,41 +529,39 @@ def check_algebra():
     task = Task.query.get(data["taskId"])
     if not task:
         return jsonify({"error": "Task not found"}), 404
+    set_task_context(task.id)
 
     steps = data["steps"]
+    parsed = checker.parse_steps(steps, LIMIT_RULES)
     errors = []
 
-    try:
-        for i in range(len(steps) - 1):
-            lhs = sp.simplify(latex2sympy(steps[i]))
-            rhs = sp.simplify(latex2sympy(steps[i + 1]))
-
-            if not sp.simplify(lhs - rhs) == 0:
-                errors.append({
-                    "step": i + 2,
-                    "error": "Неверное преобразование",
-                    "hint": f"Шаг {i + 2} отличается от предыдущего"
-                })
-    except Exception as e:
-        errors.append({
-            "step": len(steps),
-            "error": "Ошибка разбора выражения",
-            "hint": str(e)
-        })
+    for i, res in enumerate(checker.check_chain(parsed, LIMIT_RULES)):
+        if res["error_type"] == "parse_error":
+            errors.append({
+                "step": i + 2,
+                "error": "Ошибка разбора выражения",
+                "hint": res["hint"]
+            })
+        elif not res["is_correct"]:
+            errors.append({
+                "step": i + 2,
+                "error": "Неверное преобразование",
+                "hint": f"Шаг {i + 2} отличается от предыдущего"
+            })
 
-    user_id = User.query.filter_by(username=data["user"]).first().id if User.query.filter_by(username=data["user"]).first() else 1
-    solution = Solution(task_id=task.id, user_id=user_id, status="completed" if not errors else "error")
+    solution = Solution(task_id=task.id, user_id=current_user_id(), status="completed" if not errors else "error")
     db.session.add(solution)
     db.session.flush()
 
-    for i, step in enumerate(steps):
+    for i, step in enumerate(parsed):
         db.session.add(Step(
             solution_id=solution.id,
             step_number=i + 1,
-            input_expr=step,
+            input_expr=step.latex,
             is_correct=(len(errors) == 0),
             error_type=None if len(errors) == 0 else "error",
-            hint=""
+            hint="",
+            fingerprint=step.fingerprint
         ))
 
     db.session.commit()
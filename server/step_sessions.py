@@ -0,0 +1,70 @@
+"""
+Состояние пошаговой проверки (/api/solutions/<id>/check_step).
+
+Для каждого решения в памяти хранится цепочка принятых шагов (checker.ParsedStep).
+Новый шаг сравнивается только с предыдущим принятым, уже разобранным шагом,
+поэтому проверка очередной строки или правка последней стоит O(1), а не O(N).
+
+Хранилище ограничено по размеру (вытесняются давно не использованные решения)
+и по времени жизни записи. Источник истины — сохранённые Step: при каждом
+запросе цепочка сверяется с принятыми шагами в базе (другой воркер мог принять
+или заменить шаги), а недостающие шаги разбираются лениво, только когда с ними
+действительно сравнивают.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from config import Config
+
+
+class StepSession:
+    """Принятые шаги решения (ParsedStep) в порядке номеров шагов и правила проверки."""
+
+    def __init__(self, rules, steps=None):
+        self.rules = rules
+        self.steps = list(steps or [])
+        self.lock = Lock()
+
+
+class SessionStore:
+    """LRU-словарь с ограничением размера и временем жизни записей."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._items[key]
+                return None
+            # Обращение продлевает жизнь записи
+            self._items[key] = (now + self.ttl, value)
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+        return item[1] if item else None
+
+    def __len__(self):
+        return len(self._items)
+
+
+sessions = SessionStore(Config.STEP_SESSION_MAX_SIZE, Config.STEP_SESSION_TTL_S)
@@ -4,6 +4,7 @@ import logging
 import sympy as sp
 from flask import Blueprint, request, jsonify
 from models import db, Task
+import limits
 
 tasks_generator_bp = Blueprint("tasks_generator", __name__, url_prefix="/api/tasks_generator")
 
@@ -1101,7 +1102,7 @@ def generate_random_task(template: dict) -> dict:
             x = sp.symbols('x')
             expr_str = task["expression"]
             expr = sp.sympify(expr_str)
-            lim_val = sp.limit(expr, x, sp.oo)
+            lim_val = limits.limit(expr, x, sp.oo)
             task["expected_value"] = str(lim_val)
         except Exception as e:
             logging.error(f"Ошибка вычисления expected_value для limits: {e}")
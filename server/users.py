@@ -1,21 +1,112 @@
-from flask import Blueprint, request, jsonify
-from models import db, User
-from datetime import datetime
+"""
+Список пользователей для панели администратора.
+
+GET /api/users?limit=100&role=student&q=Ива&sort=lastname&cursor=...
+  * постраничный вывод по ключу (keyset): страница продолжается с последней
+    пары (значение сортировки, id) предыдущей, без OFFSET, поэтому любая
+    страница стоит одинаково и при десятках тысяч пользователей;
+  * role — фильтр по роли, q — префикс username или lastname (с учётом
+    регистра, плюс вариант с заглавной первой буквой: «ива» найдёт «Иванов»);
+  * sort — id (по умолчанию), username или lastname.
+Тело ответа — по-прежнему список пользователей; курсор следующей страницы —
+в заголовке X-Next-Cursor (нет заголовка — страница последняя).
+Загружаются только выводимые колонки: bio и chat_history не читаются.
+Без limit и cursor ответ прежний: все пользователи одним списком, с bio.
+Доступ — только с токеном администратора (401 без токена, 403 для других ролей).
+"""
+import base64
+import json
+
+from flask import Blueprint, g, request, jsonify
+from sqlalchemy import or_, tuple_
+from sqlalchemy.orm import load_only
+
+from config import Config
+from models import User
+
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
+SORT_COLUMNS = {
+    "id": User.id,
+    "username": User.username,
+    "lastname": User.lastname,
+}
+LISTED_COLUMNS = (User.id, User.firstname, User.lastname, User.username, User.email, User.role)
+# Прежний ответ без limit и cursor включал bio
+LEGACY_COLUMNS = LISTED_COLUMNS + (User.bio,)
+
+
+def _encode_cursor(value, user_id):
+    return base64.urlsafe_b64encode(json.dumps([value, user_id]).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    """(значение сортировки, id) из курсора; ValueError, если курсор испорчен."""
+    try:
+        value, user_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    # Значение сортировки — id (int) или username/lastname (str); bool в JSON — подкласс int
+    if (not isinstance(user_id, int) or isinstance(user_id, bool)
+            or not isinstance(value, (str, int)) or isinstance(value, bool)):
+        raise ValueError("Invalid cursor")
+    return value, user_id
+
+
+def _prefix_filter(column, prefix):
+    # Диапазон вместо LIKE: LIKE в SQLite не регистрозависим и не использует индекс по колонке BINARY
+    return (column >= prefix) & (column < prefix + "\U0010ffff")
+
+
 @users_bp.route('', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    users_list = []
-    for user in users:
-        user_data = {
-            'id': user.id,
-            'firstname': user.firstname,
-            'lastname': user.lastname,
-            'username': user.username,
-            'email': user.email,
-            'bio': user.bio,
-            'role': user.role,
-        }
-        users_list.append(user_data)
-    return jsonify(users_list), 200
\ No newline at end of file
+    if g.user_id is None:
+        return jsonify({"message": "Authorization required"}), 401
+    if g.role != "admin":
+        return jsonify({"message": "Forbidden"}), 403
+    sort = request.args.get('sort', 'id')
+    if sort not in SORT_COLUMNS:
+        return jsonify({"message": f"sort must be one of: {', '.join(SORT_COLUMNS)}"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', Config.USERS_PAGE_SIZE)), 1), Config.USERS_PAGE_MAX)
+        cursor = request.args.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Старые клиенты не передают ни limit, ни cursor и ждут весь список
+    paged = 'limit' in request.args or bool(cursor)
+    column = SORT_COLUMNS[sort]
+    query = User.query.options(load_only(*(LISTED_COLUMNS if paged else LEGACY_COLUMNS)))
+    role = request.args.get('role')
+    if role:
+        query = query.filter(User.role == role)
+    prefix = request.args.get('q', '').strip()
+    if prefix:
+        prefixes = dict.fromkeys([prefix, prefix[:1].upper() + prefix[1:]])
+        query = query.filter(or_(*(
+            _prefix_filter(searched, p) for searched in (User.username, User.lastname) for p in prefixes
+        )))
+    if after is not None:
+        value, user_id = after
+        query = query.filter(User.id > user_id if sort == "id" else tuple_(column, User.id) > (value, user_id))
+    order = (User.id,) if sort == "id" else (column, User.id)
+    query = query.order_by(*order)
+    # Лишняя строка показывает, есть ли следующая страница
+    users = query.limit(limit + 1).all() if paged else query.all()
+
+    headers = {}
+    if len(users) > limit:
+        users = users[:limit]
+        last = users[-1]
+        headers["X-Next-Cursor"] = _encode_cursor(getattr(last, sort), last.id)
+    users_list = [{
+        'id': user.id,
+        'firstname': user.firstname,
+        'lastname': user.lastname,
+        'username': user.username,
+        'email': user.email,
+        'role': user.role,
+        **({} if paged else {'bio': user.bio}),
+    } for user in users]
+    return jsonify(users_list), 200, headers
@@ -1,12 +1,30 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+import math
+from flask import Blueprint, g, request, jsonify
+from sqlalchemy.orm import load_only
 from models import db, User
+from utils.Auth.passwords import hash_password, verify_password
+from utils.Auth.provisioning import parse_roster, provision_users
+from utils.Auth.ratelimit import limited_address, login_limiter
 import jwt
 import datetime
 from config import Config
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+def issue_token(user, check_priority=None, hours=24):
+    """
+    JWT пользователя (по умолчанию на сутки); проверяется в utils/Auth/middleware.py.
+    check_priority — класс приоритета проверок в ASGI-шлюзе (см. asgi.py).
+    """
+    claims = {
+        'user_id': user.id,
+        'role': user.role,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=hours)
+    }
+    if check_priority:
+        claims['check_priority'] = check_priority
+    return jwt.encode(claims, Config.DB_SECRET_KEY, algorithm="HS256")
+
 @auth_bp.route('/signup', methods=['POST'])
 def register():
     
@@ -16,10 +34,10 @@ def register():
         if field not in data:
             return jsonify({"message": f"{field} is required"}), 400
 
-    if User.query.filter_by(username=data['username']).first():
+    if db.session.query(User.id).filter_by(username=data['username']).first():
         return jsonify({"message": "Username already exists"}), 400
 
-    hashed_password = generate_password_hash(data['password'])
+    hashed_password = hash_password(data['password'])
     new_user = User(
         firstname=data['firstname'],
         lastname=data['lastname'],
@@ -28,7 +46,9 @@ def register():
         password=hashed_password,
         bio=data.get('bio', ''),
         image=data.get('image', ''),
-        role=data.get('role', 'student')
+        # Роль не берётся из запроса: повышенные роли выдаёт администратор
+        # (/api/auth/provision) или CLI (python -m utils.Auth.provisioning)
+        role='student'
     )
     db.session.add(new_user)
     db.session.commit()
@@ -37,16 +57,28 @@ def register():
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
-    data = request.json
-    if 'username' not in data or 'password' not in data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'username' not in data or 'password' not in data:
         return jsonify({"message": "Username and password are required"}), 400
+    if not isinstance(data['username'], str) or not isinstance(data['password'], str):
+        return jsonify({"message": "Username and password must be strings"}), 400
 
-    user = User.query.filter_by(username=data['username']).first()
-    if user and check_password_hash(user.password, data['password']):
-        token = jwt.encode({
-            'user_id': user.id,
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-        }, Config.DB_SECRET_KEY, algorithm="HS256")
+    # Только колонки для проверки пароля, токена и ответа: bio и chat_history не читаются
+    user = User.query.options(load_only(
+        User.id, User.username, User.password, User.role, User.firstname, User.lastname, User.email
+    )).filter_by(username=data['username']).first()
+    # Жетон берётся до проверки хеша: она и есть дорогая часть входа
+    ip = limited_address(request.remote_addr, request.headers.get('X-Forwarded-For'))
+    retry_after = login_limiter.hit(ip, data['username'], verify=user is not None)
+    if retry_after:
+        return jsonify({"message": "Too many login attempts"}), 429, {"Retry-After": str(math.ceil(retry_after))}
+
+    valid, rehashed = verify_password(user, data['password']) if user else (False, False)
+    if rehashed:
+        # Хеш пересчитан по текущей политике паролей
+        db.session.commit()
+    if valid:
+        token = issue_token(user)
         return jsonify({
             "message": "Login successful",
             "token": token,
@@ -59,3 +91,60 @@ def login():
             }
         }), 200
     return jsonify({"message": "Invalid credentials"}), 401
+
+@auth_bp.route('/rate-limit', methods=['GET'])
+def rate_limit_stats():
+    """Метрики ограничения входа: пропущено, отклонено по вёдрам, пределы (только для admin)"""
+    if g.role != "admin":
+        return jsonify({"message": "Forbidden"}), 403
+    return jsonify(login_limiter.stats()), 200
+
+@auth_bp.route('/exam-token', methods=['POST'])
+def exam_token():
+    """
+    Токен студента на время экзамена (только для admin): {"user_id": <id>}.
+    Проверки с этим токеном идут в экзаменационном классе приоритета ASGI-шлюза;
+    срок — EXAM_TOKEN_HOURS.
+    """
+    if g.role != "admin":
+        return jsonify({"message": "Forbidden"}), 403
+    user_id = (request.get_json(silent=True) or {}).get('user_id')
+    if isinstance(user_id, bool) or not isinstance(user_id, int):
+        return jsonify({"message": "user_id must be an integer"}), 400
+    user = User.query.options(load_only(User.id, User.role)).filter_by(id=user_id).first()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    token = issue_token(user, check_priority="exam", hours=Config.EXAM_TOKEN_HOURS)
+    return jsonify({"token": token, "expires_in": Config.EXAM_TOKEN_HOURS * 3600}), 200
+
+@auth_bp.route('/provision', methods=['POST'])
+def provision():
+    """
+    Массовое создание пользователей (только для admin): JSON-список, {"users": [...]},
+    CSV в теле (Content-Type: text/csv) или файл в поле file. ?dry_run=1 — только проверка.
+    """
+    if g.role != "admin":
+        return jsonify({"message": "Forbidden"}), 403
+    upload = request.files.get('file')
+    try:
+        if upload is not None:
+            rows = parse_roster(upload.read())
+        elif request.is_json:
+            data = request.get_json()
+            rows = data.get('users') if isinstance(data, dict) else data
+            if not isinstance(rows, list):
+                return jsonify({"message": "users must be a list"}), 400
+        else:
+            rows = parse_roster(request.get_data(), 'csv')
+    except ValueError as e:
+        return jsonify({"message": f"Invalid roster: {e}"}), 400
+    if not rows:
+        return jsonify({"message": "Roster is empty"}), 400
+    if len(rows) > Config.PROVISION_MAX_ROWS:
+        return jsonify({
+            "message": f"Roster is limited to {Config.PROVISION_MAX_ROWS} rows per request; "
+                       "split it or use python -m utils.Auth.provisioning"
+        }), 413
+
+    result = provision_users(rows, dry_run=request.args.get('dry_run') == '1')
+    return jsonify(result), 201 if result["created"] else 200
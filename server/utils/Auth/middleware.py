@@ -0,0 +1,106 @@
+"""
+Проверка JWT из заголовка Authorization: Bearer <token>.
+
+Токен выдаёт /api/auth/login (HS256, user_id и role в claims). Перед каждым
+запросом токен проверяется один раз, а id и роль пользователя кладутся
+в flask.g (g.user_id, g.role), поэтому эндпоинтам не нужно искать
+пользователя по логину из тела запроса. Раскодированные claims хранятся
+в небольшом LRU-кэше по строке токена до истечения срока токена: клиент
+шлёт один и тот же токен сутки, и подпись не пересчитывается на каждую
+проверку шага.
+
+Запрос без токена выполняется анонимно (g.user_id = None), запрос
+с недействительным или просроченным токеном получает 401.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import jwt
+from flask import g, jsonify, request
+
+from config import Config
+
+# id, на который записываются решения анонимных запросов. Такой учётной записи нет:
+# по нему не читаются ни решения, ни вердикты (чужие данные анонимному запросу недоступны)
+ANONYMOUS_USER_ID = 0
+
+
+class ClaimsCache:
+    """LRU-кэш claims по токену; запись живёт до поля exp токена."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token):
+        with self._lock:
+            item = self._items.get(token)
+            if item is None:
+                return None
+            expires_at, claims = item
+            if expires_at <= time.time():
+                del self._items[token]
+                return None
+            self._items.move_to_end(token)
+            return claims
+
+    def put(self, token, claims):
+        with self._lock:
+            self._items[token] = (claims.get("exp", float("inf")), claims)
+            self._items.move_to_end(token)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+claims_cache = ClaimsCache(Config.AUTH_CLAIMS_CACHE_SIZE)
+
+
+def decode_token(token):
+    """Claims токена; бросает jwt.InvalidTokenError, если подпись неверна или срок истёк."""
+    claims = claims_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, Config.DB_SECRET_KEY, algorithms=["HS256"])
+        claims_cache.put(token, claims)
+    return claims
+
+
+def _bearer_token():
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def authenticate():
+    """before_request: заполняет g.user_id и g.role по токену запроса."""
+    g.user_id = g.role = None
+    token = _bearer_token()
+    if token is None or request.method == "OPTIONS":
+        return None
+    try:
+        claims = decode_token(token)
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+    g.user_id = claims.get("user_id")
+    g.role = claims.get("role")
+    return None
+
+
+def current_user_id():
+    """id пользователя текущего запроса; для анонимного запроса — ANONYMOUS_USER_ID."""
+    user_id = g.get("user_id")
+    return ANONYMOUS_USER_ID if user_id is None else user_id
+
+
+def is_anonymous():
+    """Запрос без токена: эндпоинты с личными данными пользователя отвечают 401."""
+    return g.get("user_id") is None
+
+
+def init_auth(app):
+    app.before_request(authenticate)
@@ -0,0 +1,52 @@
+"""
+Политика хеширования паролей.
+
+Алгоритм и стоимость задаются PASSWORD_HASH_METHOD в формате werkzeug:
+"scrypt:N:r:p" (по умолчанию scrypt:32768:8:1 — как generate_password_hash
+без параметров) или "pbkdf2:sha256:<итерации>". Проверка пароля стоит
+столько же, сколько хеширование, поэтому параметры определяют, сколько
+входов в секунду выдерживает одно ядро (замер: python -m benchmarks.login).
+
+При успешном входе хеш, созданный с другими параметрами, пересчитывается
+по текущей политике (verify_password возвращает rehashed=True). Так
+изменение политики доходит до всех активных пользователей без сброса
+паролей — и при усилении, и при ослаблении перед массовым входом.
+"""
+import functools
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+
+
+def hash_password(password, method=None):
+    return generate_password_hash(
+        password,
+        method=method or Config.PASSWORD_HASH_METHOD,
+        salt_length=Config.PASSWORD_SALT_LENGTH,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _stored_method(method):
+    # werkzeug дописывает параметры по умолчанию ("scrypt" -> "scrypt:32768:8:1");
+    # сравниваем с тем, что окажется в сохранённом хеше
+    return generate_password_hash("", method=method, salt_length=1).split("$", 1)[0]
+
+
+def needs_rehash(stored_hash, method=None):
+    """True, если хеш создан не по текущей политике (другой алгоритм или параметры)."""
+    return stored_hash.split("$", 1)[0] != _stored_method(method or Config.PASSWORD_HASH_METHOD)
+
+
+def verify_password(user, password):
+    """
+    Проверяет пароль пользователя. Возвращает (верен ли пароль, пересчитан ли хеш).
+    Новый хеш только записывается в user.password — сохраняет вызывающий.
+    """
+    if not user.password or not check_password_hash(user.password, password):
+        return False, False
+    if not needs_rehash(user.password):
+        return True, False
+    user.password = hash_password(password)
+    return True, True
@@ -0,0 +1,229 @@
+"""
+Массовое создание учётных записей по списку класса (CSV или JSON).
+
+Вместо N вызовов /api/auth/signup (на каждый — SELECT по логину, хеш пароля
+и отдельный commit):
+  * строки проверяются на обязательные поля и повторы внутри списка;
+  * занятые логины и email ищутся одним запросом IN на пачку строк;
+  * пароли хешируются параллельно в пуле процессов (хеш — почти вся
+    стоимость создания, см. utils/Auth/passwords.py);
+  * все пользователи вставляются в одной транзакции.
+Результат — отчёт по каждой строке: created с id или error с причиной.
+Если у строки нет пароля, он генерируется и возвращается в отчёте, чтобы
+преподаватель раздал его студентам.
+
+Эндпоинт: POST /api/auth/provision (только admin, не больше PROVISION_MAX_ROWS
+строк — запрос должен уложиться в таймаут воркера). Большие списки — из каталога server/:
+    python -m utils.Auth.provisioning roster.csv [--dry-run] [--workers 4] [--report report.json]
+Роль существующей учётной записи (регистрация всегда создаёт student):
+    python -m utils.Auth.provisioning --set-role <username> admin
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import multiprocessing
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from models import db, User
+from utils.Auth.passwords import hash_password
+
+REQUIRED_FIELDS = ("firstname", "lastname", "username", "email")
+OPTIONAL_FIELDS = ("password", "bio", "image", "role")
+ROLES = ("student", "admin")
+# Предел параметров в одном запросе SQLite — 999 в старых сборках
+_IN_CHUNK = 500
+_HASHES_PER_WORKER = 8
+
+
+def parse_roster(content, fmt=None):
+    """
+    Строки списка из CSV (первая строка — заголовок) или JSON (список объектов
+    либо {"users": [...]}). fmt — "csv" или "json"; по умолчанию определяется по содержимому.
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    fmt = fmt or ("json" if content.lstrip()[:1] in ("[", "{") else "csv")
+    if fmt == "json":
+        data = json.loads(content)
+        rows = data.get("users") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError("JSON должен быть списком пользователей или объектом с ключом users")
+        return rows
+    return [
+        {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        for row in csv.DictReader(io.StringIO(content))
+    ]
+
+
+def _validate(rows):
+    """Отчёт по строкам и список (строка отчёта, данные) для строк без ошибок."""
+    report = []
+    valid = []
+    seen_usernames = set()
+    seen_emails = set()
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            report.append({"row": number, "status": "error", "message": "row must be an object"})
+            continue
+        data = {field: str(row.get(field) or "").strip() for field in REQUIRED_FIELDS + OPTIONAL_FIELDS}
+        entry = {"row": number, "username": data["username"]}
+        report.append(entry)
+        missing = [field for field in REQUIRED_FIELDS if not data[field]]
+        if missing:
+            entry.update(status="error", message=f"{', '.join(missing)} is required")
+        elif data["username"] in seen_usernames:
+            entry.update(status="error", message="Duplicate username in roster")
+        elif data["email"] in seen_emails:
+            entry.update(status="error", message="Duplicate email in roster")
+        elif data["role"] and data["role"] not in ROLES:
+            entry.update(status="error", message=f"role must be one of: {', '.join(ROLES)}")
+        else:
+            seen_usernames.add(data["username"])
+            seen_emails.add(data["email"])
+            valid.append((entry, data))
+    return report, valid
+
+
+def _existing(column, values):
+    """Значения column, уже занятые в базе: один запрос на пачку из _IN_CHUNK значений."""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), _IN_CHUNK):
+        chunk = values[start:start + _IN_CHUNK]
+        found.update(value for (value,) in db.session.query(column).filter(column.in_(chunk)))
+    return found
+
+
+def hash_passwords(passwords, workers=None):
+    """Хеши паролей по текущей политике; при workers > 1 — в пуле процессов."""
+    workers = Config.PROVISION_HASH_WORKERS if workers is None else workers
+    # Метод передаётся явно: дочерние процессы читают Config из окружения заново
+    hasher = partial(hash_password, method=Config.PASSWORD_HASH_METHOD)
+    # Запуск процесса дороже нескольких хешей: на процесс не меньше _HASHES_PER_WORKER паролей
+    workers = min(workers, math.ceil(len(passwords) / _HASHES_PER_WORKER))
+    if workers <= 1:
+        return [hasher(password) for password in passwords]
+    # spawn, как в asgi.py: воркер сервера может держать потоки и открытые соединения
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(hasher, passwords, chunksize=math.ceil(len(passwords) / (workers * 4))))
+
+
+def provision_users(rows, dry_run=False, workers=None):
+    """
+    Создаёт пользователей из строк списка в одной транзакции (нужен контекст приложения).
+    Возвращает {"created", "errors", "rows"}; при dry_run только проверяет строки.
+    """
+    report, valid = _validate(rows)
+    taken_usernames = _existing(User.username, {data["username"] for _, data in valid})
+    taken_emails = _existing(User.email, {data["email"] for _, data in valid})
+    pending = []
+    for entry, data in valid:
+        if data["username"] in taken_usernames:
+            entry.update(status="error", message="Username already exists")
+        elif data["email"] in taken_emails:
+            entry.update(status="error", message="Email already exists")
+        else:
+            pending.append((entry, data))
+
+    if dry_run:
+        for entry, _ in pending:
+            entry["status"] = "ok"
+    elif pending:
+        for entry, data in pending:
+            if not data["password"]:
+                data["password"] = entry["password"] = secrets.token_urlsafe(9)
+        hashes = hash_passwords([data["password"] for _, data in pending], workers)
+        users = [
+            User(
+                firstname=data["firstname"],
+                lastname=data["lastname"],
+                username=data["username"],
+                email=data["email"],
+                password=password_hash,
+                bio=data["bio"],
+                image=data["image"],
+                role=data["role"] or "student",
+            )
+            for (_, data), password_hash in zip(pending, hashes)
+        ]
+        db.session.add_all(users)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Логин или email заняли между проверкой и вставкой: не создаётся никто
+            db.session.rollback()
+            for entry, _ in pending:
+                entry.pop("password", None)
+                entry.update(status="error", message="Conflict with concurrent signup, retry")
+        else:
+            for (entry, _), user in zip(pending, users):
+                entry.update(status="created", id=user.id)
+
+    created = sum(entry["status"] == "created" for entry in report)
+    errors = sum(entry["status"] == "error" for entry in report)
+    return {"created": created, "errors": errors, "rows": report}
+
+
+def set_role(username, role):
+    """Меняет роль пользователя (нужен контекст приложения). False — пользователя нет."""
+    if role not in ROLES:
+        raise ValueError(f"role must be one of: {', '.join(ROLES)}")
+    updated = User.query.filter_by(username=username).update({User.role: role}, synchronize_session=False)
+    db.session.commit()
+    return bool(updated)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Массовое создание пользователей по списку класса")
+    parser.add_argument("roster", nargs="?", help="CSV или JSON со списком")
+    parser.add_argument("--format", choices=("csv", "json"), default=None)
+    parser.add_argument("--dry-run", action="store_true", help="только проверить строки")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для хеширования")
+    parser.add_argument("--report", default=None, help="сохранить отчёт в JSON (с паролями)")
+    parser.add_argument("--set-role", nargs=2, metavar=("USERNAME", "ROLE"), default=None,
+                        help="сменить роль существующего пользователя вместо создания списка")
+    args = parser.parse_args(argv)
+
+    if args.set_role:
+        from app import app
+        username, role = args.set_role
+        with app.app_context():
+            try:
+                found = set_role(username, role)
+            except ValueError as e:
+                parser.error(str(e))
+        print(f"{username}: роль {role}" if found else f"Пользователь {username} не найден")
+        return 0 if found else 1
+    if not args.roster:
+        parser.error("укажите файл списка или --set-role")
+
+    with open(args.roster, encoding="utf-8-sig") as f:
+        rows = parse_roster(f.read(), args.format)
+
+    from app import app
+    started = time.perf_counter()
+    with app.app_context():
+        result = provision_users(rows, dry_run=args.dry_run, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    for entry in result["rows"]:
+        if entry["status"] == "error":
+            print(f"  строка {entry['row']} ({entry['username']}): {entry['message']}")
+    print(f"Создано: {result['created']}, ошибок: {result['errors']}, строк: {len(rows)}, {elapsed:.1f} с")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Ограничение частоты попыток входа (token bucket).
+
+Попытка входа в существующую учётную запись стоит полной проверки хеша
+пароля (utils/Auth/passwords.py), поэтому до проверки берётся по жетону из вёдер:
+  * ip     — с одного адреса (подбор паролей с одной машины);
+  * user   — для одного логина (перебор пароля к одной учётной записи);
+  * global — на все проверки хешей вместе: ограничивает CPU, даже если
+             атакующий перебирает много адресов. Жетон global берут только
+             попытки с существующим логином — перебор несуществующих логинов
+             хеш не считает и не должен отнимать вход у остальных.
+Ведро ёмкостью burst пополняется со скоростью rate жетонов в секунду. Жетоны
+берутся из всех вёдер сразу или ни из одного; если хотя бы одно пусто, запрос
+получает 429 с Retry-After — временем до появления жетона.
+
+Адрес клиента — request.remote_addr. За обратным прокси это адрес прокси, пока
+не задан PROXY_HOPS (config.py): тогда у всех клиентов было бы одно ведро ip,
+и один атакующий отнимал бы вход у всех. Поэтому запрос с X-Forwarded-For при
+PROXY_HOPS=0 ведро ip не берёт (остаются user и global), а в лог пишется
+предупреждение о настройке.
+
+Хранилище: "memory" — словарь в процессе (один воркер или приблизительные
+пределы на воркер), "sqlite" — отдельный файл SQLite, общий для всех
+воркеров и процессов на машине.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from config import Config
+
+SCOPES = ("ip", "user", "global")
+_proxy_warning = threading.Event()
+
+
+def limited_address(remote_addr, forwarded_for):
+    """
+    Адрес для ведра ip или None, если адрес — прокси, а не клиент
+    (есть X-Forwarded-For, но PROXY_HOPS не задан).
+    """
+    if forwarded_for and not Config.PROXY_HOPS:
+        if not _proxy_warning.is_set():
+            _proxy_warning.set()
+            logging.warning(
+                "Запрос пришёл через прокси (X-Forwarded-For), но PROXY_HOPS=0: "
+                "ограничение входа по адресу отключено. Задайте PROXY_HOPS по числу прокси"
+            )
+        return None
+    return remote_addr
+
+
+def _refill(tokens, updated_at, burst, rate, now):
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+
+def _take(buckets, limits, now):
+    """
+    Общая логика хранилищ: buckets — {ключ: (жетоны, время)} после чтения,
+    limits — [(ключ, burst, rate)]. Возвращает новое состояние вёдер
+    и {ключ пустого ведра: секунды до жетона} (пусто — жетоны взяты).
+    """
+    state = {}
+    empty = {}
+    for key, burst, rate in limits:
+        tokens, updated_at = buckets.get(key, (burst, now))
+        tokens = _refill(tokens, updated_at, burst, rate, now)
+        state[key] = tokens
+        if tokens < 1:
+            empty[key] = (1 - tokens) / rate
+    if not empty:
+        state = {key: tokens - 1 for key, tokens in state.items()}
+    return {key: (tokens, now) for key, tokens in state.items()}, empty
+
+
+class MemoryStore:
+    """Вёдра в памяти процесса; хранится не больше max_keys давно не использованных вёдер."""
+
+    kind = "memory"
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, limits, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            current = {key: self._buckets[key] for key, _, _ in limits if key in self._buckets}
+            state, empty = _take(current, limits, now)
+            for key, value in state.items():
+                self._buckets[key] = value
+                self._buckets.move_to_end(key)
+            # Вытесненное ведро считается полным — это только ослабляет предел для редких ключей
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return empty
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteStore:
+    """Вёдра в отдельной базе SQLite, общей для воркеров; чтение и запись — в одной транзакции."""
+
+    kind = "sqlite"
+    # Раз в столько вызовов удаляются давно полные вёдра
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self):
+        # Соединение на поток и процесс: после fork воркер открывает своё
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, limits, now=None):
+        now = time.time() if now is None else now
+        conn = self._connection()
+        keys = [key for key, _, _ in limits]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT key, tokens, updated_at FROM rate_buckets WHERE key IN ({','.join('?' * len(keys))})",
+                keys,
+            ).fetchall()
+            state, empty = _take({key: (tokens, at) for key, tokens, at in rows}, limits, now)
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                [(key, tokens, at) for key, (tokens, at) in state.items()],
+            )
+            self._calls += 1
+            if self._calls % self._PRUNE_EVERY == 0:
+                # Ведро, не тронутое дольше часа, уже полное при любых разумных пределах
+                conn.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (now - 3600,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return empty
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+
+class LoginLimiter:
+    """Пределы попыток входа по адресу, логину и в целом; считает пропущенные и отклонённые попытки."""
+
+    def __init__(self, store, limits):
+        # limits: {scope: (burst, rate в секунду)}
+        self.store = store
+        self.limits = limits
+        self.allowed = 0
+        self.rejected = Counter()
+
+    def hit(self, ip, username, verify=True):
+        """
+        Берёт жетоны на попытку входа; verify — попытка дойдёт до проверки хеша
+        (логин существует), только тогда берётся и жетон global. ip=None — адрес
+        клиента неизвестен (см. limited_address), ведро ip не берётся.
+        Возвращает 0, если попытка разрешена, иначе секунды до следующей.
+        """
+        keys = {"ip": f"ip:{ip}", "user": f"user:{(username or '').strip().lower()}", "global": "global"}
+        scopes = [scope for scope in SCOPES if (verify or scope != "global") and (ip is not None or scope != "ip")]
+        try:
+            empty = self.store.take([(keys[scope], *self.limits[scope]) for scope in scopes])
+        except sqlite3.Error as e:
+            # Хранилище недоступно — не блокируем вход, но фиксируем проблему
+            logging.error(f"Ограничение входа недоступно: {e}")
+            return 0
+        if not empty:
+            self.allowed += 1
+            return 0
+        for scope in SCOPES:
+            if keys[scope] in empty:
+                self.rejected[scope] += 1
+        logging.warning(f"Попытка входа отклонена: ip={ip}, user={username}, вёдра: {', '.join(empty)}")
+        return max(empty.values())
+
+    def stats(self):
+        return {
+            "store": self.store.kind,
+            "buckets": len(self.store),
+            "allowed": self.allowed,
+            "rejected": {scope: self.rejected[scope] for scope in SCOPES},
+            "limits": {scope: {"burst": burst, "per_second": rate} for scope, (burst, rate) in self.limits.items()},
+        }
+
+
+def _make_store():
+    if Config.LOGIN_RATE_LIMIT_STORE == "sqlite":
+        return SQLiteStore(Config.LOGIN_RATE_LIMIT_DB)
+    return MemoryStore()
+
+
+login_limiter = LoginLimiter(_make_store(), {
+    "ip": (Config.LOGIN_IP_BURST, Config.LOGIN_IP_PER_MINUTE / 60),
+    "user": (Config.LOGIN_USER_BURST, Config.LOGIN_USER_PER_MINUTE / 60),
+    "global": (Config.LOGIN_GLOBAL_BURST, Config.LOGIN_GLOBAL_PER_SECOND),
+})
@@ -0,0 +1,205 @@
+"""
+Итерации Пикара для интегральных уравнений Вольтерры 2-го рода:
+
+    φ(x) = f(x) + λ ∫₀ˣ K(x,t) φ(t) dt,      φₙ₊₁ = f + λ ∫₀ˣ K(x,t) φₙ(t) dt.
+
+Ожидаемые итерации φ₀…φₙ вычисляются один раз для уравнения и начального
+приближения и кэшируются, так что проверка цепочки студента сводится
+к сравнению каждого шага с готовой итерацией. Если f, K и φₙ — многочлены,
+интеграл берётся точно по коэффициентам (sp.Poly) без sp.integrate.
+
+Уравнение задачи (f, K, λ) извлекается из Task: из LaTeX-описания или из
+выражения шаблона. Решение проверяется по невязке
+φ(x) − f(x) − λ∫₀ˣK(x,t)φ(t)dt во многих точках с квадратурой Гаусса–Лежандра
+(векторно в NumPy); символьное интегрирование — только запасной путь.
+"""
+import logging
+import re
+from functools import lru_cache
+
+import numpy as np
+import sympy as sp
+from latex2sympy2 import latex2sympy
+
+from fingerprint import fingerprint
+from integration import integrate_symbolic
+
+x, t = sp.symbols("x t")
+# φ(t) под интегралом заменяется на этот символ, чтобы выделить ядро K(x,t)
+_PHI = sp.Symbol("Phi")
+_PHI_OF_T_LATEX = re.compile(r"\\varphi\s*(?:\\left)?\s*\(\s*t\s*(?:\\right)?\s*\)")
+_PHI_OF_T_SYMPY = re.compile(r"varphi\s*\(\s*t\s*\)")
+
+# Узлы и веса Гаусса–Лежандра на [0, 1]
+QUADRATURE_NODES = 32
+_gl_nodes, _gl_weights = np.polynomial.legendre.leggauss(QUADRATURE_NODES)
+_gl_nodes = (_gl_nodes + 1) / 2
+_gl_weights = _gl_weights / 2
+SAMPLE_POINTS = np.linspace(0.05, 2.0, 40)
+RESIDUAL_TOLERANCE = 1e-8
+
+
+def _is_polynomial(expr, *symbols):
+    return expr.free_symbols <= set(symbols) and expr.is_polynomial(*symbols)
+
+
+def apply_operator(phi, f, kernel, lam):
+    """Одна итерация: f(x) + λ ∫₀ˣ K(x,t) φ(t) dt."""
+    phi_t = phi.subs(x, t)
+    if _is_polynomial(f, x) and _is_polynomial(kernel, x, t) and _is_polynomial(phi_t, t):
+        # ∫₀ˣ xᵃ tᵇ dt = xᵃ⁺ᵇ⁺¹/(b+1): первообразная по t в нуле обращается в 0
+        antiderivative = sp.Poly(kernel * phi_t, x, t).integrate(t)
+        integral = antiderivative.as_expr().subs(t, x)
+        return sp.Poly(f + lam * integral, x).as_expr()
+    integral = sp.integrate(kernel * phi_t, (t, 0, x))
+    return sp.simplify(f + lam * integral)
+
+
+@lru_cache(maxsize=512)
+def picard_iterates(f, kernel, lam, phi0, n):
+    """Кортеж итераций (φ₀, …, φₙ); каждая строится из закэшированной предыдущей."""
+    if n == 0:
+        return (phi0,)
+    previous = picard_iterates(f, kernel, lam, phi0, n - 1)
+    return previous + (apply_operator(previous[-1], f, kernel, lam),)
+
+
+def equivalent(a, b):
+    """Точное сравнение многочленов, иначе отпечатки, иначе sp.simplify."""
+    if _is_polynomial(a, x) and _is_polynomial(b, x):
+        return sp.Poly(a - b, x).is_zero
+    fa = fingerprint(a)
+    if fa is not None and fa == fingerprint(b):
+        return True
+    return sp.simplify(a - b) == 0
+
+
+def _split_equation(rhs):
+    """
+    Раскладывает правую часть f(x) + λ·∫₀ˣ K(x,t)·Phi dt на (f, K, λ).
+    Поддерживается ровно один интеграл с пределами от 0 до x.
+    """
+    integrals = list(rhs.atoms(sp.Integral))
+    if len(integrals) != 1:
+        return None
+    integral = integrals[0]
+    if len(integral.limits) != 1:
+        return None
+    var, lower, upper = integral.limits[0]
+    if var != t or lower != 0 or upper != x:
+        return None
+    integrand = sp.expand(integral.function)
+    kernel = sp.diff(integrand, _PHI)
+    if kernel.has(_PHI) or sp.expand(integrand - kernel * _PHI) != 0:
+        return None
+    f = sp.expand(rhs.subs(integral, 0))
+    lam = sp.expand((rhs - f).subs(integral, 1))
+    if lam.free_symbols or lam == 0 or f.has(_PHI):
+        return None
+    return f, sp.factor(kernel), lam
+
+
+def _equation_from_description(description):
+    # "\varphi(x) = <правая часть>, \varphi_0 = ..." — берём правую часть до запятой
+    if "=" not in description:
+        return None
+    rhs = description.split("=", 1)[1].split(",", 1)[0]
+    rhs = _PHI_OF_T_LATEX.sub(r"\\Phi ", rhs)
+    return _split_equation(latex2sympy(rhs))
+
+
+def _equation_from_expression(expression):
+    # Выражение шаблона: "3*x - integrate((x-t)*varphi(t), (t,0,x))"
+    expression = _PHI_OF_T_SYMPY.sub("Phi", expression)
+    rhs = sp.sympify(expression, locals={
+        "Phi": _PHI, "x": x, "t": t,
+        "integrate": lambda f, limits: sp.Integral(f, limits),
+    })
+    return _split_equation(rhs)
+
+
+@lru_cache(maxsize=256)
+def parse_equation(description, expression):
+    """(f, K, λ) уравнения задачи или None, если его не удалось распознать."""
+    for parse, source in ((_equation_from_description, description), (_equation_from_expression, expression)):
+        if not source:
+            continue
+        try:
+            equation = parse(source)
+        except Exception as e:
+            logging.warning(f"Не удалось разобрать уравнение Вольтерры '{source}': {e}")
+            continue
+        if equation:
+            return equation
+    return None
+
+
+def task_equation(task, default):
+    equation = parse_equation(task.description or "", task.expression or "")
+    if equation is None:
+        logging.warning(f"Уравнение задачи {task.id} не распознано, используется уравнение по умолчанию")
+        return default
+    return equation
+
+
+def _vectorize(expr, *symbols):
+    func = sp.lambdify(symbols, expr, modules="numpy")
+
+    def call(*args):
+        # Константы lambdify возвращает скаляром — приводим к форме аргументов
+        return np.broadcast_to(np.asarray(func(*args), dtype=float), np.broadcast(*args).shape)
+    return call
+
+
+def numeric_residual(phi, f, kernel, lam, points=SAMPLE_POINTS):
+    """
+    Невязка φ(x) − f(x) − λ∫₀ˣK(x,t)φ(t)dt в точках points.
+    ∫₀ˣ g(t)dt = x·Σ wᵢ g(x·sᵢ) — все точки и узлы считаются одной операцией NumPy.
+    """
+    phi_fn = _vectorize(phi, x)
+    f_fn = _vectorize(f, x)
+    kernel_fn = _vectorize(kernel, x, t)
+    X = points[:, None]
+    T = X * _gl_nodes[None, :]
+    integral = points * np.sum(_gl_weights * kernel_fn(X, T) * phi_fn(T), axis=1)
+    return phi_fn(points) - f_fn(points) - float(lam) * integral, phi_fn(points)
+
+
+def symbolic_residual(phi, f, kernel, lam):
+    """
+    Невязка φ − f − λ∫₀ˣKφ символьно; None, если интеграл не вычислен
+    за INTEGRATION_TIME_BUDGET_S (integration.integrate_symbolic).
+    """
+    # На [0, x] обе переменные положительны: так SymPy интегрирует |t − a|, max/min и кусочные функции
+    xp, tp = sp.Symbol("x", positive=True), sp.Symbol("t", positive=True)
+    integrand = (kernel * phi.subs(x, t)).subs({x: xp, t: tp})
+    integral = integrate_symbolic(sp.Integral(integrand, (tp, 0, xp)))
+    if integral is None:
+        return None
+    return sp.simplify(phi - f - lam * integral.subs(xp, x))
+
+
+def residual_vanishes(residual, phi, points=SAMPLE_POINTS):
+    """
+    Равна ли нулю невязка, найденная symbolic_residual. Для кусочных выражений
+    (Min, Piecewise) equals не даёт ответа — тогда замкнутая невязка вычисляется
+    в points напрямую, без квадратуры, с допуском RESIDUAL_TOLERANCE.
+    """
+    if residual is None:
+        return False
+    vanishes = residual.equals(0)
+    if vanishes is not None:
+        return vanishes
+    if residual.has(sp.Integral) or not residual.free_symbols <= {x}:
+        return False
+    values = _vectorize(residual, x)(points)
+    scale = np.maximum(1.0, np.abs(_vectorize(phi, x)(points)))
+    return bool(np.all(np.isfinite(values)) and np.all(np.abs(values) / scale <= RESIDUAL_TOLERANCE))
+
+
+def describe_equation(f, kernel, lam, n=None):
+    """Текст уравнения для подсказок: φ(x) = f + λ·∫₀ˣ K φ(t)dt (или φₙ₊₁ через φₙ)."""
+    left, right = ("φ(x)", "φ(t)") if n is None else (f"φ{n + 1}(x)", f"φ{n}(t)")
+    sign, coeff = ("-", -lam) if lam.could_extract_minus_sign() else ("+", lam)
+    coeff_str = "" if coeff == 1 else f"{coeff}·"
+    return f"{left} = {f} {sign} {coeff_str}∫₀ˣ ({kernel}){right}dt"
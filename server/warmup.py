@@ -0,0 +1,113 @@
+"""
+Прогрев процесса перед первыми запросами.
+
+Первая проверка в свежем процессе платит за заполнение DFA-кэшей ANTLR-парсера
+latex2sympy2, первые вызовы SymPy (кэши, ленивые импорты подмодулей) и пустой
+кэш отпечатков. warm_up() разбирает и проверяет корпус — LaTeX условий из
+TEMPLATES с фиксированными параметрами и самые частые сохранённые Step, —
+поэтому первый реальный запрос идёт с установившейся скоростью.
+
+Вызывается из gunicorn.conf.py: при preload_app — один раз в мастере до
+запуска воркеров (воркеры наследуют прогретое состояние через fork), иначе —
+в каждом воркере после загрузки приложения; в ASGI-шлюзе — в инициализаторе
+процессов пула. На время прогрева захват медленных выражений отключён.
+"""
+import logging
+import re
+import time
+
+from config import Config
+from slow_capture import capture_disabled
+
+# Части условия: уравнение разбивается по "=", дополнительные условия — по \quad
+_CONDITION_PARTS = re.compile(r"=|,\s*\\quad")
+
+_done = False
+
+
+def template_corpus():
+    """[(LaTeX, интегральная категория)] из условий TEMPLATES; параметры — нижние границы диапазонов."""
+    from tasks_generator import TEMPLATES, substitute_placeholders
+
+    corpus = []
+    for category, templates in TEMPLATES.items():
+        for template in templates:
+            params = {
+                key: value[0] if isinstance(value, tuple) else value
+                for key, value in template.get("params", {}).items()
+            }
+            description = substitute_placeholders(template["description"], params)
+            for part in _CONDITION_PARTS.split(description):
+                part = part.strip()
+                if len(part) > 2:
+                    corpus.append((part, category.startswith("integral")))
+    return corpus
+
+
+def frequent_steps(limit):
+    """[(LaTeX, шаг интегрального решения)] — самые частые сохранённые шаги."""
+    from models import db, Step
+
+    count = db.func.count(Step.id)
+    rows = (db.session.query(Step.input_expr, db.func.max(Step.phi_index), count)
+            .group_by(Step.input_expr)
+            .order_by(count.desc())
+            .limit(limit)
+            .all())
+    return [(latex, phi_index is not None) for latex, phi_index, _ in rows]
+
+
+def warm_up(app, step_limit=None, budget_s=None):
+    """
+    Прогревает текущий процесс. Повторный вызов в том же процессе (и в воркере,
+    унаследовавшем прогрев мастера) ничего не делает и возвращает None.
+    Иначе возвращает сводку {"parsed", "corpus", "pairs", "ms"}.
+    """
+    global _done
+    if _done or not Config.WARMUP_ENABLED:
+        return None
+    _done = True
+
+    import checker
+    from models import db
+    from solution_integral import INTEGRAL_RULES
+    from solutions import LIMIT_RULES
+
+    started = time.perf_counter()
+    corpus = []
+    with app.app_context():
+        try:
+            # Сначала реальные вводы студентов: они разнообразнее условий задач
+            corpus += frequent_steps(step_limit or Config.WARMUP_STEP_LIMIT)
+        except Exception as e:
+            logging.warning(f"Прогрев: не удалось прочитать частые шаги: {e}")
+        finally:
+            # Прогрев может идти в мастере gunicorn: соединения не должны попасть в воркеры
+            db.engine.dispose()
+    # Шаблоны одной категории часто дают одинаковые условия
+    corpus = list(dict.fromkeys(corpus + template_corpus()))
+    steps = [checker.ParsedStep(latex, INTEGRAL_RULES if integral else LIMIT_RULES) for latex, integral in corpus]
+
+    deadline = started + (budget_s or Config.WARMUP_TIME_BUDGET_S)
+    parsed = checked = 0
+    with capture_disabled():
+        # Разбор всего корпуса заполняет DFA-кэши парсера для разных форм ввода
+        for step in steps:
+            if time.perf_counter() > deadline:
+                break
+            try:
+                step.expr
+            except ValueError:
+                pass
+            parsed += 1
+        # Пары соседних выражений с одинаковыми правилами проходят отпечатки, упрощение и численную проверку
+        for prev, curr in zip(steps[:parsed], steps[1:parsed]):
+            if time.perf_counter() > deadline:
+                break
+            if prev.rules is curr.rules:
+                checker.check_pair(prev, curr, curr.rules)
+                checked += 1
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logging.info(f"Прогрев: разобрано {parsed} из {len(steps)} выражений, проверено {checked} пар за {elapsed_ms:.0f} мс")
+    return {"parsed": parsed, "corpus": len(steps), "pairs": checked, "ms": round(elapsed_ms, 1)}